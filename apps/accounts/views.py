@@ -11,9 +11,11 @@ from django.core.paginator import Paginator
 from .models import UserProfile
 from .forms import CustomUserCreationForm
 from apps.orders.models import Order
+from apps.orders.archive import get_user_order
+from apps.orders.views import order_history_context
 from apps.wishlist.models import Wishlist
 from apps.reviews.models import Review
-from apps.vinyl.models import Genre
+from apps.vinyl.dimensions import genres
 
 
 def register_view(request):
@@ -104,7 +106,7 @@ def edit_profile_view(request):
     """Edit user profile view"""
     # Get or create profile for the user
     profile, created = UserProfile.objects.get_or_create(user=request.user)
-    all_genres = Genre.objects.all().order_by('name')
+    all_genres = genres.all()
     
     if request.method == 'POST':
         # Update User model fields
@@ -139,13 +141,7 @@ def edit_profile_view(request):
         
         # Handle favorite genres
         selected_genres = request.POST.getlist('favorite_genres')
-        profile.favorite_genres.clear()  # Clear existing selections
-        for genre_id in selected_genres:
-            try:
-                genre = Genre.objects.get(id=genre_id)
-                profile.favorite_genres.add(genre)
-            except Genre.DoesNotExist:
-                pass
+        profile.favorite_genres.set(genres.valid_ids(selected_genres))  # Unknown ids are ignored
         
         # Handle avatar upload
         if 'avatar' in request.FILES:
@@ -158,21 +154,20 @@ def edit_profile_view(request):
     
     return render(request, 'accounts/edit_profile.html', {
         'profile': profile,
-        'all_genres': all_genres
+        'all_genres': all_genres,
+        'favorite_genre_ids': set(profile.favorite_genres.values_list('id', flat=True)),
     })
 
 
 @login_required
 def order_history_view(request):
     """User order history view"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    
-    # Use simple orders list instead of pagination for consistency
-    return render(request, 'orders/order_list.html', {'orders': orders})
+    # Same paginated, prefetched listing as the orders app
+    return render(request, 'orders/order_list.html', order_history_context(request))
 
 
 @login_required
 def order_detail_view(request, order_id):
     """Individual order detail view"""
-    order = get_object_or_404(Order, order_id=order_id, user=request.user)
+    order = get_user_order(request, order_id)
     return render(request, 'accounts/order_detail.html', {'order': order})
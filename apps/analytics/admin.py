@@ -0,0 +1,30 @@
+from django.contrib import admin
+from .models import SalesDailyRollup, SalesDailyTotal
+
+
+@admin.register(SalesDailyRollup)
+class SalesDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'genre', 'artist_type', 'orders', 'units', 'revenue', 'cancellations')
+    list_filter = ('artist_type', 'genre')
+    date_hierarchy = 'day'
+    ordering = ('-day', 'genre', 'artist_type')
+
+    # Rollups are derived data; rebuild them with rebuild_sales_rollups instead of editing
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SalesDailyTotal)
+class SalesDailyTotalAdmin(admin.ModelAdmin):
+    list_display = ('day', 'orders', 'units', 'revenue', 'cancellations')
+    date_hierarchy = 'day'
+    ordering = ('-day',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
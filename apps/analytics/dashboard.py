@@ -0,0 +1,46 @@
+"""
+Admin dashboard (django-jet).
+
+``SalesDashboard`` is the default JET index dashboard plus a sales widget.
+``SalesRollupModule`` reads SalesDailyRollup only, so it renders in a few
+small queries however many orders there are. Users whose dashboard layout
+already exists can add the widget from the dashboard's "add module" menu.
+"""
+from django import forms
+from django.urls import reverse
+from jet.dashboard.dashboard import DefaultIndexDashboard
+from jet.dashboard.modules import DashboardModule
+from .rollups import sales_summary
+
+
+class SalesRollupSettingsForm(forms.Form):
+    days = forms.IntegerField(label='Days', min_value=1, max_value=366)
+    limit = forms.IntegerField(label='Top genres shown', min_value=1, max_value=50)
+
+
+class SalesRollupModule(DashboardModule):
+    """Orders, units, revenue and cancellations for the last N days"""
+    title = 'Sales'
+    template = 'analytics/dashboard_sales.html'
+    settings_form = SalesRollupSettingsForm
+
+    days = 30
+    limit = 5
+
+    def settings_dict(self):
+        return {'days': self.days, 'limit': self.limit}
+
+    def load_settings(self, settings):
+        self.days = settings.get('days', self.days)
+        self.limit = settings.get('limit', self.limit)
+
+    def init_with_context(self, context):
+        self.title_url = reverse('admin:analytics_salesdailyrollup_changelist')
+        self.summary = sales_summary(days=self.days, limit=self.limit)
+
+
+class SalesDashboard(DefaultIndexDashboard):
+    def init_with_context(self, context):
+        super().init_with_context(context)
+        self.available_children.append(SalesRollupModule)
+        self.children.append(SalesRollupModule(column=2, order=1))
@@ -0,0 +1,67 @@
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.analytics.rollups import rebuild_rollups
+from apps.orders.models import Order, ArchivedOrder
+
+
+class Command(BaseCommand):
+    help = '''
+    Recompute the daily sales rollups from orders.
+
+    Rollups are normally kept current as orders are placed and cancelled;
+    use this to backfill them once, or to repair a range after orders were
+    changed with bulk updates or deleted.
+
+    USAGE:
+        python manage.py rebuild_sales_rollups                          # Everything
+        python manage.py rebuild_sales_rollups --since 2025-01-01 --until 2025-03-31
+        python manage.py rebuild_sales_rollups --days 7                 # Last week only
+
+    Each chunk of days is rebuilt in its own transaction, so the command is
+    safe to stop and re-run.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='First day, YYYY-MM-DD (default: first order)')
+        parser.add_argument('--until', help='Last day, YYYY-MM-DD (default: today)')
+        parser.add_argument('--days', type=int, help='Rebuild only the last N days')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Days rebuilt per transaction')
+
+    def handle(self, *args, **options):
+        until = self.parse_day(options['until']) or timezone.localdate()
+        if options['days']:
+            since = until - timedelta(days=options['days'] - 1)
+        else:
+            since = self.parse_day(options['since'])
+        if since is None:
+            firsts = [
+                model.objects.order_by('created_at').values_list('created_at', flat=True).first()
+                for model in (Order, ArchivedOrder)
+            ]
+            firsts = [first for first in firsts if first is not None]
+            if not firsts:
+                self.stdout.write('No orders to roll up')
+                return
+            since = timezone.localdate(min(firsts))
+        if since > until:
+            raise CommandError('--since must not be after --until')
+
+        written = 0
+        start = since
+        while start <= until:
+            end = min(start + timedelta(days=options['chunk_days'] - 1), until)
+            rows = rebuild_rollups(start, end)
+            written += rows
+            self.stdout.write(f'  {start} .. {end}: {rows} rows')
+            start = end + timedelta(days=1)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} rollup rows for {since} .. {until}'))
+
+    def parse_day(self, value):
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'Invalid date: {value}')
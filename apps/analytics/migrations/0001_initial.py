@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('genre', models.CharField(blank=True, max_length=100)),
+                ('artist_type', models.CharField(max_length=20)),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('cancellations', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day', 'genre', 'artist_type'],
+                'constraints': [models.UniqueConstraint(fields=('day', 'genre', 'artist_type'), name='unique_sales_rollup_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('orders', models.IntegerField(default=0)),
+                ('units', models.IntegerField(default=0)),
+                ('revenue', models.BigIntegerField(default=0)),
+                ('cancellations', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import models
+
+
+class SalesDailyRollup(models.Model):
+    """
+    Sales for one day, genre and artist type, kept up to date as orders are
+    placed and cancelled (see apps.analytics.rollups).
+
+    ``orders``, ``units`` and ``revenue`` cover orders that are not cancelled;
+    a cancellation moves the order's lines out of them and into
+    ``cancellations``. Everything is attributed to the day the order was
+    placed. An order with lines in several buckets counts once in each, so
+    order counts only add up per bucket; SalesDailyTotal has the per-day ones.
+    """
+    day = models.DateField()
+    genre = models.CharField(max_length=100, blank=True)  # Genre name at the time; blank when the record has none
+    artist_type = models.CharField(max_length=20)
+
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)  # Sum of line totals, excluding shipping
+    cancellations = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day', 'genre', 'artist_type']
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'genre', 'artist_type'], name='unique_sales_rollup_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.genre or 'No genre'} / {self.artist_type}"
+
+
+class SalesDailyTotal(models.Model):
+    """
+    Sales for one day across all buckets, kept alongside SalesDailyRollup.
+    Same counters, but each order counts once however many buckets its lines
+    fall into.
+    """
+    day = models.DateField(unique=True)
+
+    orders = models.IntegerField(default=0)
+    units = models.IntegerField(default=0)
+    revenue = models.BigIntegerField(default=0)
+    cancellations = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+
+    def __str__(self):
+        return str(self.day)
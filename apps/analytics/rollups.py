@@ -0,0 +1,174 @@
+"""
+Daily sales rollups.
+
+Sales reports read SalesDailyRollup instead of scanning orders. The order
+code keeps it current by calling ``record_order_placed`` once an order's
+items exist and ``record_status_change`` when its status changes, inside the
+same transaction. Each call adds the order's lines to its buckets, and the
+order itself to its day's SalesDailyTotal, with ``INSERT ... ON CONFLICT DO
+UPDATE``, so concurrent checkouts never lose an increment.
+
+``rebuild_rollups`` recomputes a date range from the orders themselves,
+archived ones included; the ``rebuild_sales_rollups`` command uses it to
+backfill and to repair drift from changes made outside those hooks (bulk
+updates, deleted orders).
+"""
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from apps.orders.models import OrderItem, ArchivedOrderItem
+from .models import SalesDailyRollup, SalesDailyTotal
+
+COUNTERS = ('orders', 'units', 'revenue', 'cancellations')
+
+
+def _buckets():
+    """The (genre, artist_type) bucket of an order line, never NULL so it always matches the conflict key"""
+    return {
+        'bucket_genre': Coalesce('vinyl_record__genre__name', Value('')),
+        # Archived lines can outlive their record
+        'bucket_artist_type': Coalesce('vinyl_record__artist__artist_type', Value('other')),
+    }
+
+
+def _bucket_lines(items):
+    """Group order lines by (genre, artist_type) with their units and revenue"""
+    return (
+        items.values(**_buckets())
+        .annotate(line_units=Sum('quantity'), line_revenue=Sum(F('price') * F('quantity')))
+        .order_by('bucket_genre', 'bucket_artist_type')
+    )
+
+
+def _add(model, keys, rows):
+    """Add {key: (orders, units, revenue, cancellations)} deltas to model's rows in one statement"""
+    if not rows:
+        return
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = keys + COUNTERS
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(rows))
+    increments = ', '.join(f'{name} = {table}.{name} + EXCLUDED.{name}' for name in COUNTERS)
+    params = []
+    # Sorted so concurrent writers touch buckets in the same order and cannot deadlock
+    for key in sorted(rows):
+        params.extend(key)
+        params.extend(rows[key])
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} ({", ".join(columns)}) VALUES {placeholders} '
+            f'ON CONFLICT ({", ".join(keys)}) DO UPDATE SET {increments}',
+            params,
+        )
+
+
+def _apply(order, placed=0, cancelled=0):
+    """Move order's lines into (+1) or out of (-1) the placed and cancelled counters"""
+    day = timezone.localdate(order.created_at)
+    rows = {}
+    units = revenue = 0
+    for line in _bucket_lines(OrderItem.objects.filter(order=order)):
+        key = (day, line['bucket_genre'], line['bucket_artist_type'])
+        rows[key] = (placed, placed * line['line_units'], placed * line['line_revenue'], cancelled)
+        units += line['line_units']
+        revenue += line['line_revenue']
+    if rows:
+        # Buckets before the day total, in every writer, for the same reason _add sorts its rows
+        _add(SalesDailyRollup, ('day', 'genre', 'artist_type'), rows)
+        _add(SalesDailyTotal, ('day',), {(day,): (placed, placed * units, placed * revenue, cancelled)})
+
+
+def record_order_placed(order):
+    """Count a new order in its day's buckets; call after its items are created"""
+    if order.status == 'cancelled':
+        _apply(order, cancelled=1)
+    else:
+        _apply(order, placed=1)
+
+
+def record_status_change(order, old_status):
+    """Update the rollups for a status change; only moves in or out of 'cancelled' matter"""
+    if (old_status == 'cancelled') == (order.status == 'cancelled'):
+        return
+    if order.status == 'cancelled':
+        _apply(order, placed=-1, cancelled=1)
+    else:
+        _apply(order, placed=1, cancelled=-1)
+
+
+def _grouped_lines(item_model, since, until, **group_by):
+    """Counters for the order lines placed between since and until, grouped by day and group_by"""
+    live = ~Q(order__status='cancelled')
+    return (
+        item_model.objects.filter(order__created_at__date__gte=since, order__created_at__date__lte=until)
+        .annotate(day=TruncDate('order__created_at'))
+        .values('day', **group_by)
+        .annotate(
+            placed_orders=Count('order', distinct=True, filter=live),
+            placed_units=Coalesce(Sum('quantity', filter=live), 0),
+            placed_revenue=Coalesce(Sum(F('price') * F('quantity'), filter=live), 0),
+            cancelled_orders=Count('order', distinct=True, filter=~live),
+        )
+        .order_by()
+    )
+
+
+def rebuild_rollups(since, until):
+    """
+    Recompute the rollups for orders placed between the dates since and until
+    (inclusive) with grouped queries over live and archived order lines, per
+    bucket and per day. Returns the number of bucket rows written.
+    """
+    buckets = {}
+    days = {}
+
+    def count(rows, key, line):
+        counts = (line['placed_orders'], line['placed_units'], line['placed_revenue'], line['cancelled_orders'])
+        rows[key] = tuple(map(sum, zip(rows.get(key, (0, 0, 0, 0)), counts)))
+
+    for item_model in (OrderItem, ArchivedOrderItem):
+        for line in _grouped_lines(item_model, since, until, **_buckets()):
+            count(buckets, (line['day'], line['bucket_genre'], line['bucket_artist_type']), line)
+        for line in _grouped_lines(item_model, since, until):
+            count(days, line['day'], line)
+
+    with transaction.atomic():
+        SalesDailyRollup.objects.filter(day__gte=since, day__lte=until).delete()
+        SalesDailyTotal.objects.filter(day__gte=since, day__lte=until).delete()
+        SalesDailyTotal.objects.bulk_create([
+            SalesDailyTotal(day=day, orders=orders, units=units, revenue=revenue, cancellations=cancellations)
+            for day, (orders, units, revenue, cancellations) in days.items()
+        ], batch_size=1000)
+        created = SalesDailyRollup.objects.bulk_create([
+            SalesDailyRollup(
+                day=day, genre=genre, artist_type=artist_type,
+                orders=orders, units=units, revenue=revenue, cancellations=cancellations,
+            )
+            for (day, genre, artist_type), (orders, units, revenue, cancellations) in buckets.items()
+        ], batch_size=1000)
+    return len(created)
+
+
+def sales_summary(days=30, limit=5):
+    """
+    Totals, per-day figures and top genres / artist types for the last ``days``
+    days, read from the rollups only. Used by the admin dashboard module.
+
+    Order and cancellation counts come from the day totals only: an order
+    spanning several genres or artist types has no single bucket to count in,
+    so the breakdowns carry just units and revenue.
+    """
+    since = timezone.localdate() - timedelta(days=days - 1)
+    totals = SalesDailyTotal.objects.filter(day__gte=since).order_by()
+    rollups = SalesDailyRollup.objects.filter(day__gte=since).order_by()
+    sums = {f'total_{name}': Coalesce(Sum(name), 0) for name in COUNTERS}
+    line_sums = {name: sums[name] for name in ('total_units', 'total_revenue')}
+
+    return {
+        'since': since,
+        'totals': totals.aggregate(**sums),
+        'by_day': list(totals.values('day').annotate(**sums).order_by('-day')),
+        'by_genre': list(rollups.values('genre').annotate(**line_sums).order_by('-total_revenue')[:limit]),
+        'by_artist_type': list(rollups.values('artist_type').annotate(**line_sums).order_by('-total_revenue')),
+    }
@@ -0,0 +1,152 @@
+from django.test import TestCase, Client
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from io import StringIO
+from apps.vinyl.models import VinylRecord, Artist, Genre, Label
+from apps.cart.models import Cart, CartItem
+from apps.orders.models import Order
+from apps.orders.tests import CHECKOUT_DATA
+from .models import SalesDailyRollup, SalesDailyTotal
+from .rollups import rebuild_rollups, sales_summary
+
+
+def make_vinyl(title, genre, artist_type, price):
+    artist, _ = Artist.objects.get_or_create(name=f'{artist_type} artist', defaults={'artist_type': artist_type})
+    genre = Genre.objects.get_or_create(name=genre)[0] if genre else None
+    label, _ = Label.objects.get_or_create(name='Test Label')
+    return VinylRecord.objects.create(
+        title=title, artist=artist, genre=genre, label=label, price=price, stock_quantity=10, release_year=2023,
+    )
+
+
+class SalesRollupTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.login(username='buyer', password='testpass123')
+        self.jazz_band = make_vinyl('Jazz Band', 'Jazz', 'band', 300)
+        self.jazz_solo = make_vinyl('Jazz Solo', 'Jazz', 'solo', 200)
+        self.untagged = make_vinyl('Untagged', None, 'band', 100)
+
+    def place_order(self, *lines):
+        for vinyl, quantity in lines:
+            CartItem.objects.create(cart=self.cart, vinyl_record=vinyl, quantity=quantity)
+        self.client.post(reverse('orders:create'), CHECKOUT_DATA)
+        return Order.objects.filter(user=self.user).latest('created_at')
+
+    def snapshot(self):
+        return {
+            (row.genre, row.artist_type): (row.orders, row.units, row.revenue, row.cancellations)
+            for row in SalesDailyRollup.objects.all()
+        }
+
+    def day_totals(self):
+        return [(row.orders, row.units, row.revenue, row.cancellations) for row in SalesDailyTotal.objects.all()]
+
+    def test_orders_and_cancellations_update_rollups(self):
+        """Test checkout adds to each bucket and cancelling moves the order to cancellations"""
+        first = self.place_order((self.jazz_band, 2), (self.jazz_solo, 1))
+        self.place_order((self.jazz_band, 1), (self.untagged, 3))
+
+        self.assertEqual(self.snapshot(), {
+            ('Jazz', 'band'): (2, 3, 900, 0),
+            ('Jazz', 'solo'): (1, 1, 200, 0),
+            ('', 'band'): (1, 3, 300, 0),
+        })
+        self.assertEqual(self.day_totals(), [(2, 7, 1400, 0)])
+        self.assertEqual(SalesDailyRollup.objects.get(genre='Jazz', artist_type='band').day, timezone.localdate())
+
+        self.client.post(reverse('orders:cancel', args=[first.order_id]))
+
+        self.assertEqual(self.snapshot(), {
+            ('Jazz', 'band'): (1, 1, 300, 1),
+            ('Jazz', 'solo'): (0, 0, 0, 1),
+            ('', 'band'): (1, 3, 300, 0),
+        })
+        self.assertEqual(self.day_totals(), [(1, 4, 600, 1)])
+
+    def test_pay_later_orders_cancel_cleanly(self):
+        """Test an unpaid order is counted like any other and cancelling it leaves stock untouched"""
+        self.place_order((self.jazz_band, 2))
+        CartItem.objects.create(cart=self.cart, vinyl_record=self.jazz_solo, quantity=1)
+        self.client.post(reverse('cart:place_order_no_payment'))
+        unpaid = Order.objects.filter(user=self.user).latest('created_at')
+        self.assertEqual((unpaid.item_count, unpaid.subtotal, unpaid.total_amount), (1, 200, 200))
+        self.assertEqual(unpaid.items.get().vinyl_title, 'Jazz Solo')
+        self.assertEqual(self.snapshot()[('Jazz', 'solo')], (1, 1, 200, 0))
+
+        self.client.post(reverse('orders:cancel', args=[unpaid.order_id]))
+
+        unpaid.refresh_from_db()
+        self.assertEqual(unpaid.status, 'cancelled')
+        self.assertEqual(self.snapshot(), {
+            ('Jazz', 'band'): (1, 2, 600, 0),
+            ('Jazz', 'solo'): (0, 0, 0, 1),
+        })
+        self.jazz_solo.refresh_from_db()
+        self.assertEqual(self.jazz_solo.stock_quantity, 10)
+
+    def test_rebuild_matches_incremental_rollups(self):
+        """Test the backfill produces the same figures as the incremental updates"""
+        first = self.place_order((self.jazz_band, 2), (self.jazz_solo, 1))
+        self.place_order((self.jazz_band, 1), (self.untagged, 3))
+        self.client.post(reverse('orders:cancel', args=[first.order_id]))
+        incremental = self.snapshot(), self.day_totals()
+
+        SalesDailyRollup.objects.all().delete()
+        SalesDailyTotal.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_sales_rollups', stdout=out)
+
+        self.assertEqual((self.snapshot(), self.day_totals()), incremental)
+        self.assertIn('Rebuilt 3 rollup rows', out.getvalue())
+
+        today = timezone.localdate()
+        self.assertEqual(rebuild_rollups(today, today), 3)
+        self.assertEqual((self.snapshot(), self.day_totals()), incremental)
+
+    def test_admin_status_change_updates_rollups(self):
+        """Test cancelling and restoring an order in the admin keeps the rollups in step"""
+        order = self.place_order((self.jazz_band, 1))
+        User.objects.create_superuser(username='staff', email='staff@example.com', password='testpass123')
+        self.client.login(username='staff', password='testpass123')
+        url = reverse('admin:orders_order_change', args=[order.id])
+
+        def set_status(status):
+            data = {
+                'user': order.user_id, 'status': status, 'email': order.email, 'first_name': order.first_name,
+                'last_name': order.last_name, 'address_line_1': order.address_line_1, 'city': order.city,
+                'postal_code': order.postal_code, 'country': order.country, 'total_amount': order.total_amount,
+                'shipping_cost': order.shipping_cost, 'items-TOTAL_FORMS': 0, 'items-INITIAL_FORMS': 0,
+            }
+            response = self.client.post(url, data)
+            self.assertEqual(response.status_code, 302)
+
+        set_status('cancelled')
+        self.assertEqual(self.snapshot(), {('Jazz', 'band'): (0, 0, 0, 1)})
+        set_status('confirmed')
+        set_status('shipped')
+        self.assertEqual(self.snapshot(), {('Jazz', 'band'): (1, 1, 300, 0)})
+
+    def test_dashboard_reads_only_rollups(self):
+        """Test the summary behind the dashboard widget never touches orders"""
+        self.place_order((self.jazz_band, 2), (self.untagged, 1))
+
+        with CaptureQueriesContext(connection) as ctx:
+            summary = sales_summary(days=7)
+        self.assertTrue(all('orders_order' not in query['sql'] for query in ctx.captured_queries))
+        self.assertEqual(summary['totals']['total_revenue'], 700)
+        # One order across two buckets is still one order
+        self.assertEqual(summary['totals']['total_orders'], 1)
+        self.assertEqual(summary['by_day'][0]['total_orders'], 1)
+        self.assertEqual(summary['by_genre'][0]['genre'], 'Jazz')
+
+        User.objects.create_superuser(username='staff', email='staff@example.com', password='testpass123')
+        self.client.login(username='staff', password='testpass123')
+        response = self.client.get(reverse('admin:index'))
+        self.assertContains(response, '$700')
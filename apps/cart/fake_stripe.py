@@ -0,0 +1,214 @@
+"""
+A small local stand-in for the Stripe Checkout API, for load tests and CI.
+
+Implements just what the shop uses:
+
+    POST /v1/checkout/sessions          create (honours Idempotency-Key)
+    GET  /v1/checkout/sessions/<id>     retrieve
+    GET  /pay/<id>                      hosted "payment page": marks the session
+                                        paid, posts a signed checkout.session.completed
+                                        webhook and redirects to success_url
+
+Latency and failure rate can be injected to exercise timeouts and retries.
+Run it with ``python manage.py run_fake_stripe`` and set
+STRIPE_API_BASE=http://127.0.0.1:12111.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+from urllib.request import Request, urlopen
+import hashlib
+import hmac
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+
+SESSION_PATH = re.compile(r'^/v1/checkout/sessions/(?P<id>[\w-]+)$')
+PAY_PATH = re.compile(r'^/pay/(?P<id>[\w-]+)$')
+
+
+def parse_stripe_form(body):
+    """Decode Stripe's bracketed form encoding (a[0][b]=c) into dicts and lists"""
+    result = {}
+    for key, value in parse_qsl(body, keep_blank_values=True):
+        parts = re.findall(r'[^\[\]]+', key)
+        node = result
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = value
+    return _listify(result)
+
+
+def _listify(node):
+    if not isinstance(node, dict):
+        return node
+    node = {key: _listify(value) for key, value in node.items()}
+    if node and all(key.isdigit() for key in node):
+        return [node[key] for key in sorted(node, key=int)]
+    return node
+
+
+def sign_webhook(payload, secret, timestamp=None):
+    """Return a Stripe-Signature header value for payload"""
+    timestamp = timestamp or int(time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, failure_rate=0.0, webhook_url='', webhook_secret=''):
+        super().__init__(address, FakeStripeHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.webhook_url = webhook_url
+        self.webhook_secret = webhook_secret
+        self.sessions = {}
+        self.idempotency = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients that gave up (timeouts under test) are expected, not worth a traceback
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        """Serve on a background thread and return self"""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def complete_session(self, session_id):
+        """Mark a session paid and deliver checkout.session.completed"""
+        with self.lock:
+            session = self.sessions[session_id]
+            session['status'] = 'complete'
+            session['payment_status'] = 'paid'
+            session['payment_intent'] = f'pi_fake_{uuid.uuid4().hex[:24]}'
+
+        if self.webhook_url:
+            payload = json.dumps({
+                'id': f'evt_fake_{uuid.uuid4().hex[:24]}',
+                'object': 'event',
+                'type': 'checkout.session.completed',
+                'data': {'object': session},
+            })
+            request = Request(self.webhook_url, data=payload.encode(), method='POST', headers={
+                'Content-Type': 'application/json',
+                'Stripe-Signature': sign_webhook(payload, self.webhook_secret),
+            })
+            urlopen(request, timeout=10).close()
+        return session
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    server_version = 'FakeStripe/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Request-Id', f'req_fake_{uuid.uuid4().hex[:14]}')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, message, error_type='api_error'):
+        self.send_json(status, {'error': {'type': error_type, 'message': message}})
+
+    def simulate_conditions(self):
+        """Apply injected latency and failures; returns False if the request failed"""
+        server = self.server
+        with server.lock:
+            server.requests += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if server.failure_rate and random.random() < server.failure_rate:
+            self.send_error_json(500, 'Injected failure from fake Stripe server')
+            return False
+        return True
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        if path != '/v1/checkout/sessions':
+            return self.send_error_json(404, f'Unrecognized request URL (POST: {path})', 'invalid_request_error')
+
+        length = int(self.headers.get('Content-Length') or 0)
+        params = parse_stripe_form(self.rfile.read(length).decode())
+
+        if not self.simulate_conditions():
+            return
+
+        server = self.server
+        key = self.headers.get('Idempotency-Key')
+        with server.lock:
+            if key and key in server.idempotency:
+                return self.send_json(200, server.sessions[server.idempotency[key]])
+
+            session_id = f'cs_test_fake_{uuid.uuid4().hex}'
+            line_items = params.get('line_items', [])
+            amount_total = sum(
+                int(line['price_data']['unit_amount']) * int(line.get('quantity', 1))
+                for line in line_items
+            )
+            session = {
+                'id': session_id,
+                'object': 'checkout.session',
+                'mode': params.get('mode', 'payment'),
+                'status': 'open',
+                'payment_status': 'unpaid',
+                'payment_intent': None,
+                'amount_total': amount_total,
+                'currency': line_items[0]['price_data']['currency'] if line_items else 'hkd',
+                'customer_email': params.get('customer_email'),
+                'customer_details': {'email': params.get('customer_email'), 'address': None},
+                'metadata': params.get('metadata', {}),
+                'success_url': params.get('success_url', ''),
+                'cancel_url': params.get('cancel_url', ''),
+                'url': f'{server.base_url}/pay/{session_id}',
+            }
+            server.sessions[session_id] = session
+            if key:
+                server.idempotency[key] = session_id
+
+        self.send_json(200, session)
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+
+        match = SESSION_PATH.match(path)
+        if match:
+            if not self.simulate_conditions():
+                return
+            session = self.server.sessions.get(match['id'])
+            if session is None:
+                return self.send_error_json(404, f"No such checkout.session: '{match['id']}'", 'invalid_request_error')
+            return self.send_json(200, session)
+
+        match = PAY_PATH.match(path)
+        if match and match['id'] in self.server.sessions:
+            session = self.server.complete_session(match['id'])
+            self.send_response(303)
+            self.send_header('Location', session['success_url'].replace('{CHECKOUT_SESSION_ID}', session['id']))
+            self.end_headers()
+            return
+
+        self.send_error_json(404, f'Unrecognized request URL (GET: {path})', 'invalid_request_error')
+
+
+def serve(host='127.0.0.1', port=12111, **options):
+    """Create a FakeStripeServer; call .start() or .serve_forever() on it"""
+    return FakeStripeServer((host, port), **options)
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.conf import settings
+from apps.cart.fake_stripe import serve
+
+
+class Command(BaseCommand):
+    help = '''
+    Run a local fake Stripe Checkout API for load tests and CI.
+
+    USAGE:
+        python manage.py run_fake_stripe
+        python manage.py run_fake_stripe --latency 0.4 --failure-rate 0.05
+        python manage.py run_fake_stripe --webhook-url http://127.0.0.1:8000/cart/stripe-webhook/
+
+    Then start the site with STRIPE_API_BASE=http://127.0.0.1:12111
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=12111)
+        parser.add_argument('--latency', type=float, default=0.0, help='Seconds to sleep before answering each API call')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of API calls answered with HTTP 500')
+        parser.add_argument('--webhook-url', default='', help='Where to POST checkout.session.completed when a session is paid')
+        parser.add_argument('--webhook-secret', default=settings.STRIPE_WEBHOOK_SECRET, help='Secret used to sign webhook events')
+
+    def handle(self, *args, **options):
+        server = serve(
+            options['host'],
+            options['port'],
+            latency=options['latency'],
+            failure_rate=options['failure_rate'],
+            webhook_url=options['webhook_url'],
+            webhook_secret=options['webhook_secret'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Fake Stripe listening on {server.base_url}'))
+        self.stdout.write(f'Set STRIPE_API_BASE={server.base_url} to point the shop at it')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            self.stdout.write('\nStopping fake Stripe')
+        finally:
+            server.server_close()
@@ -0,0 +1,283 @@
+"""
+Payment gateway: the only place the shop talks to Stripe.
+
+Every call gets its own timeout (STRIPE_TIMEOUTS), a bounded number of
+retries with jittered exponential backoff on transient failures, and its
+latency recorded in ``metrics``. Point STRIPE_API_BASE at the bundled fake
+server (``python manage.py run_fake_stripe``) for load tests and CI.
+
+The ``a``-prefixed functions are the async variants for ASGI views. They use
+a pooled httpx.AsyncClient per event loop so connections to Stripe are
+reused, and fall back to running the sync call in a worker thread when
+httpx isn't installed.
+"""
+from collections import deque
+from asgiref.sync import sync_to_async
+from django.conf import settings
+import asyncio
+import hashlib
+import logging
+import random
+import threading
+import time
+import weakref
+import stripe
+
+try:
+    import httpx  # noqa: F401  (needed by stripe.HTTPXClient)
+    HAS_HTTPX = True
+except ImportError:
+    HAS_HTTPX = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 10
+
+
+class LatencyMetrics:
+    """Thread-safe per-operation call counts and latency percentiles"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    def record(self, operation, elapsed_ms, ok=True, retries=0):
+        with self._lock:
+            stats = self._stats.setdefault(operation, {
+                'calls': 0,
+                'errors': 0,
+                'retries': 0,
+                'samples': deque(maxlen=self.window),
+            })
+            stats['calls'] += 1
+            stats['retries'] += retries
+            if not ok:
+                stats['errors'] += 1
+            stats['samples'].append(elapsed_ms)
+
+    def snapshot(self):
+        """Return {operation: {calls, errors, retries, p50_ms, p95_ms, max_ms}}"""
+        with self._lock:
+            result = {}
+            for operation, stats in self._stats.items():
+                samples = sorted(stats['samples'])
+                result[operation] = {
+                    'calls': stats['calls'],
+                    'errors': stats['errors'],
+                    'retries': stats['retries'],
+                    'p50_ms': _percentile(samples, 50),
+                    'p95_ms': _percentile(samples, 95),
+                    'max_ms': samples[-1] if samples else 0,
+                }
+            return result
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0
+    index = min(len(samples) - 1, int(round(pct / 100 * (len(samples) - 1))))
+    return samples[index]
+
+
+metrics = LatencyMetrics()
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _get_client(timeout):
+    """Return a StripeClient whose HTTP client enforces ``timeout`` seconds"""
+    api_base = getattr(settings, 'STRIPE_API_BASE', '') or None
+    key = (settings.STRIPE_SECRET_KEY, api_base, timeout)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = stripe.StripeClient(
+                settings.STRIPE_SECRET_KEY,
+                base_addresses={'api': api_base} if api_base else None,
+                http_client=stripe.new_default_http_client(timeout=timeout),
+                max_network_retries=0,  # Retries are handled by _call so they can be bounded and measured
+            )
+        return _clients[key]
+
+
+# Async clients are bound to the event loop that created their connection pool
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _get_async_client(timeout):
+    """Return a StripeClient backed by this event loop's pooled httpx client"""
+    api_base = getattr(settings, 'STRIPE_API_BASE', '') or None
+    key = (settings.STRIPE_SECRET_KEY, api_base, timeout)
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    if key not in clients:
+        clients[key] = stripe.StripeClient(
+            settings.STRIPE_SECRET_KEY,
+            base_addresses={'api': api_base} if api_base else None,
+            http_client=stripe.HTTPXClient(timeout=timeout),
+            max_network_retries=0,
+        )
+    return clients[key]
+
+
+def _is_retryable(error):
+    if isinstance(error, (stripe.error.APIConnectionError, stripe.error.RateLimitError)):
+        return True
+    return isinstance(error, stripe.error.APIError) and (error.http_status or 500) >= 500
+
+
+def _backoff(attempt):
+    """Exponential backoff with full jitter: uniform(0, base * 2**attempt)"""
+    base = getattr(settings, 'STRIPE_RETRY_BACKOFF', 0.25)
+    return random.uniform(0, base * (2 ** attempt))
+
+
+def _call(operation, func):
+    """Run func(client) with the operation's timeout, retries and metrics"""
+    timeout = getattr(settings, 'STRIPE_TIMEOUTS', {}).get(operation, DEFAULT_TIMEOUT)
+    max_retries = getattr(settings, 'STRIPE_MAX_RETRIES', 2)
+    client = _get_client(timeout)
+
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            result = func(client)
+        except stripe.error.StripeError as e:
+            if attempt < max_retries and _is_retryable(e):
+                delay = _backoff(attempt)
+                attempt += 1
+                logger.warning('Stripe %s failed (%s), retry %d in %.2fs', operation, e.__class__.__name__, attempt, delay)
+                time.sleep(delay)
+                continue
+            elapsed_ms = (time.monotonic() - started) * 1000
+            metrics.record(operation, elapsed_ms, ok=False, retries=attempt)
+            logger.error('Stripe %s failed after %d attempt(s) in %.0fms: %s', operation, attempt + 1, elapsed_ms, e)
+            raise
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        metrics.record(operation, elapsed_ms, retries=attempt)
+        logger.info('Stripe %s took %.0fms (%d retries)', operation, elapsed_ms, attempt)
+        return result
+
+
+async def _acall(operation, func):
+    """Async twin of _call: func(client) must return an awaitable"""
+    timeout = getattr(settings, 'STRIPE_TIMEOUTS', {}).get(operation, DEFAULT_TIMEOUT)
+    max_retries = getattr(settings, 'STRIPE_MAX_RETRIES', 2)
+    client = _get_async_client(timeout)
+
+    started = time.monotonic()
+    attempt = 0
+    while True:
+        try:
+            result = await func(client)
+        except stripe.error.StripeError as e:
+            if attempt < max_retries and _is_retryable(e):
+                delay = _backoff(attempt)
+                attempt += 1
+                logger.warning('Stripe %s failed (%s), retry %d in %.2fs', operation, e.__class__.__name__, attempt, delay)
+                await asyncio.sleep(delay)
+                continue
+            elapsed_ms = (time.monotonic() - started) * 1000
+            metrics.record(operation, elapsed_ms, ok=False, retries=attempt)
+            logger.error('Stripe %s failed after %d attempt(s) in %.0fms: %s', operation, attempt + 1, elapsed_ms, e)
+            raise
+
+        elapsed_ms = (time.monotonic() - started) * 1000
+        metrics.record(operation, elapsed_ms, retries=attempt)
+        logger.info('Stripe %s took %.0fms (%d retries)', operation, elapsed_ms, attempt)
+        return result
+
+
+def checkout_idempotency_key(user_id, cart_id, lines, attempt=''):
+    """
+    Derive an idempotency key for one checkout attempt.
+
+    ``lines`` are (cart_item_id, vinyl_record_id, quantity, unit_amount)
+    tuples and ``attempt`` is whatever else tells attempts apart. A
+    double-submitted checkout for an unchanged cart maps to the same Stripe
+    session, while any change to the cart yields a new one - including
+    buying the same records again, since placing an order deletes the cart's
+    items and re-added ones get new ids.
+    """
+    payload = f'{user_id}|{cart_id}|{attempt}|' + '|'.join(
+        f'{item_id}:{vinyl_id}:{quantity}:{amount}' for item_id, vinyl_id, quantity, amount in sorted(lines)
+    )
+    return 'checkout-' + hashlib.sha256(payload.encode()).hexdigest()[:40]
+
+
+# Stripe caps metadata values at 500 characters (and a session at 50 keys)
+METADATA_VALUE_LIMIT = 500
+
+
+def checkout_lines_metadata(lines):
+    """
+    Pack (cart_item_id, vinyl_record_id, quantity, unit_amount) lines into
+    Checkout Session metadata as ``lines_0``, ``lines_1``, ... so the webhook
+    can build the order from what the session charged for rather than from
+    the cart as it is by then.
+    """
+    chunks = ['']
+    for line in lines:
+        encoded = ':'.join(str(value) for value in line)
+        if chunks[-1] and len(chunks[-1]) + 1 + len(encoded) > METADATA_VALUE_LIMIT:
+            chunks.append('')
+        chunks[-1] = f'{chunks[-1]},{encoded}' if chunks[-1] else encoded
+    return {f'lines_{i}': chunk for i, chunk in enumerate(chunks)}
+
+
+def checkout_lines(metadata):
+    """The lines packed by checkout_lines_metadata, or None for sessions created without them"""
+    if 'lines_0' not in metadata:
+        return None
+    lines = []
+    i = 0
+    while metadata.get(f'lines_{i}'):
+        for encoded in metadata[f'lines_{i}'].split(','):
+            item_id, vinyl_id, quantity, amount = (int(value) for value in encoded.split(':'))
+            lines.append((item_id, vinyl_id, quantity, amount))
+        i += 1
+    return lines
+
+
+def create_checkout_session(idempotency_key=None, **params):
+    """Create a Checkout Session; retried safely because the idempotency key is reused"""
+    options = {'idempotency_key': idempotency_key} if idempotency_key else {}
+    return _call(
+        'create_checkout_session',
+        lambda client: client.v1.checkout.sessions.create(params=params, options=options)
+    )
+
+
+def retrieve_checkout_session(session_id):
+    """Fetch a Checkout Session by id"""
+    return _call(
+        'retrieve_checkout_session',
+        lambda client: client.v1.checkout.sessions.retrieve(session_id)
+    )
+
+
+async def acreate_checkout_session(idempotency_key=None, **params):
+    """Async create_checkout_session"""
+    if not HAS_HTTPX:
+        return await sync_to_async(create_checkout_session, thread_sensitive=False)(idempotency_key, **params)
+    options = {'idempotency_key': idempotency_key} if idempotency_key else {}
+    return await _acall(
+        'create_checkout_session',
+        lambda client: client.v1.checkout.sessions.create_async(params=params, options=options)
+    )
+
+
+async def aretrieve_checkout_session(session_id):
+    """Async retrieve_checkout_session"""
+    if not HAS_HTTPX:
+        return await sync_to_async(retrieve_checkout_session, thread_sensitive=False)(session_id)
+    return await _acall(
+        'retrieve_checkout_session',
+        lambda client: client.v1.checkout.sessions.retrieve_async(session_id)
+    )
@@ -1,3 +1,325 @@
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, Client, override_settings
+from django.contrib.auth.models import User
+from django.urls import reverse
+from apps.vinyl.models import VinylRecord, Artist, Genre, Label
+from apps.cart.models import Cart, CartItem
+from apps.orders.models import Order
+from apps.cart import payments
+from apps.cart.fake_stripe import serve
+from apps.tasks.worker import run_pending
+from unittest import mock
+import hashlib
+import hmac
+import json
+import stripe
+import time
 
-# Create your tests here.
+
+WEBHOOK_SECRET = 'whsec_test_secret'
+
+
+def sign_payload(payload, secret=WEBHOOK_SECRET, timestamp=None):
+    """Build a Stripe-Signature header the way Stripe does"""
+    timestamp = timestamp or int(time.time())
+    signed = f'{timestamp}.{payload}'.encode()
+    signature = hmac.new(secret.encode(), signed, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+
+@override_settings(STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET)
+class StripeWebhookTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='payer', email='payer@example.com', password='testpass123')
+        artist = Artist.objects.create(name='Test Artist', artist_type='band')
+        self.vinyl = VinylRecord.objects.create(
+            title='Test Vinyl',
+            artist=artist,
+            genre=Genre.objects.create(name='Test Genre'),
+            label=Label.objects.create(name='Test Label'),
+            price=300,
+            stock_quantity=5,
+            release_year=2023,
+        )
+        self.cart = Cart.objects.create(user=self.user)
+        self.item = CartItem.objects.create(cart=self.cart, vinyl_record=self.vinyl, quantity=2)
+
+    def completed_event(self, session_id='cs_test_123', payment_status='paid', amount_total=60000):
+        metadata = {'user_id': str(self.user.id), 'cart_id': str(self.cart.id), 'total_amount': '600'}
+        metadata.update(payments.checkout_lines_metadata([(self.item.id, self.vinyl.id, 2, 30000)]))
+        return json.dumps({
+            'id': 'evt_test',
+            'object': 'event',
+            'type': 'checkout.session.completed',
+            'data': {'object': {
+                'id': session_id,
+                'object': 'checkout.session',
+                'payment_status': payment_status,
+                'payment_intent': 'pi_test_123',
+                'amount_total': amount_total,
+                'customer_details': {'email': 'payer@example.com', 'address': None},
+                'metadata': metadata,
+            }},
+        })
+
+    def post_event(self, payload, signature=None):
+        response = self.client.post(
+            reverse('cart:stripe_webhook'),
+            data=payload,
+            content_type='application/json',
+            HTTP_STRIPE_SIGNATURE=signature or sign_payload(payload),
+        )
+        run_pending()
+        return response
+
+    def test_rejects_bad_signature(self):
+        """Test events not signed with the webhook secret are refused"""
+        payload = self.completed_event()
+        response = self.post_event(payload, signature=sign_payload(payload, secret='whsec_wrong'))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_completed_session_creates_order_once(self):
+        """Test the first delivery finalizes the order and redeliveries are no-ops"""
+        payload = self.completed_event()
+        self.assertEqual(self.post_event(payload).status_code, 200)
+        self.assertEqual(self.post_event(payload).status_code, 200)
+
+        order = Order.objects.get(stripe_session_id='cs_test_123')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(order.status, 'confirmed')
+        self.assertEqual(order.total_amount, 600)
+        self.assertEqual(order.items.get().quantity, 2)
+        self.vinyl.refresh_from_db()
+        self.assertEqual(self.vinyl.stock_quantity, 3)
+        self.assertFalse(CartItem.objects.filter(cart=self.cart).exists())
+
+    def test_order_is_built_from_the_lines_paid_for(self):
+        """Test cart changes made after the session was created don't reach the order"""
+        other = VinylRecord.objects.create(
+            title='Added Later', artist=self.vinyl.artist, price=100, stock_quantity=5, release_year=2023,
+        )
+        CartItem.objects.filter(id=self.item.id).update(quantity=4)
+        CartItem.objects.create(cart=self.cart, vinyl_record=other, quantity=1)
+
+        self.post_event(self.completed_event())
+
+        order = Order.objects.get(stripe_session_id='cs_test_123')
+        self.assertEqual(order.status, 'confirmed')
+        self.assertEqual((order.item_count, order.subtotal, order.total_amount), (2, 600, 600))
+        self.assertEqual([(item.vinyl_record_id, item.quantity, item.price) for item in order.items.all()],
+                         [(self.vinyl.id, 2, 300)])
+        self.vinyl.refresh_from_db()
+        self.assertEqual(self.vinyl.stock_quantity, 3)
+        # Only the paid line leaves the cart
+        self.assertEqual(list(CartItem.objects.filter(cart=self.cart).values_list('vinyl_record', flat=True)),
+                         [other.id])
+
+    def test_amount_mismatch_is_flagged_for_review(self):
+        """Test an order whose lines don't add up to the amount paid is kept but left pending"""
+        self.post_event(self.completed_event(amount_total=50000))
+
+        order = Order.objects.get(stripe_session_id='cs_test_123')
+        self.assertEqual(order.status, 'pending')
+        self.assertEqual(order.total_amount, 500)
+        self.assertIn('Paid 50000 cents but the checkout lines come to 60000 - needs review', order.notes)
+
+    def test_paid_order_without_stock_cancels_without_releasing(self):
+        """Test an order paid for after the stock ran out returns nothing to stock when cancelled"""
+        VinylRecord.objects.filter(id=self.vinyl.id).update(stock_quantity=1)
+        self.post_event(self.completed_event())
+
+        order = Order.objects.get(stripe_session_id='cs_test_123')
+        self.assertEqual(order.status, 'pending')
+        self.assertFalse(order.stock_reserved)
+
+        self.client.login(username='payer', password='testpass123')
+        self.client.post(reverse('orders:cancel', args=[order.order_id]))
+        self.client.post(reverse('orders:cancel', args=[order.order_id]))
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'cancelled')
+        self.vinyl.refresh_from_db()
+        self.assertEqual(self.vinyl.stock_quantity, 1)
+
+    def test_unpaid_session_is_ignored(self):
+        """Test a session that hasn't been paid does not create an order"""
+        self.post_event(self.completed_event(payment_status='unpaid'))
+
+        self.assertFalse(Order.objects.exists())
+
+    def test_success_page_is_a_status_lookup(self):
+        """Test the success page reports processing until the webhook has run"""
+        self.client.login(username='payer', password='testpass123')
+        url = reverse('cart:payment_success') + '?session_id=cs_test_123'
+
+        with mock.patch('stripe.checkout.Session.retrieve') as retrieve:
+            response = self.client.get(url)
+            self.assertTrue(response.context['processing'])
+
+            self.post_event(self.completed_event())
+            response = self.client.get(url)
+            self.assertFalse(response.context['processing'])
+            self.assertEqual(response.context['order'].stripe_session_id, 'cs_test_123')
+            retrieve.assert_not_called()
+
+
+class FakeStripeMixin:
+    """Run the bundled fake Stripe server for the duration of a test class"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.fake_stripe = serve(port=0).start()
+        cls.stripe_settings = override_settings(
+            STRIPE_API_BASE=cls.fake_stripe.base_url,
+            STRIPE_SECRET_KEY='sk_test_fake',
+            STRIPE_RETRY_BACKOFF=0.01,
+            STRIPE_TIMEOUTS={'create_checkout_session': 0.5, 'retrieve_checkout_session': 0.5},
+        )
+        cls.stripe_settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stripe_settings.disable()
+        cls.fake_stripe.shutdown()
+        cls.fake_stripe.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.fake_stripe.latency = 0.0
+        self.fake_stripe.failure_rate = 0.0
+        self.fake_stripe.requests = 0
+        payments.metrics.reset()
+
+
+LINE_ITEMS = [{
+    'price_data': {
+        'currency': 'hkd',
+        'product_data': {'name': 'Test Vinyl', 'description': 'by Test Artist'},
+        'unit_amount': 30000,
+    },
+    'quantity': 2,
+}]
+
+
+class PaymentGatewayTestCase(FakeStripeMixin, SimpleTestCase):
+    def create_session(self, idempotency_key=None):
+        return payments.create_checkout_session(
+            idempotency_key=idempotency_key,
+            line_items=LINE_ITEMS,
+            mode='payment',
+            success_url='http://testserver/cart/payment-success/?session_id={CHECKOUT_SESSION_ID}',
+            cancel_url='http://testserver/cart/payment-cancel/',
+            metadata={'user_id': '1'},
+        )
+
+    def test_create_and_retrieve_session(self):
+        """Test sessions round-trip through the gateway and are measured"""
+        session = self.create_session()
+        fetched = payments.retrieve_checkout_session(session.id)
+
+        self.assertEqual(fetched.id, session.id)
+        self.assertEqual(fetched.amount_total, 60000)
+        stats = payments.metrics.snapshot()
+        self.assertEqual(stats['create_checkout_session']['calls'], 1)
+        self.assertEqual(stats['retrieve_checkout_session']['errors'], 0)
+
+    def test_checkout_lines_fit_stripe_metadata(self):
+        """Test long carts are split across metadata values Stripe accepts and read back in order"""
+        lines = [(1000 + i, 2000 + i, i % 3 + 1, 25990) for i in range(60)]
+        metadata = payments.checkout_lines_metadata(lines)
+
+        self.assertGreater(len(metadata), 1)
+        self.assertTrue(all(len(value) <= payments.METADATA_VALUE_LIMIT for value in metadata.values()))
+        self.assertEqual(payments.checkout_lines({'user_id': '1', **metadata}), lines)
+        self.assertIsNone(payments.checkout_lines({'user_id': '1'}))
+
+    def test_idempotency_key_returns_same_session(self):
+        """Test repeated creates for the same cart reuse one session"""
+        key = payments.checkout_idempotency_key(1, 7, [(9, 5, 2, 30000)])
+        self.assertEqual(key, payments.checkout_idempotency_key(1, 7, [(9, 5, 2, 30000)]))
+        self.assertNotEqual(key, payments.checkout_idempotency_key(1, 7, [(9, 5, 3, 30000)]))
+        # The same records re-added to the cart after an earlier purchase
+        self.assertNotEqual(key, payments.checkout_idempotency_key(1, 7, [(10, 5, 2, 30000)]))
+        self.assertNotEqual(key, payments.checkout_idempotency_key(1, 7, [(9, 5, 2, 30000)], attempt='async'))
+
+        self.assertEqual(self.create_session(key).id, self.create_session(key).id)
+
+    def test_server_errors_are_retried_then_raised(self):
+        """Test 5xx responses are retried a bounded number of times"""
+        self.fake_stripe.failure_rate = 1.0
+
+        with override_settings(STRIPE_MAX_RETRIES=2), self.assertLogs('apps.cart.payments', 'WARNING'):
+            with self.assertRaises(stripe.error.APIError):
+                self.create_session()
+
+        self.assertEqual(self.fake_stripe.requests, 3)
+        stats = payments.metrics.snapshot()['create_checkout_session']
+        self.assertEqual((stats['errors'], stats['retries']), (1, 2))
+
+    def test_slow_stripe_times_out(self):
+        """Test a call slower than its timeout fails instead of hanging"""
+        self.fake_stripe.latency = 1.0
+
+        with override_settings(STRIPE_MAX_RETRIES=0), self.assertLogs('apps.cart.payments', 'ERROR'):
+            with self.assertRaises(stripe.error.APIConnectionError):
+                self.create_session()
+
+        self.assertLess(payments.metrics.snapshot()['create_checkout_session']['max_ms'], 1000)
+
+
+class CheckoutSessionViewTestCase(FakeStripeMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        user = User.objects.create_user(username='shopper', email='shopper@example.com', password='testpass123')
+        vinyl = VinylRecord.objects.create(
+            title='Test Vinyl',
+            artist=Artist.objects.create(name='Test Artist'),
+            price=300,
+            stock_quantity=5,
+            release_year=2023,
+        )
+        CartItem.objects.create(cart=Cart.objects.create(user=user), vinyl_record=vinyl, quantity=1)
+        self.client.login(username='shopper', password='testpass123')
+
+    def test_checkout_redirects_to_hosted_page(self):
+        """Test the checkout view creates a session through the gateway"""
+        response = self.client.post(reverse('cart:create_checkout_session'))
+
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].startswith(f'{self.fake_stripe.base_url}/pay/'))
+
+    def test_async_checkout_redirects_to_hosted_page(self):
+        """Test the async checkout view creates the same session as the sync one"""
+        response = self.client.get(reverse('cart:create_checkout_session_async'))
+
+        self.assertEqual(response.status_code, 302)
+        session_id = response['Location'].rsplit('/', 1)[-1]
+        self.assertEqual(self.client.session['stripe_session_id'], session_id)
+        self.assertIn('/cart/payment-success/async/', self.fake_stripe.sessions[session_id]['success_url'])
+
+        # An unchanged cart reuses the session through the idempotency key
+        response = self.client.get(reverse('cart:create_checkout_session_async'))
+        self.assertTrue(response['Location'].endswith(session_id))
+
+        # The sync view sends other parameters, so it mustn't reuse the async view's key
+        response = self.client.post(reverse('cart:create_checkout_session'))
+        sync_session_id = response['Location'].rsplit('/', 1)[-1]
+        self.assertNotEqual(sync_session_id, session_id)
+        self.assertIn('/cart/payment-success/?', self.fake_stripe.sessions[sync_session_id]['success_url'])
+
+    def test_async_success_page_checks_unfinished_sessions(self):
+        """Test the async success page reports unpaid sessions and waits on paid ones"""
+        response = self.client.get(reverse('cart:create_checkout_session_async'))
+        session_id = response['Location'].rsplit('/', 1)[-1]
+        url = reverse('cart:payment_success_async') + f'?session_id={session_id}'
+
+        self.assertRedirects(self.client.get(url), reverse('cart:view'), fetch_redirect_response=False)
+
+        self.fake_stripe.complete_session(session_id)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['processing'])
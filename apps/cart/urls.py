@@ -17,7 +17,10 @@ urlpatterns = [
     # Stripe Payment URLs
     path('create-checkout-session/', views.create_checkout_session, name='create_checkout_session'),
     path('payment-success/', views.payment_success, name='payment_success'),
+    path('create-checkout-session/async/', views.create_checkout_session_async, name='create_checkout_session_async'),
+    path('payment-success/async/', views.payment_success_async, name='payment_success_async'),
     path('payment-cancel/', views.payment_cancel, name='payment_cancel'),
+    path('stripe-webhook/', views.stripe_webhook, name='stripe_webhook'),
 
     # Order without payment
     path('place-order-no-payment/', views.place_order_no_payment, name='place_order_no_payment'),
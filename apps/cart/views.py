@@ -1,18 +1,23 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
+from django.db import transaction
 from django.db.models import Sum, F
 from .models import Cart, CartItem
 from apps.vinyl.models import VinylRecord
 import json
 import stripe
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.urls import reverse
 from apps.orders.models import Order
+from apps.orders.services import create_order_items, order_totals
+from apps.analytics.rollups import record_order_placed
+from . import payments
 
 # Configure Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -293,53 +298,68 @@ def checkout_view(request):
     return render(request, 'cart/checkout.html', context)
 
 
+def build_checkout_params(request, user, cart, cart_items, success_view='cart:payment_success'):
+    """Return (idempotency_key, params) for a Stripe Checkout Session covering cart_items"""
+    line_items = []
+    total_amount = 0
+    
+    for item in cart_items:
+        line_item = {
+            'price_data': {
+                'currency': settings.STRIPE_CURRENCY,
+                'product_data': {
+                    'name': item.vinyl_record.title,
+                    'description': f'by {item.vinyl_record.artist.name}',
+                },
+                'unit_amount': int(item.vinyl_record.price * 100),  # Convert to cents
+            },
+            'quantity': item.quantity,
+        }
+        line_items.append(line_item)
+        total_amount += item.get_total_price()
+    
+    # Same cart items -> same idempotency key -> same Stripe session. The sync
+    # and async views send different success URLs, so each gets its own key
+    last_change = max(item.updated_at for item in cart_items)
+    lines = [
+        (item.id, item.vinyl_record_id, item.quantity, line['price_data']['unit_amount'])
+        for item, line in zip(cart_items, line_items)
+    ]
+    idempotency_key = payments.checkout_idempotency_key(
+        user.id, cart.id, lines, attempt=f'{success_view}|{last_change.isoformat()}',
+    )
+    params = {
+        'payment_method_types': ['card'],
+        'line_items': line_items,
+        'mode': 'payment',
+        'customer_email': user.email,
+        'success_url': request.build_absolute_uri(reverse(success_view)) + '?session_id={CHECKOUT_SESSION_ID}',
+        'cancel_url': request.build_absolute_uri(reverse('cart:payment_cancel')),
+        'metadata': {
+            'user_id': str(user.id),
+            'cart_id': str(cart.id),
+            'total_amount': str(total_amount),
+            # What this session charges for; the webhook builds the order from it
+            **payments.checkout_lines_metadata(lines),
+        },
+    }
+    return idempotency_key, params
+
+
 @login_required
 def create_checkout_session(request):
     """Create Stripe checkout session"""
-    # Debug: Check if API key is set
-    print(f"DEBUG: Stripe API key set: {stripe.api_key[:20] if stripe.api_key else 'NOT SET'}")
-    print(f"DEBUG: Settings STRIPE_SECRET_KEY: {settings.STRIPE_SECRET_KEY[:20] if settings.STRIPE_SECRET_KEY else 'NOT SET'}")
-    
     cart = get_or_create_cart(request)
-    cart_items = CartItem.objects.filter(cart=cart).select_related('vinyl_record')
+    cart_items = CartItem.objects.filter(cart=cart).select_related('vinyl_record__artist')
     
     if not cart_items.exists():
         messages.error(request, 'Your cart is empty!')
         return redirect('cart:view')
     
     try:
-        # Build line items for Stripe
-        line_items = []
-        total_amount = 0
-        
-        for item in cart_items:
-            line_item = {
-                'price_data': {
-                    'currency': settings.STRIPE_CURRENCY,
-                    'product_data': {
-                        'name': item.vinyl_record.title,
-                        'description': f'by {item.vinyl_record.artist.name}',
-                    },
-                    'unit_amount': int(item.vinyl_record.price * 100),  # Convert to cents
-                },
-                'quantity': item.quantity,
-            }
-            line_items.append(line_item)
-            total_amount += item.get_total_price()
-        
         # Create Stripe checkout session
-        checkout_session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=line_items,
-            mode='payment',
-            customer_email=request.user.email,
-            success_url=request.build_absolute_uri(reverse('cart:payment_success')) + '?session_id={CHECKOUT_SESSION_ID}',
-            cancel_url=request.build_absolute_uri(reverse('cart:payment_cancel')),
-            metadata={
-                'user_id': request.user.id,
-                'total_amount': str(total_amount),
-            }
-        )
+        idempotency_key, params = build_checkout_params(request, request.user, cart, cart_items)
+        checkout_session = payments.create_checkout_session(idempotency_key=idempotency_key, **params)
         
         # Store session ID in session for later use
         request.session['stripe_session_id'] = checkout_session.id
@@ -354,52 +374,113 @@ def create_checkout_session(request):
         return redirect('cart:view')
 
 
+@login_required
+async def create_checkout_session_async(request):
+    """Create Stripe checkout session without holding a worker while Stripe responds"""
+    user = await request.auser()
+    cart, created = await Cart.objects.aget_or_create(
+        user=user,
+        defaults={'session_key': request.session.session_key}
+    )
+    cart_items = [
+        item async for item in CartItem.objects.filter(cart=cart).select_related('vinyl_record__artist')
+    ]
+    
+    if not cart_items:
+        messages.error(request, 'Your cart is empty!')
+        return redirect('cart:view')
+    
+    try:
+        idempotency_key, params = build_checkout_params(
+            request, user, cart, cart_items, success_view='cart:payment_success_async'
+        )
+        checkout_session = await payments.acreate_checkout_session(idempotency_key=idempotency_key, **params)
+    except stripe.error.StripeError as e:
+        messages.error(request, f'Payment error: {str(e)}')
+        return redirect('cart:view')
+    
+    # Store session ID in session for later use
+    await request.session.aset('stripe_session_id', checkout_session.id)
+    
+    return redirect(checkout_session.url)
+
+
+@login_required
 def payment_success(request):
-    """Handle successful payment"""
+    """Show the order for a completed Checkout Session (created by the webhook)"""
     session_id = request.GET.get('session_id')
     
     if not session_id:
         messages.error(request, 'Payment session not found!')
         return redirect('cart:view')
     
-    try:
-        # Retrieve the session from Stripe
-        session = stripe.checkout.Session.retrieve(session_id)
+    # The webhook finalizes the order; this page only looks it up
+    order = Order.objects.filter(stripe_session_id=session_id, user=request.user).first()
+    
+    return render(request, 'cart/payment_success.html', {
+        'order': order,
+        'session_id': session_id,
+        'processing': order is None,
+    })
+
+
+@login_required
+async def payment_success_async(request):
+    """
+    Async payment_success. While the webhook hasn't created the order yet,
+    the session is retrieved from Stripe (without blocking a worker) so an
+    abandoned or failed payment is reported instead of spinning forever.
+    """
+    session_id = request.GET.get('session_id')
+    
+    if not session_id:
+        messages.error(request, 'Payment session not found!')
+        return redirect('cart:view')
+    
+    user = await request.auser()
+    order = await Order.objects.filter(stripe_session_id=session_id, user=user).afirst()
+    session = None
+    
+    if order is None:
+        try:
+            session = await payments.aretrieve_checkout_session(session_id)
+        except stripe.error.StripeError:
+            pass  # Keep showing the processing state; the webhook is the source of truth
         
-        if session.payment_status == 'paid':
-            # Get cart and create order
-            cart = get_or_create_cart(request)
-            cart_items = CartItem.objects.filter(cart=cart).select_related('vinyl_record')
-            
-            # Create order
-            order = Order.objects.create(
-                user=request.user,
-                email=request.user.email,
-                first_name=request.user.first_name or 'Customer',
-                last_name=request.user.last_name or '',
-                address_line_1='To be updated',  # User can update this later
-                city='Hong Kong',
-                postal_code='000000',
-                total_amount=int(float(session.metadata.get('total_amount', 0))),
-                status='confirmed',
-                notes=f'Stripe Payment ID: {session.payment_intent}'
-            )
-            
-            # Clear the cart
-            cart_items.delete()
-            
-            messages.success(request, f'Payment successful! Order #{order.order_id} has been created.')
-            return render(request, 'cart/payment_success.html', {
-                'order': order,
-                'session': session
-            })
-        else:
+        if session is not None and session.payment_status != 'paid' and session.status != 'complete':
             messages.error(request, 'Payment was not completed successfully.')
             return redirect('cart:view')
-            
-    except stripe.error.StripeError as e:
-        messages.error(request, f'Payment verification failed: {str(e)}')
-        return redirect('cart:view')
+    
+    # Templates and context processors touch the ORM, so render off the event loop
+    return await sync_to_async(render)(request, 'cart/payment_success.html', {
+        'order': order,
+        'session': session,
+        'session_id': session_id,
+        'processing': order is None,
+    })
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def stripe_webhook(request):
+    """Receive Stripe events and finalize paid Checkout Sessions"""
+    payload = request.body
+    sig_header = request.headers.get('Stripe-Signature', '')
+    
+    try:
+        stripe.Webhook.construct_event(payload, sig_header, settings.STRIPE_WEBHOOK_SECRET)
+    except (ValueError, stripe.error.SignatureVerificationError):
+        return HttpResponse(status=400)
+    
+    # Signature is verified; work from the raw JSON so we get plain dicts
+    event = json.loads(payload)
+    
+    if event['type'] in ('checkout.session.completed', 'checkout.session.async_payment_succeeded'):
+        # Queued durably: Stripe gets its 2xx straight away and a failed attempt is retried
+        from apps.orders.tasks import finalize_checkout
+        finalize_checkout.delay(event['data']['object'])
+    
+    return HttpResponse(status=200)
 
 
 def payment_cancel(request):
@@ -412,32 +493,39 @@ def payment_cancel(request):
 def place_order_no_payment(request):
     """Create order without payment (pay later option)"""
     cart = get_or_create_cart(request)
-    cart_items = CartItem.objects.filter(cart=cart).select_related('vinyl_record')
+    cart_items = CartItem.objects.filter(cart=cart).select_related('vinyl_record__artist')
     
     if not cart_items.exists():
         messages.error(request, 'Your cart is empty!')
         return redirect('cart:view')
     
     try:
-        # Calculate total
-        total_amount = sum(item.get_total_price() for item in cart_items)
+        cart_items = list(cart_items)
+        item_count, subtotal = order_totals(cart_items)
         
-        # Create order
-        order = Order.objects.create(
-            user=request.user,
-            email=request.user.email,
-            first_name=request.user.first_name or 'Customer',
-            last_name=request.user.last_name or '',
-            address_line_1='To be updated',  # User can update this later
-            city='Hong Kong',
-            postal_code='000000',
-            total_amount=int(total_amount),
-            status='pending',  # Status: pending (no payment yet)
-            notes='Order placed without payment - Payment pending'
-        )
-        
-        # Clear the cart
-        cart_items.delete()
+        with transaction.atomic():
+            # Create order
+            order = Order.objects.create(
+                user=request.user,
+                email=request.user.email,
+                first_name=request.user.first_name or 'Customer',
+                last_name=request.user.last_name or '',
+                address_line_1='To be updated',  # User can update this later
+                city='Hong Kong',
+                postal_code='000000',
+                total_amount=subtotal,
+                item_count=item_count,
+                subtotal=subtotal,
+                status='pending',  # Status: pending (no payment yet)
+                stock_reserved=False,  # Nothing is taken from stock until payment
+                notes='Order placed without payment - Payment pending'
+            )
+            create_order_items(order, cart_items)
+            # Counted like every other order, so cancelling it later balances out
+            record_order_placed(order)
+            
+            # Clear the cart
+            CartItem.objects.filter(id__in=[item.id for item in cart_items]).delete()
         
         messages.success(request, f'Order #{order.order_id} has been created! You can pay later.')
         return render(request, 'cart/order_success.html', {
@@ -0,0 +1,67 @@
+"""
+Building blocks for admin changelists over large tables.
+
+- EstimatedCountPaginator: uses PostgreSQL's planner estimate instead of an
+  exact COUNT(*) once a changelist is past ``ESTIMATED_COUNT_THRESHOLD`` rows.
+- CachedAllValuesFieldListFilter / CachedRelatedFieldListFilter: list_filter
+  options cached for ADMIN_FILTER_CACHE_TIMEOUT seconds instead of a
+  SELECT DISTINCT (or a full related-table scan) on every page view.
+- LargeTableAdminMixin: wires the above into a ModelAdmin and turns off the
+  second, unfiltered COUNT(*) and facet counts.
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+from .db import estimate_count
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that trusts the planner's estimate for large result sets"""
+
+    @cached_property
+    def count(self):
+        threshold = getattr(settings, 'ESTIMATED_COUNT_THRESHOLD', 100000)
+        if hasattr(self.object_list, 'query'):
+            estimate = estimate_count(self.object_list)
+            if estimate is not None and estimate > threshold:
+                return estimate
+        return super().count
+
+
+def _filter_cache_key(model, field_path):
+    return f'admin:filter:{model._meta.label_lower}:{field_path}'
+
+
+class CachedAllValuesFieldListFilter(admin.AllValuesFieldListFilter):
+    """AllValuesFieldListFilter whose distinct values are cached"""
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        super().__init__(field, request, params, model, model_admin, field_path)
+        key = _filter_cache_key(model, field_path)
+        choices = cache.get(key)
+        if choices is None:
+            choices = list(self.lookup_choices)
+            cache.set(key, choices, getattr(settings, 'ADMIN_FILTER_CACHE_TIMEOUT', 600))
+        self.lookup_choices = choices
+
+
+class CachedRelatedFieldListFilter(admin.RelatedFieldListFilter):
+    """RelatedFieldListFilter whose related-object choices are cached"""
+
+    def field_choices(self, field, request, model_admin):
+        key = _filter_cache_key(field.model, field.name)
+        choices = cache.get(key)
+        if choices is None:
+            choices = list(super().field_choices(field, request, model_admin))
+            cache.set(key, choices, getattr(settings, 'ADMIN_FILTER_CACHE_TIMEOUT', 600))
+        return choices
+
+
+class LargeTableAdminMixin:
+    """ModelAdmin defaults for tables too big to count on every page view"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    list_per_page = 50
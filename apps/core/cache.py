@@ -0,0 +1,141 @@
+"""
+Cached derived data: stale-while-revalidate with single-flight recomputation.
+
+A DerivedCache stores each value with a soft and a hard TTL:
+
+- before the soft TTL a read is a *hit*;
+- between the soft and hard TTL it is *stale*: the first reader to take the
+  key's lock (``cache.add``) recomputes and stores the value while every
+  other reader keeps getting the stale one, so an expiring key costs one
+  recomputation instead of one per request;
+- past the hard TTL, or once deleted, it is a *miss*: one reader recomputes
+  while the others wait up to ``wait`` seconds for its result before giving
+  up and computing it themselves.
+
+Each cache is a namespace whose keys carry a version (Django's cache
+``version`` argument); ``invalidate()`` bumps it, orphaning every key in the
+namespace at once. Outcomes are counted per namespace in ``counters``.
+
+Locks and versions are cache entries, so recomputation is single-flight and
+``invalidate()`` reaches every process only when they share the cache
+backend (settings.CACHES, Redis). On a process-local backend such as
+LocMemCache each process recomputes and invalidates on its own;
+``manage.py check --deploy`` warns about that (core.W001).
+"""
+from django.core.cache import cache
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+OUTCOMES = ('hit', 'stale', 'miss', 'recompute')
+
+
+class CacheCounters:
+    """Thread-safe per-namespace counts of cache outcomes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = {}
+
+    def record(self, namespace, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(namespace, dict.fromkeys(OUTCOMES, 0))
+            counts[outcome] += 1
+
+    def snapshot(self):
+        """Return {namespace: {hit, stale, miss, recompute}}"""
+        with self._lock:
+            return {namespace: dict(counts) for namespace, counts in self._counts.items()}
+
+
+counters = CacheCounters()
+
+
+class DerivedCache:
+    def __init__(self, namespace, soft_ttl, hard_ttl, lock_timeout=30, wait=2.0):
+        self.namespace = namespace
+        self.soft_ttl = soft_ttl
+        self.hard_ttl = hard_ttl
+        self.lock_timeout = lock_timeout  # Longest a recomputation may hold the lock
+        self.wait = wait
+
+    def version(self):
+        key = f'{self.namespace}:version'
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, 1, None)
+            version = cache.get(key, 1)
+        return version
+
+    def _key(self, key):
+        return f'{self.namespace}:{key}'
+
+    def get(self, key, compute):
+        """The value for key, computing it with compute() when missing or stale"""
+        version = self.version()
+        full_key = self._key(key)
+        entry = cache.get(full_key, version=version)
+
+        if entry is not None:
+            value, fresh_until = entry
+            if time.time() < fresh_until:
+                counters.record(self.namespace, 'hit')
+                return value
+            counters.record(self.namespace, 'stale')
+            if self._acquire(full_key, version):
+                try:
+                    return self._recompute(full_key, version, compute)
+                except Exception:
+                    # Keep serving the old value; the next stale read tries again
+                    logger.exception('Recomputing %s failed, serving the stale value', full_key)
+            return value
+
+        counters.record(self.namespace, 'miss')
+        if self._acquire(full_key, version):
+            return self._recompute(full_key, version, compute)
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            entry = cache.get(full_key, version=version)
+            if entry is not None:
+                return entry[0]
+        return compute()
+
+    def set(self, key, value):
+        """Store a freshly computed value, e.g. from a periodic refresh"""
+        self._store(self._key(key), self.version(), value)
+
+    def delete(self, key):
+        cache.delete(self._key(key), version=self.version())
+
+    def delete_many(self, keys):
+        cache.delete_many([self._key(key) for key in keys], version=self.version())
+
+    def invalidate(self):
+        """Orphan every key in the namespace"""
+        key = f'{self.namespace}:version'
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, None)
+
+    def _acquire(self, full_key, version):
+        return cache.add(f'{full_key}:lock', 1, self.lock_timeout, version=version)
+
+    def _recompute(self, full_key, version, compute):
+        try:
+            value = compute()
+            self._store(full_key, version, value)
+        finally:
+            cache.delete(f'{full_key}:lock', version=version)
+        counters.record(self.namespace, 'recompute')
+        return value
+
+    def _store(self, full_key, version, value):
+        cache.set(full_key, (value, time.time() + self.soft_ttl), self.hard_ttl, version=version)
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+# Backends whose entries live in one process (or one machine's disk)
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+)
+
+
+def default_cache_backend():
+    return settings.CACHES.get('default', {}).get('BACKEND', PROCESS_LOCAL_CACHES[0])
+
+
+def cache_is_shared():
+    """Whether values stored in the default cache by one process are seen by the others"""
+    return default_cache_backend() not in PROCESS_LOCAL_CACHES
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """DerivedCache locks and versions, and every invalidation, need one cache shared by all processes"""
+    if cache_is_shared():
+        return []
+    backend = default_cache_backend()
+    return [Warning(
+        f'The default cache ({backend}) is not shared between processes.',
+        hint='Configure a shared backend such as RedisCache; otherwise each worker '
+             'recomputes and invalidates cached data on its own and serves stale values.',
+        id='core.W001',
+    )]
@@ -0,0 +1,33 @@
+"""
+Database helpers shared by the storefront and the admin.
+"""
+from django.db import connections
+import json
+
+
+def estimate_count(queryset):
+    """
+    Return the planner's row estimate for queryset, or None if unavailable.
+
+    Unfiltered querysets read pg_class.reltuples; filtered ones use the row
+    estimate from EXPLAIN. Other databases return None.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+            return row[0] if row and row[0] >= 0 else None
+
+        sql, params = queryset.order_by().query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows'])
@@ -0,0 +1,155 @@
+"""
+Cross-process cache invalidation over PostgreSQL LISTEN/NOTIFY.
+
+Caches held in process memory (the default local-memory cache backend,
+dimension tables) are private to each gunicorn worker and node, so an admin
+edit in one process leaves the others serving stale data. ``publish(topic,
+keys)`` tells every process:
+
+- it runs this process's handlers for topic straight away, and again once
+  the transaction commits;
+- on PostgreSQL it also sends ``pg_notify`` on INVALIDATION_CHANNEL inside
+  the same transaction, so the message goes out when, and only if, the
+  change commits.
+
+``start_listener()`` runs a daemon thread with its own connection that
+LISTENs on the channel and runs the handlers for messages from other
+processes, typically within milliseconds of the commit. The WSGI and ASGI
+entry points (vrhp1/wsgi.py, vrhp1/asgi.py) and task workers start it; other
+processes (management commands, tests) never hold its connection. After a lost
+connection it reconnects and runs every handler with ``keys=None`` (drop
+everything), since messages sent in the meantime are gone.
+
+Handlers are registered with ``subscribe(topic, handler)``; ``handler(keys)``
+receives the published keys, or None for everything in the topic.
+"""
+from django.conf import settings
+from django.db import connections, transaction
+import json
+import logging
+import os
+import select
+import socket
+import threading
+
+logger = logging.getLogger(__name__)
+
+# NOTIFY payloads must stay under 8000 bytes; longer key lists become "everything"
+MAX_PAYLOAD = 7900
+
+_handlers = {}
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def channel():
+    return getattr(settings, 'INVALIDATION_CHANNEL', 'cache_invalidation')
+
+
+def origin():
+    """Identifies this process, so its listener can skip messages it already handled"""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def subscribe(topic, handler):
+    """Call handler(keys) whenever topic is published, here or in another process"""
+    _handlers.setdefault(topic, []).append(handler)
+
+
+def dispatch(topic, keys=None):
+    for handler in _handlers.get(topic, ()):
+        try:
+            handler(keys)
+        except Exception:
+            logger.exception('Invalidation handler for %s failed', topic)
+
+
+def publish(topic, keys=None, using='default'):
+    """Invalidate keys (None: everything) of topic in every process once the current transaction commits"""
+    if keys is not None:
+        keys = sorted(set(keys))
+    dispatch(topic, keys)
+    transaction.on_commit(lambda: dispatch(topic, keys), using=using)
+
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    payload = json.dumps({'origin': origin(), 'topic': topic, 'keys': keys})
+    if len(payload) > MAX_PAYLOAD:
+        payload = json.dumps({'origin': origin(), 'topic': topic, 'keys': None})
+    with connection.cursor() as cursor:
+        # Delivered on commit; identical messages within one transaction are sent once
+        cursor.execute('SELECT pg_notify(%s, %s)', [channel(), payload])
+
+
+def _notifications(raw, timeout):
+    """Payloads received on raw (a psycopg 2 or 3 connection) within timeout seconds"""
+    if hasattr(raw, 'poll'):
+        if select.select([raw], [], [], timeout) == ([], [], []):
+            return []
+        raw.poll()
+        payloads = [notify.payload for notify in raw.notifies]
+        raw.notifies.clear()
+        return payloads
+    return [notify.payload for notify in raw.notifies(timeout=timeout)]
+
+
+class Listener(threading.Thread):
+    def __init__(self, using='default'):
+        super().__init__(name='cache-invalidation-listener', daemon=True)
+        self.using = using
+        self.origin = origin()
+        self.stopping = threading.Event()
+
+    def run(self):
+        delay = 1
+        while not self.stopping.is_set():
+            try:
+                self.listen()
+                delay = 1
+            except Exception:
+                logger.exception('Invalidation listener lost its connection; reconnecting in %ss', delay)
+                delay = min(delay * 2, 60)
+            finally:
+                connections[self.using].close()
+            self.stopping.wait(delay)
+
+    def listen(self):
+        connection = connections[self.using]
+        connection.ensure_connection()
+        with connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {connection.ops.quote_name(channel())}')
+        # Anything published while we weren't listening is lost
+        for topic in list(_handlers):
+            dispatch(topic)
+        while not self.stopping.is_set():
+            for payload in _notifications(connection.connection, timeout=5):
+                self.handle(payload)
+
+    def handle(self, payload):
+        try:
+            message = json.loads(payload)
+            topic, keys = message['topic'], message.get('keys')
+        except (ValueError, TypeError, KeyError):
+            logger.warning('Ignoring malformed invalidation message %r', payload)
+            return
+        if message.get('origin') != self.origin:
+            dispatch(topic, keys)
+
+    def stop(self):
+        self.stopping.set()
+
+
+def start_listener(using='default'):
+    """Start this process's listener thread unless it is running; does nothing off PostgreSQL"""
+    global _listener
+    if _listener is not None and _listener.is_alive():
+        return _listener
+    if not getattr(settings, 'INVALIDATION_LISTENER', True) or connections[using].vendor != 'postgresql':
+        return None
+    with _listener_lock:
+        # A forked worker inherits the object but not the thread
+        if _listener is None or not _listener.is_alive():
+            _listener = Listener(using)
+            _listener.start()
+    return _listener
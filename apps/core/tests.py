@@ -0,0 +1,181 @@
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.db import connection, transaction
+from django.core.cache import cache
+from apps.core.cache import DerivedCache, counters
+from apps.core.checks import check_shared_cache
+from apps.core import invalidation
+from apps.core.ids import _uuid7, uuid7
+from unittest import skipIf, skipUnless
+import json
+import queue
+import threading
+import time
+
+
+class UUID7TestCase(SimpleTestCase):
+    def test_version_and_variant(self):
+        """Test generated values are RFC 9562 version 7 UUIDs"""
+        value = uuid7()
+
+        self.assertEqual(value.version, 7)
+        self.assertEqual(value.variant, 'specified in RFC 4122')
+
+    def test_values_sort_in_creation_order(self):
+        """Test ids created later always sort later, even within one millisecond"""
+        values = [_uuid7() for _ in range(20000)]
+
+        self.assertEqual(values, sorted(values))
+        self.assertEqual(len(set(values)), len(values))
+
+    def test_timestamp_prefix(self):
+        """Test the leading 48 bits are the creation time in milliseconds"""
+        before = time.time_ns() // 1_000_000
+        value = _uuid7()
+        after = time.time_ns() // 1_000_000
+
+        self.assertTrue(before <= value.int >> 80 <= after + 1)
+
+
+class DerivedCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        counters.reset()
+        self.calls = 0
+
+    def compute(self, value='fresh', delay=0):
+        def compute():
+            self.calls += 1
+            time.sleep(delay)
+            return value
+        return compute
+
+    def test_stale_values_are_served_while_one_reader_recomputes(self):
+        """Test a stale key is recomputed by the lock holder only"""
+        derived = DerivedCache('test', soft_ttl=0, hard_ttl=60)
+        derived.set('key', 'old')
+
+        # Another worker holds the lock: keep serving the stale value
+        self.assertTrue(derived._acquire('test:key', derived.version()))
+        self.assertEqual(derived.get('key', self.compute()), 'old')
+        self.assertEqual(self.calls, 0)
+
+        cache.delete('test:key:lock', version=derived.version())
+        self.assertEqual(derived.get('key', self.compute()), 'fresh')
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(counters.snapshot()['test'], {'hit': 0, 'stale': 2, 'miss': 0, 'recompute': 1})
+
+    def test_concurrent_misses_compute_once(self):
+        """Test readers of a missing key wait for the one recomputation"""
+        derived = DerivedCache('test', soft_ttl=60, hard_ttl=120)
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(derived.get('key', self.compute(delay=0.2))))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results, ['fresh'] * 8)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(derived.get('key', self.compute()), 'fresh')
+        self.assertEqual(counters.snapshot()['test']['hit'], 1)
+
+    def test_invalidate_orphans_the_namespace(self):
+        """Test invalidate() makes every key in the namespace a miss"""
+        derived = DerivedCache('test', soft_ttl=60, hard_ttl=120)
+        other = DerivedCache('other', soft_ttl=60, hard_ttl=120)
+        derived.set('key', 'old')
+        other.set('key', 'kept')
+
+        derived.invalidate()
+
+        self.assertEqual(derived.get('key', self.compute()), 'fresh')
+        self.assertEqual(other.get('key', self.compute()), 'kept')
+        self.assertEqual(self.calls, 1)
+
+
+class InvalidationTestCase(TestCase):
+    def setUp(self):
+        self.received = []
+        invalidation.subscribe('test', self.received.append)
+        self.addCleanup(invalidation._handlers.pop, 'test', None)
+
+    def message(self, origin, keys=None):
+        return json.dumps({'origin': origin, 'topic': 'test', 'keys': keys})
+
+    def test_publish_runs_local_handlers(self):
+        """Test publishing invalidates this process straight away and again on commit"""
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidation.publish('test', [3, 1, 3])
+            self.assertEqual(self.received, [[1, 3]])
+
+        self.assertEqual(self.received, [[1, 3], [1, 3]])
+
+    def test_listener_skips_its_own_messages(self):
+        """Test the listener only runs handlers for messages from other processes"""
+        listener = invalidation.Listener()
+
+        listener.handle(self.message(listener.origin, [1]))
+        listener.handle(self.message('elsewhere:1', [2]))
+        listener.handle(self.message('elsewhere:1'))
+
+        self.assertEqual(self.received, [[2], None])
+
+    def test_listener_ignores_malformed_messages(self):
+        """Test bad payloads are logged and dropped instead of killing the listener"""
+        listener = invalidation.Listener()
+
+        with self.assertLogs('apps.core.invalidation', 'WARNING'):
+            listener.handle('not json')
+            listener.handle(json.dumps({'origin': 'elsewhere:1'}))
+
+        self.assertEqual(self.received, [])
+
+    def test_listener_is_off_under_tests(self):
+        """Test the test runner never starts a listener thread"""
+        self.assertIsNone(invalidation.start_listener())
+
+    @skipIf(connection.vendor == 'postgresql', 'Runs on databases without LISTEN/NOTIFY')
+    @override_settings(INVALIDATION_LISTENER=True)
+    def test_listener_needs_postgresql(self):
+        """Test no listener thread is started on other databases"""
+        self.assertIsNone(invalidation.start_listener())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'LISTEN/NOTIFY needs PostgreSQL')
+class ListenerPostgresTestCase(TransactionTestCase):
+    def setUp(self):
+        self.received = queue.Queue()
+        invalidation.subscribe('test', self.received.put)
+        self.addCleanup(invalidation._handlers.pop, 'test', None)
+
+    def notify(self, origin, keys):
+        payload = json.dumps({'origin': origin, 'topic': 'test', 'keys': keys})
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [invalidation.channel(), payload])
+
+    def test_listener_receives_committed_notifications(self):
+        """Test a listener thread runs the handlers for NOTIFYs from other processes"""
+        listener = invalidation.Listener()
+        listener.start()
+        self.addCleanup(listener.join, 10)
+        self.addCleanup(listener.stop)
+
+        # Connecting drops everything, which also says the listener is ready
+        self.assertIsNone(self.received.get(timeout=10))
+        self.notify(listener.origin, [1])
+        self.notify('elsewhere:1', [2])
+
+        self.assertEqual(self.received.get(timeout=10), [2])
+        self.assertTrue(self.received.empty())
+
+
+class SharedCacheCheckTestCase(SimpleTestCase):
+    def test_process_local_cache_warns(self):
+        """Test the deploy check flags caches that aren't shared between processes"""
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['core.W001'])
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(check_shared_cache(None), [])
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class HomeConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.home'
+
+    def ready(self):
+        # Drop cached recommendations when favourite genres change
+        from . import signals  # noqa: F401
@@ -0,0 +1,89 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from apps.home.sections import home_cache, refresh_home_sections
+from apps.vinyl.models import VinylRecord, Artist, Genre, Label
+import statistics
+import time
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = '''
+    Measure home page latency as the catalogue grows.
+
+    For each size the catalogue is topped up with scratch records, the
+    cached home sections are rebuilt (as the refresh_home_sections task
+    would) and the home page is requested repeatedly. Reports the rebuild
+    time, the median and 95th percentile page latency and the queries per
+    page; with the sections cached, page latency should not grow with the
+    table. Everything runs in one transaction that is rolled back at the end.
+
+    USAGE:
+        python manage.py benchmark_home                            # 1k, 10k and 100k records
+        python manage.py benchmark_home --sizes 1000 500000 --requests 500
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Catalogue sizes to measure, in records')
+        parser.add_argument('--requests', type=int, default=200, help='Home page requests per size')
+
+    def handle(self, *args, **options):
+        setup_test_environment()  # Lets the test client's 'testserver' host through ALLOWED_HOSTS
+        try:
+            with transaction.atomic():
+                self.run(sorted(options['sizes']), options['requests'])
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            teardown_test_environment()
+            # The cached sections describe the scratch records
+            home_cache.delete('sections')
+
+    def run(self, sizes, requests):
+        artist = Artist.objects.create(name='Benchmark Artist', artist_type='band')
+        genre = Genre.objects.create(name='Benchmark Genre')
+        label = Label.objects.create(name='Benchmark Label')
+        client = Client()
+        created = 0
+
+        for size in sizes:
+            missing = size - VinylRecord.objects.count()
+            if missing > 0:
+                VinylRecord.objects.bulk_create([
+                    VinylRecord(
+                        title=f'Benchmark Record {created + i}', artist=artist, genre=genre, label=label,
+                        release_year=2000, price=2599, stock_quantity=10, slug=f'benchmark-record-{created + i}',
+                    )
+                    for i in range(missing)
+                ], batch_size=5000)
+                created += missing
+
+            started = time.perf_counter()
+            refresh_home_sections()
+            rebuild = time.perf_counter() - started
+
+            with CaptureQueriesContext(connection) as ctx:
+                client.get('/')
+            timings = []
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = client.get('/')
+                timings.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                self.stderr.write(f'Home page answered {response.status_code}')
+                return
+
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            self.stdout.write(
+                f'{size:>10} records  rebuild {rebuild * 1000:>8.1f} ms  '
+                f'page median {statistics.median(timings):>6.1f} ms  p95 {p95:>6.1f} ms  '
+                f'{len(ctx.captured_queries)} queries'
+            )
@@ -0,0 +1,109 @@
+"""
+Home page sections.
+
+The parts of the home page that are the same for everyone - the latest and
+newest records, the genres and the store statistics - are built together by
+``build_home_sections`` and cached under one key of ``home_cache``. The
+``refresh_home_sections`` periodic task rebuilds them every
+HOME_SECTIONS_REFRESH_INTERVAL seconds, so page views only read the cache;
+should it fall behind, one view rebuilds them while the others are served
+the previous copy (see apps.core.cache). This relies on the task worker and
+the web processes sharing the cache backend (settings.CACHES); on a
+process-local cache the task does nothing and each process builds its own.
+Counts over large tables use the planner's estimate (see apps.core.db).
+
+The recommended section is cached per user by ``get_recommended_vinyl``:
+the user's collaborative-filtering recommendations (apps.recommendations)
+when there are any, otherwise records from their favourite genres;
+``signals.py`` drops it when those genres change.
+"""
+from collections import namedtuple
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count
+from apps.accounts.models import UserProfile
+from apps.core.db import estimate_count
+from apps.core.cache import DerivedCache
+from apps.recommendations.recommender import recommended_records
+from apps.vinyl.dimensions import artists, genres
+from apps.vinyl.models import VinylRecord
+
+home_cache = DerivedCache(
+    'home',
+    soft_ttl=getattr(settings, 'HOME_SECTIONS_REFRESH_INTERVAL', 300),
+    hard_ttl=getattr(settings, 'HOME_SECTIONS_CACHE_TIMEOUT', 3600),
+)
+
+Recommendations = namedtuple('Recommendations', ['has_preferences', 'records', 'source'])
+
+
+def _count(queryset):
+    """Exact count for small tables, the planner's estimate past ESTIMATED_COUNT_THRESHOLD rows"""
+    estimate = estimate_count(queryset)
+    if estimate is not None and estimate > getattr(settings, 'ESTIMATED_COUNT_THRESHOLD', 100000):
+        return estimate
+    return queryset.count()
+
+
+def _rated(queryset):
+    return queryset.select_related('artist', 'genre').annotate(
+        average_rating=Avg('reviews__rating'),
+        review_count=Count('reviews', distinct=True)
+    )
+
+
+def build_home_sections():
+    """Compute the shared home page sections"""
+    in_stock = VinylRecord.objects.filter(is_available=True, stock_quantity__gt=0)
+    sections = {
+        'latest_vinyl': list(_rated(in_stock).order_by('-created_at')[:8]),
+        'newest_vinyl': list(VinylRecord.objects.filter(is_available=True).order_by('-created_at')[:6]),
+        'popular_genres': genres.all()[:6],
+        'total_vinyl_count': _count(VinylRecord.objects.filter(is_available=True)),
+        'total_artists_count': artists.count(),
+        'total_genres_count': genres.count(),
+        'total_customers_count': _count(UserProfile.objects.all()),
+    }
+    return sections
+
+
+def refresh_home_sections():
+    home_cache.set('sections', build_home_sections())
+
+
+def get_home_sections():
+    return home_cache.get('sections', build_home_sections)
+
+
+def recommended_cache_key(user_id):
+    return f'home:recommended:{user_id}'
+
+
+def get_recommended_vinyl(user):
+    """Recommendations(has_preferences, records, source) for user, cached per user"""
+    if not user.is_authenticated:
+        return Recommendations(False, [], None)
+    key = recommended_cache_key(user.id)
+    recommendations = cache.get(key)
+    if recommendations is None:
+        recommendations = _recommendations(user)
+        cache.set(key, recommendations, getattr(settings, 'HOME_RECOMMENDED_CACHE_TIMEOUT', 600))
+    return recommendations
+
+
+def _recommendations(user):
+    records = list(_rated(recommended_records(user))[:8])
+    if records:
+        return Recommendations(True, records, 'history')
+
+    genre_ids = list(
+        UserProfile.favorite_genres.through.objects
+        .filter(userprofile__user_id=user.id)
+        .values_list('genre_id', flat=True)
+    )
+    if genre_ids:
+        records = list(
+            _rated(VinylRecord.objects.filter(is_available=True, stock_quantity__gt=0, genre_id__in=genre_ids))
+            .order_by('-average_rating', '-created_at')[:8]
+        )
+    return Recommendations(bool(genre_ids), records, 'genres')
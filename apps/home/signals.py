@@ -0,0 +1,20 @@
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from apps.accounts.models import UserProfile
+from .sections import recommended_cache_key
+
+
+@receiver(m2m_changed, sender=UserProfile.favorite_genres.through)
+def favorite_genres_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        cache.delete(recommended_cache_key(instance.user_id))
+        return
+    # Changed from the genre side: every affected profile
+    if action == 'pre_clear':
+        profiles = UserProfile.objects.filter(favorite_genres=instance)
+    else:
+        profiles = UserProfile.objects.filter(pk__in=pk_set)
+    cache.delete_many([recommended_cache_key(user_id) for user_id in profiles.values_list('user_id', flat=True)])
@@ -0,0 +1,13 @@
+from django.conf import settings
+from apps.core.checks import cache_is_shared
+from apps.tasks.queue import periodic_task
+from . import sections
+
+
+@periodic_task(every=getattr(settings, 'HOME_SECTIONS_REFRESH_INTERVAL', 300))
+def refresh_home_sections():
+    """Rebuild the cached home page sections and statistics"""
+    if not cache_is_shared():
+        # The worker's own cache; web processes would never read the result
+        return
+    sections.refresh_home_sections()
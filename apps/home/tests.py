@@ -1,3 +1,55 @@
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from apps.accounts.models import UserProfile
+from apps.vinyl.models import VinylRecord, Artist, Genre, Label
+from .sections import refresh_home_sections
 
-# Create your tests here.
+
+class HomeSectionsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        artist = Artist.objects.create(name='Test Artist', artist_type='band')
+        label = Label.objects.create(name='Test Label')
+        self.jazz = Genre.objects.create(name='Jazz')
+        self.rock = Genre.objects.create(name='Rock')
+        for i, genre in enumerate([self.jazz, self.rock] * 3):
+            VinylRecord.objects.create(
+                title=f'Record {i}', artist=artist, genre=genre, label=label,
+                price=2599, stock_quantity=10, release_year=2023,
+            )
+        self.user = User.objects.create_user(username='collector', password='testpass123')
+        UserProfile.objects.get_or_create(user=self.user)
+
+    def home_queries(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('home:index'))
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_shared_sections_come_from_cache(self):
+        refresh_home_sections()
+        queries, response = self.home_queries()
+        self.assertEqual(queries, 0)
+        self.assertEqual(response.context['total_vinyl_count'], 6)
+        self.assertEqual(len(response.context['latest_vinyl']), 6)
+
+    def test_recommendations_are_cached_per_user(self):
+        self.client.login(username='collector', password='testpass123')
+        _, response = self.home_queries()
+        self.assertFalse(response.context['user_has_preferences'])
+
+        self.user.profile.favorite_genres.set([self.jazz])
+        cold, response = self.home_queries()
+        self.assertTrue(response.context['user_has_preferences'])
+        self.assertEqual({record.genre_id for record in response.context['recommended_vinyl']}, {self.jazz.id})
+
+        warm, _ = self.home_queries()
+        self.assertLess(warm, cold)
+
+        self.user.profile.favorite_genres.add(self.rock)
+        _, response = self.home_queries()
+        self.assertEqual(len(response.context['recommended_vinyl']), 6)
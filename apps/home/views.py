@@ -1,57 +1,18 @@
 from django.shortcuts import render
-from django.db.models import Count, Avg
-from apps.vinyl.models import VinylRecord, Genre, Artist
-from apps.accounts.models import UserProfile
+from .sections import get_home_sections, get_recommended_vinyl
 
 
 def index(request):
     """Home page with personalized vinyl records based on user preferences"""
-    
-    # Check if user is authenticated and has favorite genres
-    recommended_vinyl = None
-    if request.user.is_authenticated and hasattr(request.user, 'profile'):
-        user_favorite_genres = request.user.profile.favorite_genres.all()
-        if user_favorite_genres.exists():
-            # Get vinyl records from user's favorite genres
-            recommended_vinyl = VinylRecord.objects.filter(
-                is_available=True,
-                stock_quantity__gt=0,
-                genre__in=user_favorite_genres
-            ).select_related('artist', 'genre').annotate(
-                average_rating=Avg('reviews__rating'),
-                review_count=Count('reviews', distinct=True)
-            ).order_by('-average_rating', '-created_at')[:8]
-    
-    # Get latest vinyl records for hero section (fallback or additional content)
-    latest_vinyl = VinylRecord.objects.filter(
-        is_available=True,
-        stock_quantity__gt=0
-    ).select_related('artist', 'genre').annotate(
-        average_rating=Avg('reviews__rating'),
-        review_count=Count('reviews', distinct=True)
-    ).order_by('-created_at')[:8]
-    
-    # Get newest vinyl records for separate section
-    newest_vinyl = VinylRecord.objects.filter(is_available=True).order_by('-created_at')[:6]
-    
-    # Get popular genres
-    popular_genres = Genre.objects.all()[:6]
-    
-    # Get statistics for the stats section
-    stats = {
-        'total_vinyl_count': VinylRecord.objects.filter(is_available=True).count(),
-        'total_artists_count': Artist.objects.count(),
-        'total_genres_count': Genre.objects.count(),
-        'total_customers_count': UserProfile.objects.count(),
-    }
+    # Shared sections and statistics come from the cache, refreshed by a periodic task
+    sections = get_home_sections()
+    recommendations = get_recommended_vinyl(request.user)
     
     context = {
-        'latest_vinyl': latest_vinyl,
-        'recommended_vinyl': recommended_vinyl,
-        'newest_vinyl': newest_vinyl,
-        'popular_genres': popular_genres,
-        'user_has_preferences': request.user.is_authenticated and hasattr(request.user, 'profile') and request.user.profile.favorite_genres.exists(),
-        **stats
+        **sections,
+        'recommended_vinyl': recommendations.records or None,
+        'user_has_preferences': recommendations.has_preferences,
+        'recommendation_source': recommendations.source,
     }
     return render(request, 'home/index.html', context)
 
@@ -0,0 +1,11 @@
+from django.contrib import admin
+from .models import OutboundEmail
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'created_at', 'sent_at', 'latency_ms')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject',)
+    readonly_fields = ('created_at', 'sent_at', 'latency_ms', 'attempts', 'last_error')
+    ordering = ('-created_at',)
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from apps.notifications.outbox import deliver_pending
+import time
+
+
+class Command(BaseCommand):
+    help = '''
+    Deliver queued emails from the outbox.
+
+    USAGE:
+        python manage.py send_outbox            # Keep draining the outbox (worker mode)
+        python manage.py send_outbox --once     # Send what is due now and exit
+
+    For local testing point EMAIL_HOST/EMAIL_PORT at a debugging SMTP server:
+        python -m aiosmtpd -n -l localhost:1025
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain what is due and exit')
+        parser.add_argument('--batch-size', type=int, default=None, help='Emails per SMTP connection')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to sleep when the outbox is empty')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+
+        try:
+            while True:
+                close_old_connections()
+                sent, failed = deliver_pending(options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+
+                if sent or failed:
+                    self.stdout.write(f'Batch: {sent} sent, {failed} failed')
+                    continue
+
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('\nStopping outbox worker')
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {total_sent} sent, {total_failed} failed'))
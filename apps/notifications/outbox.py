@@ -0,0 +1,124 @@
+"""
+Transactional email outbox.
+
+Views call ``enqueue_email`` inside their ``transaction.atomic()`` block, so an
+email exists if and only if the change that triggered it was committed, and
+no SMTP traffic happens while row locks are held. ``deliver_pending`` (run by
+``python manage.py send_outbox``) sends due messages over one SMTP connection
+per batch and reschedules failures with exponential backoff.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+from .models import OutboundEmail
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _new_email(subject, body, to, html_body='', from_email=None, send_at=None):
+    return OutboundEmail(
+        subject=subject[:300],
+        body=body,
+        html_body=html_body,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        to=list(to),
+        next_attempt_at=send_at or timezone.now(),
+    )
+
+
+def enqueue_email(subject, body, to, html_body='', from_email=None, send_at=None):
+    """Queue a single email, optionally not before send_at; call inside the transaction that caused it"""
+    email = _new_email(subject, body, to, html_body, from_email, send_at)
+    email.save()
+    return email
+
+
+def enqueue_emails(messages):
+    """Queue many emails with one INSERT; ``messages`` are dicts of enqueue_email kwargs"""
+    return OutboundEmail.objects.bulk_create([_new_email(**message) for message in messages])
+
+
+def render_email(template_name, context):
+    """Render ``<template_name>.txt`` and ``<template_name>.html`` into (body, html_body)"""
+    return (
+        render_to_string(f'{template_name}.txt', context),
+        render_to_string(f'{template_name}.html', context),
+    )
+
+
+def _backoff(attempts):
+    base = getattr(settings, 'OUTBOX_RETRY_BACKOFF', 60)
+    return timedelta(seconds=min(base * (2 ** (attempts - 1)), 6 * 60 * 60))
+
+
+def deliver_pending(batch_size=None):
+    """
+    Send one batch of due emails over a single SMTP connection.
+
+    Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED so several
+    workers can drain the outbox side by side. Returns (sent, failed).
+    """
+    batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    sent = failed = 0
+
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+            connection_error = None
+        except Exception as e:
+            connection_error = e
+
+        for email in batch:
+            email.attempts += 1
+            try:
+                if connection_error:
+                    raise connection_error
+                message = EmailMultiAlternatives(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email or None,
+                    to=email.to,
+                    connection=connection,
+                )
+                if email.html_body:
+                    message.attach_alternative(email.html_body, 'text/html')
+                message.send()
+            except Exception as e:
+                failed += 1
+                email.last_error = f'{e.__class__.__name__}: {e}'
+                if email.attempts >= max_attempts:
+                    email.status = 'failed'
+                else:
+                    email.next_attempt_at = timezone.now() + _backoff(email.attempts)
+                logger.warning('Outbox email %s failed (attempt %d): %s', email.id, email.attempts, e)
+            else:
+                sent += 1
+                email.status = 'sent'
+                email.sent_at = timezone.now()
+                email.latency_ms = int((email.sent_at - email.created_at).total_seconds() * 1000)
+                email.last_error = ''
+
+        if not connection_error:
+            connection.close()
+
+        OutboundEmail.objects.bulk_update(
+            batch,
+            ['status', 'attempts', 'last_error', 'next_attempt_at', 'sent_at', 'latency_ms']
+        )
+
+    logger.info('Outbox batch: %d sent, %d failed', sent, failed)
+    return sent, failed
@@ -0,0 +1,9 @@
+from apps.tasks.queue import periodic_task
+from .outbox import deliver_pending
+
+
+@periodic_task(every=30)
+def deliver_outbox():
+    """Drain due emails from the outbox"""
+    while any(deliver_pending()):
+        pass
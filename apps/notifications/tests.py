@@ -0,0 +1,72 @@
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.notifications.models import OutboundEmail
+from apps.notifications.outbox import enqueue_email, enqueue_emails, deliver_pending
+
+
+class CountingBackend(EmailBackend):
+    """locmem backend that counts how many SMTP connections were opened"""
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return True
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionRefusedError('SMTP server unavailable')
+
+
+class OutboxTestCase(TestCase):
+    def setUp(self):
+        CountingBackend.opened = 0
+
+    def test_rolled_back_transaction_queues_nothing(self):
+        """Test emails only exist if the surrounding transaction commits"""
+        try:
+            with transaction.atomic():
+                enqueue_email('Hello', 'Body', ['a@example.com'])
+                raise RuntimeError('order failed')
+        except RuntimeError:
+            pass
+
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    @override_settings(EMAIL_BACKEND='apps.notifications.tests.CountingBackend')
+    def test_batch_is_sent_over_one_connection(self):
+        """Test every due email in a batch reuses a single connection"""
+        enqueue_emails([
+            {'subject': f'Message {i}', 'body': 'Body', 'to': [f'user{i}@example.com']}
+            for i in range(5)
+        ])
+
+        self.assertEqual(deliver_pending(), (5, 0))
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 5)
+
+        email = OutboundEmail.objects.first()
+        self.assertEqual(email.status, 'sent')
+        self.assertIsNotNone(email.latency_ms)
+
+    @override_settings(EMAIL_BACKEND='apps.notifications.tests.FailingBackend', OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_give_up(self):
+        """Test failed sends are rescheduled and eventually marked failed"""
+        email = enqueue_email('Hello', 'Body', ['a@example.com'])
+
+        self.assertEqual(deliver_pending(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('pending', 1))
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        # Not due yet, so the next run leaves it alone
+        self.assertEqual(deliver_pending(), (0, 0))
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        deliver_pending()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('failed', 2))
+        self.assertIn('SMTP server unavailable', email.last_error)
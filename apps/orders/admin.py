@@ -1,26 +1,50 @@
-from django.contrib import admin
-from .models import Order, OrderItem
+from django.contrib import admin, messages
+from django.utils import timezone
+from apps.analytics.rollups import record_status_change
+from apps.core.admin import LargeTableAdminMixin, CachedAllValuesFieldListFilter
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+from .services import (
+    FULFILMENT_TRANSITIONS, order_lookup, transition_orders, fulfilment_timestamps, queue_order_status_emails,
+)
+
+
+class OrderIdSearchMixin:
+    """Search by order code or UUID with an exact, indexed lookup"""
+    order_lookup_prefix = ''
+
+    def get_search_results(self, request, queryset, search_term):
+        lookup = order_lookup(search_term, self.order_lookup_prefix)
+        # Fall back to the normal search when a code-shaped term matches no order, e.g. a username
+        if lookup:
+            matches = queryset.filter(**lookup)
+            if matches.exists():
+                return matches, False
+        return super().get_search_results(request, queryset, search_term)
 
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     readonly_fields = ['vinyl_title', 'vinyl_artist', 'vinyl_year', 'price', 'created_at']
+    autocomplete_fields = ['vinyl_record']
     extra = 0
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ['order_id', 'user', 'get_full_name', 'status', 'total_amount', 'created_at']
-    list_filter = ['status', 'country', 'created_at', 'shipped_at', 'delivered_at']
-    search_fields = ['order_id', 'user__username', 'user__email', 'first_name', 'last_name', 'email']
-    readonly_fields = ['order_id', 'created_at', 'updated_at']
-    list_editable = ['status']
+class OrderAdmin(OrderIdSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['order_code', 'order_id', 'user', 'get_full_name', 'status', 'total_amount', 'created_at']
+    list_filter = ['status', ('country', CachedAllValuesFieldListFilter), 'created_at', 'shipped_at', 'delivered_at']
+    list_select_related = ['user']
+    # Exact matches use indexes; order codes and UUIDs are handled by OrderIdSearchMixin
+    search_fields = ['=email', '=user__username', '=user__email', '^last_name']
+    readonly_fields = ['order_code', 'order_id', 'created_at', 'updated_at']
+    autocomplete_fields = ['user']
     ordering = ['-created_at']
     inlines = [OrderItemInline]
+    actions = ['mark_processing', 'mark_shipped', 'mark_delivered']
     
     fieldsets = (
         ('Order Information', {
-            'fields': ('order_id', 'user', 'status')
+            'fields': ('order_code', 'order_id', 'user', 'status')
         }),
         ('Customer Details', {
             'fields': ('email', 'first_name', 'last_name', 'phone')
@@ -41,15 +65,76 @@ class OrderAdmin(admin.ModelAdmin):
         return obj.get_full_name()
     get_full_name.short_description = 'Customer Name'
 
+    def save_model(self, request, obj, form, change):
+        # The admin saves inside a transaction, so the rollups and emails move with the order
+        status_changed = change and 'status' in form.changed_data
+        if status_changed:
+            for field, value in fulfilment_timestamps(obj.status, timezone.now()).items():
+                if getattr(obj, field) is None:
+                    setattr(obj, field, value)
+        super().save_model(request, obj, form, change)
+        if status_changed:
+            record_status_change(obj, form.initial['status'])
+            queue_order_status_emails([obj])
+
+    def transition(self, request, queryset, status):
+        moved = len(transition_orders(queryset, status))
+        skipped = queryset.count() - moved
+        self.message_user(request, f'{moved} orders marked as {status}.')
+        if skipped:
+            allowed = ' or '.join(FULFILMENT_TRANSITIONS[status])
+            self.message_user(request, f'{skipped} orders skipped: only {allowed} orders can be marked as {status}.', messages.WARNING)
+
+    @admin.action(description='Mark selected orders as processing')
+    def mark_processing(self, request, queryset):
+        self.transition(request, queryset, 'processing')
+
+    @admin.action(description='Mark selected orders as shipped and email customers')
+    def mark_shipped(self, request, queryset):
+        self.transition(request, queryset, 'shipped')
+
+    @admin.action(description='Mark selected orders as delivered and email customers')
+    def mark_delivered(self, request, queryset):
+        self.transition(request, queryset, 'delivered')
+
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(OrderIdSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    order_lookup_prefix = 'order__'
     list_display = ['order', 'vinyl_title', 'vinyl_artist', 'quantity', 'price', 'get_total_price']
     list_filter = ['order__status', 'created_at']
-    search_fields = ['vinyl_title', 'vinyl_artist', 'order__order_id']
+    list_select_related = ['order__user']
+    search_fields = ['^vinyl_title', '^vinyl_artist']
     readonly_fields = ['vinyl_title', 'vinyl_artist', 'vinyl_year', 'created_at']
+    autocomplete_fields = ['order', 'vinyl_record']
     ordering = ['-created_at']
     
     def get_total_price(self, obj):
         return f"${obj.get_total_price()}"
     get_total_price.short_description = 'Total Price'
+
+
+class ArchivedOrderItemInline(admin.TabularInline):
+    model = ArchivedOrderItem
+    fields = ['vinyl_title', 'vinyl_artist', 'vinyl_year', 'quantity', 'price']
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
+
+
+@admin.register(ArchivedOrder)
+class ArchivedOrderAdmin(OrderIdSearchMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ['order_code', 'order_id', 'user', 'status', 'total_amount', 'created_at', 'archived_at']
+    list_filter = ['status', 'created_at']
+    list_select_related = ['user']
+    search_fields = ['=email', '=user__username', '=user__email', '^last_name']
+    exclude = ['invoice_html', 'invoice_pdf']
+    ordering = ['-created_at']
+    inlines = [ArchivedOrderItemInline]
+
+    # Archived orders are history: viewable, not editable
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,81 @@
+"""
+Order archiving.
+
+Delivered and cancelled orders older than ``ORDER_ARCHIVE_AFTER_DAYS`` are
+moved from Order / OrderItem into ArchivedOrder / ArchivedOrderItem by the
+``archive_orders`` command, so the tables checkout, the order history and
+the admin work on stay small. Archived rows keep their primary keys and
+order ids; customer views look orders up with ``get_user_order``, which
+falls back to the archive.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from .invoices import invoice_state
+from .models import Order, OrderItem, OrderInvoice, ArchivedOrder, ArchivedOrderItem
+
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled')
+
+
+def archive_cutoff(days=None):
+    """Orders created before this moment are old enough to archive"""
+    if days is None:
+        days = getattr(settings, 'ORDER_ARCHIVE_AFTER_DAYS', 365)
+    return timezone.now() - timedelta(days=days)
+
+
+def archivable_orders(before):
+    return Order.objects.filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=before)
+
+
+def _copy(instance, model, **extra):
+    values = {field.attname: getattr(instance, field.attname) for field in instance._meta.concrete_fields}
+    values.update(extra)
+    return model(**values)
+
+
+def archive_batch(before, batch_size=500, after_id=0):
+    """
+    Move up to batch_size archivable orders with id > after_id into the archive.
+
+    Copies orders, their items and any current invoice, then deletes the
+    originals, all in one transaction; rows locked by other writers are
+    skipped and picked up by a later run. Returns the ids moved, in order.
+    """
+    with transaction.atomic():
+        orders = list(
+            archivable_orders(before).select_for_update(skip_locked=True)
+            .filter(id__gt=after_id)
+            .order_by('id')[:batch_size]
+        )
+        if not orders:
+            return []
+        ids = [order.id for order in orders]
+
+        invoices = {invoice.order_id: invoice for invoice in OrderInvoice.objects.filter(order_id__in=ids)}
+        archived = []
+        for order in orders:
+            invoice = invoices.get(order.id)
+            if invoice is not None and invoice.state == invoice_state(order):
+                archived.append(_copy(order, ArchivedOrder, invoice_html=invoice.html, invoice_pdf=invoice.pdf))
+            else:
+                archived.append(_copy(order, ArchivedOrder))
+        ArchivedOrder.objects.bulk_create(archived, batch_size=1000)
+        ArchivedOrderItem.objects.bulk_create(
+            [_copy(item, ArchivedOrderItem) for item in OrderItem.objects.filter(order_id__in=ids)],
+            batch_size=1000,
+        )
+
+        # Items and invoices go with their orders
+        Order.objects.filter(id__in=ids).delete()
+    return ids
+
+
+def get_user_order(request, order_id):
+    """The signed-in user's order, live or archived, or 404"""
+    order = Order.objects.filter(order_id=order_id, user=request.user).first()
+    if order is None:
+        order = get_object_or_404(ArchivedOrder, order_id=order_id, user=request.user)
+    return order
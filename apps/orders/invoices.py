@@ -0,0 +1,128 @@
+"""
+Invoice rendering.
+
+Invoices are rendered from the order's item snapshots into HTML once per
+order state and stored in OrderInvoice, with a PDF alongside when WeasyPrint
+is installed (``pip install weasyprint``). ``get_invoice`` serves the stored
+copy and re-renders only when the order has changed since.
+
+``render_invoice_batch`` renders many orders at once for the
+``render_invoices`` management command, which runs batches on a process pool.
+
+Archived orders never change, so their invoice is kept on the ArchivedOrder
+row itself.
+"""
+from collections import namedtuple
+from django.db.models import Prefetch
+from django.template.loader import render_to_string
+from .models import Order, OrderItem, OrderInvoice
+import time
+
+try:
+    from weasyprint import HTML
+    HAS_PDF = True
+except ImportError:
+    HAS_PDF = False
+
+
+def invoice_state(order):
+    """The part of an order an invoice depends on; a change means re-render"""
+    return f'{order.status}:{order.updated_at.isoformat()}'
+
+
+def render_invoice_html(order, items=None):
+    """Render the invoice body for order"""
+    if items is None:
+        items = order.items.all()
+    return render_to_string('orders/invoice_document.html', {'order': order, 'items': items})
+
+
+def render_invoice_document(order, invoice_html):
+    """Wrap an invoice body in a standalone, printable HTML page"""
+    return render_to_string('orders/invoice_print.html', {'order': order, 'invoice_html': invoice_html})
+
+
+def render_invoice_pdf(document):
+    """Return PDF bytes for a printable invoice page, or None without WeasyPrint"""
+    if not HAS_PDF:
+        return None
+    return HTML(string=document).write_pdf()
+
+
+def _render(order, items=None, with_pdf=False):
+    started = time.monotonic()
+    invoice_html = render_invoice_html(order, items)
+    pdf = render_invoice_pdf(render_invoice_document(order, invoice_html)) if with_pdf else None
+    return OrderInvoice(
+        order=order,
+        state=invoice_state(order),
+        html=invoice_html,
+        pdf=pdf,
+        render_ms=int((time.monotonic() - started) * 1000),
+    )
+
+
+ArchivedInvoice = namedtuple('ArchivedInvoice', ['html', 'pdf'])
+
+
+def get_archived_invoice(order):
+    """Return the invoice kept on an ArchivedOrder, rendering it the first time"""
+    if not order.invoice_html:
+        order.invoice_html = render_invoice_html(order)
+        order.invoice_pdf = render_invoice_pdf(render_invoice_document(order, order.invoice_html))
+        order.save(update_fields=['invoice_html', 'invoice_pdf'])
+    return ArchivedInvoice(order.invoice_html, order.invoice_pdf)
+
+
+def get_invoice(order):
+    """Return the stored invoice for order, rendering it if missing or stale"""
+    if order.is_archived:
+        return get_archived_invoice(order)
+
+    invoice = OrderInvoice.objects.filter(order=order).first()
+    if invoice is not None and invoice.state == invoice_state(order):
+        return invoice
+
+    rendered = _render(order, with_pdf=HAS_PDF)
+    invoice, _ = OrderInvoice.objects.update_or_create(
+        order=order,
+        defaults={
+            'state': rendered.state,
+            'html': rendered.html,
+            'pdf': rendered.pdf,
+            'render_ms': rendered.render_ms,
+        },
+    )
+    return invoice
+
+
+def render_invoice_batch(order_ids, with_pdf=True):
+    """
+    Render invoices for order_ids, reusing stored ones that are current.
+
+    Returns [(order_number, printable_html, pdf_bytes_or_None)]. Safe to run
+    in a pool process: it only takes ids and returns plain data.
+    """
+    with_pdf = with_pdf and HAS_PDF
+    orders = Order.objects.filter(id__in=order_ids).select_related('invoice').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.order_by('created_at'))
+    )
+
+    results = []
+    fresh = []
+    for order in orders:
+        invoice = getattr(order, 'invoice', None)
+        if invoice is None or invoice.state != invoice_state(order) or (with_pdf and not invoice.pdf):
+            invoice = _render(order, order.items.all(), with_pdf)
+            fresh.append(invoice)
+        document = render_invoice_document(order, invoice.html)
+        results.append((order.order_number, document, bytes(invoice.pdf) if invoice.pdf else None))
+
+    if fresh:
+        OrderInvoice.objects.bulk_create(
+            fresh,
+            update_conflicts=True,
+            unique_fields=['order'],
+            update_fields=['state', 'html', 'pdf', 'render_ms', 'rendered_at'],
+        )
+    return results
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from apps.orders.archive import archive_batch, archive_cutoff, archivable_orders
+import time
+
+
+class Command(BaseCommand):
+    help = '''
+    Move old delivered and cancelled orders into the archive tables.
+
+    Orders stay reachable from the customer's order history ("Older orders"),
+    order detail and invoice pages; only the live Order / OrderItem tables
+    shrink. The age comes from ORDER_ARCHIVE_AFTER_DAYS unless --days is given.
+
+    USAGE:
+        python manage.py archive_orders
+        python manage.py archive_orders --days 730 --batch-size 1000 --sleep 0.5
+        python manage.py archive_orders --dry-run           # Just count
+
+    Each batch is its own transaction, so the command is safe to stop and re-run.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Archive orders created more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=500, help='Orders moved per transaction')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+        parser.add_argument('--dry-run', action='store_true', help='Report how many orders would be archived')
+
+    def handle(self, *args, **options):
+        before = archive_cutoff(options['days'])
+        remaining = archivable_orders(before).count()
+        self.stdout.write(f'{remaining} orders created before {before:%Y-%m-%d} can be archived')
+        if options['dry_run'] or not remaining:
+            return
+
+        last_id = 0
+        done = 0
+        while True:
+            ids = archive_batch(before, options['batch_size'], after_id=last_id)
+            if not ids:
+                break
+            last_id = ids[-1]
+            done += len(ids)
+            self.stdout.write(f'  {done}/{remaining}')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {done} orders'))
@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.orders.models import Order, generate_order_code
+import time
+
+
+class Command(BaseCommand):
+    help = '''
+    Give orders created before order codes existed their short code.
+
+    Each order gets the first 8 characters of its UUID, which is the order
+    number customers were already shown, so quoted numbers keep working. The
+    rare prefix that is already taken gets a fresh random code instead.
+
+    USAGE:
+        python manage.py backfill_order_codes
+        python manage.py backfill_order_codes --batch-size 5000 --sleep 0.5   # Gentler on a busy database
+
+    Safe to stop and re-run: only orders without a code are touched.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Orders updated per transaction')
+        parser.add_argument('--sleep', type=float, default=0.0, help='Seconds to pause between batches')
+
+    def handle(self, *args, **options):
+        remaining = Order.objects.filter(order_code__isnull=True).count()
+        self.stdout.write(f'{remaining} orders need a code')
+
+        last_id = 0
+        done = 0
+        while True:
+            with transaction.atomic():
+                batch = list(
+                    Order.objects.select_for_update(skip_locked=True)
+                    .filter(order_code__isnull=True, id__gt=last_id)
+                    .order_by('id')
+                    .only('id', 'order_id')[:options['batch_size']]
+                )
+                if not batch:
+                    break
+
+                for order in batch:
+                    order.order_code = str(order.order_id)[:8].upper()
+
+                # Resolve prefixes that clash with existing codes or within the batch
+                wanted = [order.order_code for order in batch]
+                taken = set(Order.objects.filter(order_code__in=wanted).values_list('order_code', flat=True))
+                for order in batch:
+                    while order.order_code in taken:
+                        order.order_code = generate_order_code()
+                    taken.add(order.order_code)
+
+                Order.objects.bulk_update(batch, ['order_code'])
+
+            last_id = batch[-1].id
+            done += len(batch)
+            self.stdout.write(f'  {done}/{remaining}')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {done} order codes'))
@@ -0,0 +1,107 @@
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from apps.orders.models import Order
+import random
+import statistics
+import time
+
+BENCHMARK_USERNAME = 'admin-benchmark'
+STATUSES = [choice for choice, _ in Order.STATUS_CHOICES]
+COUNTRIES = ['Hong Kong', 'Macau', 'Taiwan', 'Singapore', 'Japan']
+
+
+class Command(BaseCommand):
+    help = '''
+    Time the order admin changelist against a large orders table.
+
+    USAGE:
+        python manage.py benchmark_order_admin --seed 1000000     # Top the table up to 1M orders first
+        python manage.py benchmark_order_admin --runs 10          # Just measure
+        python manage.py benchmark_order_admin --cleanup          # Delete the seeded orders
+
+    Seeded orders belong to the "admin-benchmark" user. Run against
+    PostgreSQL: estimated counts are only used there.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='Make sure at least this many orders exist')
+        parser.add_argument('--runs', type=int, default=5, help='Requests per scenario')
+        parser.add_argument('--cleanup', action='store_true', help='Delete seeded orders and exit')
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME,
+            defaults={'email': 'admin-benchmark@example.com', 'is_staff': True, 'is_superuser': True},
+        )
+
+        if options['cleanup']:
+            deleted, _ = Order.objects.filter(user=user).delete()
+            self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} rows'))
+            return
+
+        if options['seed']:
+            self.seed(user, options['seed'])
+
+        sample = Order.objects.order_by('-created_at').values_list('order_id', 'email').first()
+        scenarios = [('changelist', {})]
+        if sample:
+            scenarios += [
+                ('status filter', {'status__exact': 'shipped'}),
+                ('country filter', {'country': 'Macau'}),
+                ('search order number', {'q': str(sample[0])[:8]}),
+                ('search full order id', {'q': str(sample[0])}),
+                ('search email', {'q': sample[1]}),
+                ('page 100', {'p': '99'}),
+            ]
+
+        model_admin = admin.site._registry[Order]
+        factory = RequestFactory()
+        self.stdout.write(f'{"Scenario":<24} {"median ms":>10} {"max ms":>8} {"queries":>8}')
+
+        for name, params in scenarios:
+            timings = []
+            queries = 0
+            for _ in range(options['runs']):
+                request = factory.get('/admin/orders/order/', params)
+                request.user = user
+                with CaptureQueriesContext(connection) as ctx:
+                    started = time.perf_counter()
+                    model_admin.changelist_view(request).render()
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries = len(ctx.captured_queries)
+            self.stdout.write(f'{name:<24} {statistics.median(timings):>10.1f} {max(timings):>8.1f} {queries:>8}')
+
+    def seed(self, user, target, batch_size=10000):
+        missing = target - Order.objects.count()
+        if missing <= 0:
+            return
+
+        self.stdout.write(f'Seeding {missing} orders...')
+        created = 0
+        while created < missing:
+            size = min(batch_size, missing - created)
+            Order.objects.bulk_create([
+                Order(
+                    user=user,
+                    email=f'customer{created + i}@example.com',
+                    first_name='Bench',
+                    last_name=f'Customer{created + i}',
+                    address_line_1='1 Benchmark Road',
+                    city='Hong Kong',
+                    postal_code='000000',
+                    country=random.choice(COUNTRIES),
+                    status=random.choice(STATUSES),
+                    total_amount=random.randint(100, 5000),
+                )
+                for i in range(size)
+            ], batch_size=2000)
+            created += size
+            self.stdout.write(f'  {created}/{missing}')
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Order._meta.db_table}')
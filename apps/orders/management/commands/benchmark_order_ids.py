@@ -0,0 +1,92 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from apps.core.ids import uuid7
+import time
+import uuid
+
+GENERATORS = {
+    'uuid4': uuid.uuid4,
+    'uuid7': uuid7,
+}
+
+
+class Command(BaseCommand):
+    help = '''
+    Compare insert cost of random (uuid4) and time-ordered (uuid7) order ids.
+
+    Each generator fills its own scratch table with a unique UUID column,
+    like orders.order_id, and reports throughput as the table grows, plus
+    the final index size on PostgreSQL. Scratch tables are dropped afterwards.
+
+    USAGE:
+        python manage.py benchmark_order_ids                      # 1M rows each
+        python manage.py benchmark_order_ids --rows 5000000 --batch-size 20000
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Rows inserted per generator')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Rows per INSERT transaction')
+        parser.add_argument('--keep', action='store_true', help='Keep the scratch tables for inspection')
+
+    def handle(self, *args, **options):
+        rows, batch_size = options['rows'], options['batch_size']
+        checkpoints = max(1, rows // batch_size // 10)
+
+        for name, generate in GENERATORS.items():
+            table = f'benchmark_order_ids_{name}'
+            self.create_table(table)
+            self.stdout.write(f'\n{name}: inserting {rows} rows')
+
+            started = time.perf_counter()
+            inserted = 0
+            batches = 0
+            window_started, window_rows = started, 0
+            try:
+                while inserted < rows:
+                    size = min(batch_size, rows - inserted)
+                    values = [(self.adapt(generate()),) for _ in range(size)]
+                    with transaction.atomic(), connection.cursor() as cursor:
+                        cursor.executemany(f'INSERT INTO {table} (order_id) VALUES (%s)', values)
+                    inserted += size
+                    window_rows += size
+                    batches += 1
+
+                    if batches % checkpoints == 0 or inserted == rows:
+                        now = time.perf_counter()
+                        self.stdout.write(f'  {inserted:>10} rows  {window_rows / (now - window_started):>10.0f} rows/s')
+                        window_started, window_rows = now, 0
+
+                elapsed = time.perf_counter() - started
+                summary = f'{name}: {rows} rows in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)'
+                index_size = self.index_size(table)
+                if index_size:
+                    summary += f', unique index {index_size / 1024 / 1024:.1f} MB'
+                self.stdout.write(self.style.SUCCESS(summary))
+            finally:
+                if not options['keep']:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'DROP TABLE IF EXISTS {table}')
+
+    def create_table(self, table):
+        if connection.vendor == 'postgresql':
+            id_column, uuid_column = 'bigserial', 'uuid'
+        else:
+            id_column, uuid_column = 'integer', 'char(32)'
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+            cursor.execute(f'CREATE TABLE {table} (id {id_column} PRIMARY KEY, order_id {uuid_column} NOT NULL UNIQUE)')
+
+    def adapt(self, value):
+        # Match how Django stores UUIDField on each backend
+        return value if connection.vendor == 'postgresql' else value.hex
+
+    def index_size(self, table):
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT pg_relation_size(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary',
+                [table]
+            )
+            row = cursor.fetchone()
+        return row[0] if row else None
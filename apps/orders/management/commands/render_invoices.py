@@ -0,0 +1,100 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from apps.orders.invoices import HAS_PDF, render_invoice_batch
+from apps.orders.models import Order
+from apps.tasks.process import init_process
+import multiprocessing
+import os
+import time
+import zipfile
+
+
+class Command(BaseCommand):
+    help = '''
+    Render invoices for many orders in parallel and write them to one zip archive.
+
+    USAGE:
+        python manage.py render_invoices --month 2026-09                 # Month-end run
+        python manage.py render_invoices --since 2026-09-01 --until 2026-10-01 --status delivered
+        python manage.py render_invoices --month 2026-09 --workers 8 --output september.zip
+        python manage.py render_invoices --month 2026-09 --html-only     # Skip PDFs
+
+    Stored invoices that are still current are reused; new or stale ones are
+    rendered and saved, so a second run is mostly archive writing.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Orders created in this month (YYYY-MM)')
+        parser.add_argument('--since', help='Orders created on or after this date (YYYY-MM-DD)')
+        parser.add_argument('--until', help='Orders created before this date (YYYY-MM-DD)')
+        parser.add_argument('--status', action='append', help='Only orders with this status (repeatable)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Rendering processes')
+        parser.add_argument('--batch-size', type=int, default=200, help='Orders per process task')
+        parser.add_argument('--output', default=None, help='Archive path (default invoices-<timestamp>.zip)')
+        parser.add_argument('--html-only', action='store_true', help='Do not render PDFs')
+
+    def handle(self, *args, **options):
+        orders = Order.objects.exclude(status='cancelled')
+        since, until = self.date_range(options)
+        if since:
+            orders = orders.filter(created_at__gte=since)
+        if until:
+            orders = orders.filter(created_at__lt=until)
+        if options['status']:
+            orders = orders.filter(status__in=options['status'])
+
+        order_ids = list(orders.order_by('id').values_list('id', flat=True))
+        if not order_ids:
+            self.stdout.write('No orders match')
+            return
+
+        with_pdf = HAS_PDF and not options['html_only']
+        if not HAS_PDF and not options['html_only']:
+            self.stdout.write(self.style.WARNING('WeasyPrint is not installed; writing HTML invoices only'))
+
+        batch_size = options['batch_size']
+        batches = [order_ids[i:i + batch_size] for i in range(0, len(order_ids), batch_size)]
+        output = options['output'] or f"invoices-{timezone.now():%Y%m%d-%H%M%S}.zip"
+
+        self.stdout.write(f'Rendering {len(order_ids)} invoices in {len(batches)} batches on {options["workers"]} processes')
+        started = time.monotonic()
+        written = 0
+
+        # Pool processes open their own connections; don't hand them ours
+        connections.close_all()
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive, ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_process,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'vrhp1.settings'),),
+        ) as pool:
+            futures = [pool.submit(render_invoice_batch, batch, with_pdf) for batch in batches]
+            for future in as_completed(futures):
+                for order_number, document, pdf in future.result():
+                    archive.writestr(f'invoice-{order_number}.html', document)
+                    if pdf:
+                        archive.writestr(f'invoice-{order_number}.pdf', pdf)
+                    written += 1
+                self.stdout.write(f'  {written}/{len(order_ids)}')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {written} invoices to {output} in {elapsed:.1f}s ({written / elapsed:.0f}/s)'
+        ))
+
+    def date_range(self, options):
+        try:
+            if options['month']:
+                since = datetime.strptime(options['month'], '%Y-%m')
+                until = since.replace(year=since.year + 1, month=1) if since.month == 12 else since.replace(month=since.month + 1)
+            else:
+                since = datetime.strptime(options['since'], '%Y-%m-%d') if options['since'] else None
+                until = datetime.strptime(options['until'], '%Y-%m-%d') if options['until'] else None
+        except ValueError as e:
+            raise CommandError(f'Invalid date: {e}')
+
+        make_aware = lambda value: timezone.make_aware(value) if value else None
+        return make_aware(since), make_aware(until)
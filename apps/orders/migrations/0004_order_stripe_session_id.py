@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_change_price_fields_to_integer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='stripe_session_id',
+            field=models.CharField(blank=True, max_length=255, null=True, unique=True),
+        ),
+    ]
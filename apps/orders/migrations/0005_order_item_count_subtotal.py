@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:18
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_totals(apps, schema_editor):
+    """Fill item_count/subtotal for existing orders from their items, in batches"""
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+
+    totals = (
+        OrderItem.objects.values('order_id')
+        .annotate(item_count=Sum('quantity'), subtotal=Sum(F('price') * F('quantity')))
+        .order_by('order_id')
+    )
+    batch = []
+    for row in totals.iterator(chunk_size=2000):
+        batch.append(Order(id=row['order_id'], item_count=row['item_count'], subtotal=row['subtotal']))
+        if len(batch) >= 1000:
+            Order.objects.bulk_update(batch, ['item_count', 'subtotal'])
+            batch = []
+    Order.objects.bulk_update(batch, ['item_count', 'subtotal'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_stripe_session_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='subtotal',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_totals, migrations.RunPython.noop),
+    ]
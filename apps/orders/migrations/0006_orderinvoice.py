@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_order_item_count_subtotal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderInvoice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(max_length=100)),
+                ('html', models.TextField()),
+                ('pdf', models.BinaryField(blank=True, null=True)),
+                ('rendered_at', models.DateTimeField(auto_now=True)),
+                ('render_ms', models.PositiveIntegerField(default=0)),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='invoice', to='orders.order')),
+            ],
+        ),
+    ]
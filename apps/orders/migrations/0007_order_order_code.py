@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:02
+
+import apps.orders.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_orderinvoice'),
+    ]
+
+    operations = [
+        # Existing orders keep a NULL code until `manage.py backfill_order_codes` has run,
+        # so adding the column doesn't rewrite the whole table in one transaction
+        migrations.AddField(
+            model_name='order',
+            name='order_code',
+            field=models.CharField(editable=False, max_length=12, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_code',
+            field=models.CharField(default=apps.orders.models.generate_order_code, editable=False, max_length=12, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:28
+
+import apps.core.ids
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_order_order_code'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_orde_order_i_205064_idx',
+        ),
+        migrations.AlterField(
+            model_name='order',
+            name='order_id',
+            field=models.UUIDField(default=apps.core.ids.uuid7, editable=False, unique=True),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:37
+
+import apps.core.ids
+import apps.orders.models
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0009_order_status_created_index'),
+        ('vinyl', '0005_remove_unnecessary_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_id', models.UUIDField(default=apps.core.ids.uuid7, editable=False, unique=True)),
+                ('order_code', models.CharField(default=apps.orders.models.generate_order_code, editable=False, max_length=12, null=True, unique=True)),
+                ('email', models.EmailField(max_length=254)),
+                ('first_name', models.CharField(max_length=100)),
+                ('last_name', models.CharField(max_length=100)),
+                ('phone', models.CharField(blank=True, max_length=20)),
+                ('address_line_1', models.CharField(max_length=255)),
+                ('address_line_2', models.CharField(blank=True, max_length=255)),
+                ('city', models.CharField(max_length=100)),
+                ('state', models.CharField(blank=True, max_length=100)),
+                ('postal_code', models.CharField(max_length=20)),
+                ('country', models.CharField(default='Hong Kong', max_length=100)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('confirmed', 'Confirmed'), ('processing', 'Processing'), ('shipped', 'Shipped'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('total_amount', models.PositiveIntegerField()),
+                ('shipping_cost', models.PositiveIntegerField(default=0)),
+                ('item_count', models.PositiveIntegerField(default=0)),
+                ('subtotal', models.PositiveIntegerField(default=0)),
+                ('notes', models.TextField(blank=True)),
+                ('stripe_session_id', models.CharField(blank=True, max_length=255, null=True, unique=True)),
+                ('shipped_at', models.DateTimeField(blank=True, null=True)),
+                ('delivered_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('invoice_html', models.TextField(blank=True)),
+                ('invoice_pdf', models.BinaryField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_orders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('price', models.PositiveIntegerField()),
+                ('vinyl_title', models.CharField(max_length=300)),
+                ('vinyl_artist', models.CharField(max_length=200)),
+                ('vinyl_year', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='orders.archivedorder')),
+                ('vinyl_record', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_order_items', to='vinyl.vinylrecord')),
+            ],
+            options={
+                'ordering': ['created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedorder',
+            index=models.Index(fields=['user', '-created_at'], name='orders_arch_user_id_6febd8_idx'),
+        ),
+    ]
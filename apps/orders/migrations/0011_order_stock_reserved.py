@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0010_order_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedorder',
+            name='stock_reserved',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stock_reserved',
+            field=models.BooleanField(default=True),
+        ),
+    ]
@@ -1,10 +1,27 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
 from django.contrib.auth.models import User
+from apps.core.ids import uuid7
 from apps.vinyl.models import VinylRecord
-import uuid
+import secrets
 
+# Crockford base32: no I, L, O or U, so codes survive being read out over the phone
+ORDER_CODE_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+ORDER_CODE_LENGTH = 8
 
-class Order(models.Model):
+
+def generate_order_code():
+    """Random 8-character order code, e.g. 7KQ2M9XD"""
+    return ''.join(secrets.choice(ORDER_CODE_ALPHABET) for _ in range(ORDER_CODE_LENGTH))
+
+
+def normalize_order_code(value):
+    """Canonical form of a code typed by a customer or staff member"""
+    code = value.strip().lstrip('#').upper().replace('-', '')
+    return code.translate(str.maketrans({'I': '1', 'L': '1', 'O': '0'}))
+
+
+class AbstractOrder(models.Model):
+    """Fields and helpers shared by live orders and their archived copies"""
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
@@ -13,10 +30,13 @@ class Order(models.Model):
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled'),
     ]
+    is_archived = False
 
     # Order identification
-    order_id = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+    # Time-ordered so new orders append to the index; older orders keep their uuid4 ids
+    order_id = models.UUIDField(default=uuid7, editable=False, unique=True)
+    # Short code customers quote; null only until backfill_order_codes has run on old orders
+    order_code = models.CharField(max_length=12, unique=True, null=True, editable=False, default=generate_order_code)
     
     # Customer information
     email = models.EmailField()
@@ -36,10 +56,18 @@ class Order(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     total_amount = models.PositiveIntegerField()
     shipping_cost = models.PositiveIntegerField(default=0)
+    item_count = models.PositiveIntegerField(default=0)  # Total quantity, stored at creation so lists don't count items
+    subtotal = models.PositiveIntegerField(default=0)  # Sum of line totals before shipping
     
+    # False when payment arrived after the stock was gone; cancelling then has nothing to return
+    stock_reserved = models.BooleanField(default=True)
+
     # Notes and special instructions
     notes = models.TextField(blank=True)
     
+    # Payment
+    stripe_session_id = models.CharField(max_length=255, unique=True, null=True, blank=True)  # Set once a Checkout Session is finalized
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -47,20 +75,15 @@ class Order(models.Model):
     delivered_at = models.DateTimeField(null=True, blank=True)
 
     class Meta:
-        ordering = ['-created_at']
-        indexes = [
-            models.Index(fields=['user', '-created_at']),
-            models.Index(fields=['status']),
-            models.Index(fields=['order_id']),
-        ]
+        abstract = True
 
     def __str__(self):
         return f"Order {self.order_id} - {self.user.username}"
 
     @property
     def order_number(self):
-        """Return order_id as order_number for compatibility"""
-        return str(self.order_id)[:8].upper()
+        """The code customers quote; older orders fall back to the UUID prefix"""
+        return self.order_code or str(self.order_id)[:8].upper()
 
     def get_full_name(self):
         return f"{self.first_name} {self.last_name}"
@@ -73,15 +96,38 @@ class Order(models.Model):
         return ", ".join(filter(None, address_parts))
 
     def get_total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.item_count
 
     def can_be_cancelled(self):
-        return self.status in ['pending', 'confirmed']
+        return not self.is_archived and self.status in ['pending', 'confirmed']
 
 
-class OrderItem(models.Model):
-    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
-    vinyl_record = models.ForeignKey(VinylRecord, on_delete=models.CASCADE)
+class Order(AbstractOrder):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders')
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+            models.Index(fields=['status', '-created_at']),  # Status filters (fulfilment queues) in list order
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
+        # A random code can collide with an existing one; draw a new code and retry
+        for attempt in range(3):
+            try:
+                with transaction.atomic(using=kwargs.get('using')):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                if attempt == 2 or not Order.objects.filter(order_code=self.order_code).exists():
+                    raise
+                self.order_code = generate_order_code()
+
+
+class AbstractOrderItem(models.Model):
+    """Fields shared by live order lines and their archived copies"""
     quantity = models.PositiveIntegerField()
     price = models.PositiveIntegerField()  # Price at time of purchase
     
@@ -93,7 +139,7 @@ class OrderItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        ordering = ['created_at']
+        abstract = True
 
     def __str__(self):
         return f"{self.vinyl_title} x {self.quantity}"
@@ -101,6 +147,14 @@ class OrderItem(models.Model):
     def get_total_price(self):
         return self.price * self.quantity
 
+
+class OrderItem(AbstractOrderItem):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
+    vinyl_record = models.ForeignKey(VinylRecord, on_delete=models.CASCADE)
+
+    class Meta:
+        ordering = ['created_at']
+
     def save(self, *args, **kwargs):
         # Store snapshot of vinyl details
         if not self.vinyl_title:
@@ -108,3 +162,59 @@ class OrderItem(models.Model):
             self.vinyl_artist = self.vinyl_record.artist.name
             self.vinyl_year = self.vinyl_record.release_year
         super().save(*args, **kwargs)
+
+
+class OrderInvoice(models.Model):
+    """
+    An order's invoice, rendered once per order state.
+
+    ``state`` records the order status and last update the invoice was
+    rendered from; a status change or edit makes it stale and the next
+    request re-renders it.
+    """
+    order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='invoice')
+    state = models.CharField(max_length=100)
+    html = models.TextField()
+    pdf = models.BinaryField(null=True, blank=True)  # Only when a PDF renderer is installed
+    rendered_at = models.DateTimeField(auto_now=True)
+    render_ms = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Invoice for order {self.order.order_number}"
+
+
+class ArchivedOrder(AbstractOrder):
+    """
+    A delivered or cancelled order moved out of Order by ``archive_orders``.
+
+    Keeps the original primary key, order_id and order_code, so URLs and
+    quoted order numbers keep working, plus the invoice it was last shown
+    with. Archived orders are read-only history.
+    """
+    is_archived = True
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    # Copied from the live order, not set on insert
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    invoice_html = models.TextField(blank=True)  # Rendered on first request if the order had no stored invoice
+    invoice_pdf = models.BinaryField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+
+
+class ArchivedOrderItem(AbstractOrderItem):
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    # Kept if the record is later deleted; the snapshot fields still describe it
+    vinyl_record = models.ForeignKey(
+        VinylRecord, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_order_items'
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['created_at']
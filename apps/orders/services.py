@@ -0,0 +1,322 @@
+from django.contrib.auth.models import User
+from django.db import transaction, IntegrityError
+from django.db.models import F, Case, When, Value, IntegerField
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from apps.analytics.rollups import record_order_placed
+from apps.cart import payments
+from apps.cart.models import CartItem
+from apps.notifications.outbox import enqueue_email, enqueue_emails, render_email
+from apps.vinyl.models import VinylRecord
+from .models import Order, OrderItem, normalize_order_code
+import re
+import uuid
+
+ORDER_CODE_PATTERN = re.compile(r'^[0-9A-Z]{6,12}$')
+
+
+def order_lookup(term, prefix=''):
+    """
+    Filter kwargs for an order UUID or short order code typed by staff, or
+    None if term is neither. Both hit unique indexes. ``prefix`` is the
+    path to the order, e.g. 'order__' when searching order items.
+    """
+    try:
+        return {f'{prefix}order_id': uuid.UUID(term.strip())}
+    except ValueError:
+        pass
+    code = normalize_order_code(term)
+    if ORDER_CODE_PATTERN.match(code):
+        return {f'{prefix}order_code': code}
+    return None
+
+
+class InsufficientStock(Exception):
+    """Raised when a vinyl record cannot cover the quantity being reserved"""
+
+    def __init__(self, vinyl_record_id, requested):
+        self.vinyl_record_id = vinyl_record_id
+        self.requested = requested
+        super().__init__(f'Insufficient stock for vinyl record {vinyl_record_id} (requested {requested})')
+
+
+def _merge_lines(lines):
+    """Collapse (vinyl_record_id, quantity) pairs into {vinyl_record_id: total}"""
+    totals = {}
+    for vinyl_record_id, quantity in lines:
+        totals[vinyl_record_id] = totals.get(vinyl_record_id, 0) + quantity
+    return totals
+
+
+def _quantity_case(totals):
+    """CASE id WHEN ... THEN quantity END, for applying every line in one UPDATE"""
+    return Case(
+        *[When(id=vinyl_record_id, then=Value(quantity)) for vinyl_record_id, quantity in totals.items()],
+        output_field=IntegerField()
+    )
+
+
+def reserve_stock(lines):
+    """
+    Decrement stock for every (vinyl_record_id, quantity) line or for none.
+
+    The affected rows are locked in id order first so concurrent checkouts
+    always queue in the same sequence and cannot deadlock. A single
+    conditional ``UPDATE ... WHERE stock_quantity >= n`` then applies every
+    line; if any record comes up short InsufficientStock rolls the whole
+    reservation back.
+    """
+    totals = _merge_lines(lines)
+    if not totals:
+        return
+
+    with transaction.atomic():
+        locked = dict(
+            VinylRecord.objects.select_for_update()
+            .filter(id__in=totals)
+            .order_by('id')
+            .values_list('id', 'stock_quantity')
+        )
+        for vinyl_record_id in sorted(totals):
+            if locked.get(vinyl_record_id, 0) < totals[vinyl_record_id]:
+                raise InsufficientStock(vinyl_record_id, totals[vinyl_record_id])
+
+        quantity = _quantity_case(totals)
+        updated = VinylRecord.objects.filter(
+            id__in=totals,
+            stock_quantity__gte=quantity
+        ).update(stock_quantity=F('stock_quantity') - quantity)
+
+        if updated != len(totals):
+            # Only reachable on backends without row locks, where another
+            # writer slipped in between the read and the UPDATE
+            vinyl_record_id = min(totals)
+            raise InsufficientStock(vinyl_record_id, totals[vinyl_record_id])
+
+
+def release_stock(lines):
+    """Return stock for every (vinyl_record_id, quantity) line in one UPDATE"""
+    totals = _merge_lines(lines)
+    if not totals:
+        return
+
+    quantity = _quantity_case(totals)
+    VinylRecord.objects.filter(id__in=totals).update(stock_quantity=F('stock_quantity') + quantity)
+
+
+def order_totals(cart_items):
+    """Return (item_count, subtotal) for cart lines, to store on the Order"""
+    item_count = subtotal = 0
+    for item in cart_items:
+        item_count += item.quantity
+        subtotal += item.get_total_price()
+    return item_count, int(subtotal)
+
+
+def create_order_items(order, cart_items):
+    """
+    Snapshot cart lines into OrderItems, at the line's price, with a single INSERT.
+
+    ``cart_items`` should be fetched with ``select_related('vinyl_record__artist')``
+    so building the snapshots doesn't query per line.
+    """
+    items = []
+    for cart_item in cart_items:
+        vinyl = cart_item.vinyl_record
+        items.append(OrderItem(
+            order=order,
+            vinyl_record=vinyl,
+            quantity=cart_item.quantity,
+            price=cart_item.price,
+            vinyl_title=vinyl.title,
+            vinyl_artist=vinyl.artist.name,
+            vinyl_year=vinyl.release_year,
+        ))
+    return OrderItem.objects.bulk_create(items)
+
+
+def queue_order_confirmation_email(order):
+    """Queue the order confirmation in the outbox; call inside the order's transaction"""
+    body, html_body = render_email('emails/order_confirmation', {'order': order})
+    return enqueue_email(
+        subject=f'Order Confirmation - #{order.order_number}',
+        body=body,
+        html_body=html_body,
+        to=[order.email],
+    )
+
+
+# Fulfilment steps staff can apply in bulk: target status -> statuses it may follow
+FULFILMENT_TRANSITIONS = {
+    'processing': ('confirmed',),
+    'shipped': ('confirmed', 'processing'),
+    'delivered': ('shipped',),
+}
+
+# Statuses customers are emailed about
+NOTIFY_STATUSES = ('shipped', 'delivered')
+
+
+def fulfilment_timestamps(status, now):
+    """Timestamp fields reaching ``status`` should set, e.g. shipped_at for 'shipped'"""
+    stamps = {}
+    if status in ('shipped', 'delivered'):
+        stamps['shipped_at'] = now  # Delivered orders that skipped 'shipped' still get one
+    if status == 'delivered':
+        stamps['delivered_at'] = now
+    return stamps
+
+
+def queue_order_status_emails(orders):
+    """Queue the shipped / delivered email for every order with one INSERT"""
+    messages = []
+    for order in orders:
+        if order.status not in NOTIFY_STATUSES:
+            continue
+        body, html_body = render_email('emails/order_status', {'order': order})
+        messages.append({
+            'subject': f'Order #{order.order_number} has been {order.status}',
+            'body': body,
+            'html_body': html_body,
+            'to': [order.email],
+        })
+    return enqueue_emails(messages)
+
+
+def transition_orders(orders, status):
+    """
+    Move every order in the queryset that may reach ``status`` there at once.
+
+    Eligible rows are locked, then one UPDATE sets the status and fulfilment
+    timestamps (keeping any that are already set), and the customer emails
+    are queued with one INSERT, all in the same transaction. Orders in any
+    other status are left alone. Returns the ids of the orders moved.
+    """
+    if status not in FULFILMENT_TRANSITIONS:
+        raise ValueError(f'Orders cannot be moved to {status!r} in bulk')
+
+    now = timezone.now()
+    changes = {'status': status, 'updated_at': now}
+    for field, value in fulfilment_timestamps(status, now).items():
+        changes[field] = Coalesce(field, Value(value))
+
+    with transaction.atomic():
+        # Re-select by id so joins and ordering on the caller's queryset aren't locked too
+        ids = list(
+            Order.objects.select_for_update()
+            .filter(id__in=orders.values('id'), status__in=FULFILMENT_TRANSITIONS[status])
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+        if not ids:
+            return []
+        Order.objects.filter(id__in=ids).update(**changes)
+        if status in NOTIFY_STATUSES:
+            queue_order_status_emails(
+                Order.objects.filter(id__in=ids).only(
+                    'order_id', 'order_code', 'status', 'email', 'first_name', 'last_name', 'address_line_1',
+                    'address_line_2', 'city', 'state', 'postal_code', 'country',
+                )
+            )
+    return ids
+
+
+def finalize_checkout_session(session):
+    """
+    Turn a paid Stripe Checkout Session into an Order, at most once.
+
+    ``session`` is the plain ``data.object`` dict of a checkout.session.completed
+    event. The unique ``Order.stripe_session_id`` makes this safe to call for
+    every (re)delivery of the event: the first call creates the order, items
+    and stock reservation and empties the cart; later calls return the
+    existing order. Returns ``(order, created)``; order is None while the
+    session is still unpaid.
+
+    The order is built from the lines the session was created for (see
+    ``checkout_lines_metadata``), not from the cart, which may have changed
+    since. Orders whose lines don't add up to the amount paid are kept but
+    left pending for staff to review.
+    """
+    session_id = session['id']
+
+    existing = Order.objects.filter(stripe_session_id=session_id).first()
+    if existing:
+        return existing, False
+
+    if session.get('payment_status') != 'paid':
+        return None, False
+
+    metadata = session.get('metadata') or {}
+    user = User.objects.get(id=metadata['user_id'])
+    details = session.get('customer_details') or {}
+    address = details.get('address') or {}
+
+    review = []
+    lines = payments.checkout_lines(metadata)
+    if lines is None:
+        # Sessions created before their lines were recorded: fall back to the cart
+        if metadata.get('cart_id'):
+            cart_items = CartItem.objects.filter(cart_id=metadata['cart_id'])
+        else:
+            cart_items = CartItem.objects.filter(cart__user=user)
+        cart_items = list(cart_items.select_related('vinyl_record__artist'))
+    else:
+        records = VinylRecord.objects.select_related('artist').in_bulk({vinyl_id for _, vinyl_id, _, _ in lines})
+        # Unsaved stand-ins for the lines as they were charged
+        cart_items = [
+            CartItem(id=item_id, vinyl_record=records[vinyl_id], quantity=quantity, price=amount // 100)
+            for item_id, vinyl_id, quantity, amount in lines
+            if vinyl_id in records
+        ]
+        if len(cart_items) < len(lines):
+            review.append('Some paid records no longer exist')
+        charged = sum(quantity * amount for _, _, quantity, amount in lines)
+        if session.get('amount_total') is not None and session['amount_total'] != charged:
+            review.append(f'Paid {session["amount_total"]} cents but the checkout lines come to {charged}')
+
+    item_count, subtotal = order_totals(cart_items)
+    if session.get('amount_total') is not None:
+        total_amount = session['amount_total'] // 100
+    else:
+        total_amount = metadata.get('total_amount', subtotal)
+
+    try:
+        with transaction.atomic():
+            order = Order.objects.create(
+                user=user,
+                email=details.get('email') or user.email,
+                first_name=user.first_name or 'Customer',
+                last_name=user.last_name or '',
+                address_line_1=address.get('line1') or 'To be updated',  # User can update this later
+                address_line_2=address.get('line2') or '',
+                city=address.get('city') or 'Hong Kong',
+                state=address.get('state') or '',
+                postal_code=address.get('postal_code') or '000000',
+                total_amount=int(float(total_amount)),
+                item_count=item_count,
+                subtotal=subtotal,
+                status='pending' if review else 'confirmed',
+                notes='\n'.join([f'Stripe Payment ID: {session.get("payment_intent")}'] + [
+                    f'{problem} - needs review' for problem in review
+                ]),
+                stripe_session_id=session_id
+            )
+
+            try:
+                reserve_stock((item.vinyl_record_id, item.quantity) for item in cart_items)
+            except InsufficientStock as e:
+                # Payment has already been taken, so keep the order but flag it for staff
+                order.status = 'pending'
+                order.stock_reserved = False
+                order.notes += f'\nStock unavailable for vinyl record {e.vinyl_record_id} at payment time - needs review'
+                order.save(update_fields=['status', 'stock_reserved', 'notes', 'updated_at'])
+
+            create_order_items(order, cart_items)
+            record_order_placed(order)
+            CartItem.objects.filter(id__in=[item.id for item in cart_items]).delete()
+            queue_order_confirmation_email(order)
+    except IntegrityError:
+        # A concurrent delivery of the same event won the insert
+        return Order.objects.get(stripe_session_id=session_id), False
+
+    return order, True
@@ -0,0 +1,8 @@
+from apps.tasks.queue import task
+from .services import finalize_checkout_session
+
+
+@task(max_attempts=5)
+def finalize_checkout(session):
+    """Create the order for a paid Checkout Session delivered by the Stripe webhook"""
+    finalize_checkout_session(session)
@@ -1,3 +1,543 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, Client
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from unittest import mock
+from io import StringIO
+from django.urls import reverse
+from apps.vinyl.models import VinylRecord, Artist, Genre, Label
+from apps.cart.models import Cart, CartItem
+from apps.orders.models import Order, OrderItem, OrderInvoice, ArchivedOrder, ArchivedOrderItem
+from apps.orders.invoices import render_invoice_batch
+from apps.orders.services import InsufficientStock, reserve_stock, transition_orders
+from apps.notifications.models import OutboundEmail
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.utils import timezone
+import threading
+import uuid
 
-# Create your tests here.
+
+def make_vinyl(title='Test Vinyl', stock_quantity=10, price=2599):
+    artist, _ = Artist.objects.get_or_create(name='Test Artist', defaults={'artist_type': 'band'})
+    genre, _ = Genre.objects.get_or_create(name='Test Genre')
+    label, _ = Label.objects.get_or_create(name='Test Label')
+    return VinylRecord.objects.create(
+        title=title,
+        artist=artist,
+        genre=genre,
+        label=label,
+        price=price,
+        stock_quantity=stock_quantity,
+        release_year=2023,
+    )
+
+
+CHECKOUT_DATA = {
+    'billing_first_name': 'Test',
+    'billing_last_name': 'User',
+    'billing_email': 'test@example.com',
+    'billing_address_line_1': '1 Queen\'s Road',
+    'billing_city': 'Hong Kong',
+    'billing_state': 'HK',
+    'billing_postal_code': '000000',
+    'billing_country': 'Hong Kong',
+    'shipping_same_as_billing': 'on',
+}
+
+
+class ReserveStockTestCase(TestCase):
+    def setUp(self):
+        self.vinyl_a = make_vinyl('A', stock_quantity=5)
+        self.vinyl_b = make_vinyl('B', stock_quantity=1)
+
+    def test_reserve_decrements_all_lines(self):
+        """Test every line is decremented when all records have stock"""
+        reserve_stock([(self.vinyl_a.id, 2), (self.vinyl_b.id, 1)])
+
+        self.vinyl_a.refresh_from_db()
+        self.vinyl_b.refresh_from_db()
+        self.assertEqual(self.vinyl_a.stock_quantity, 3)
+        self.assertEqual(self.vinyl_b.stock_quantity, 0)
+
+    def test_losing_line_rolls_back_others(self):
+        """Test a single short line leaves every record untouched"""
+        with self.assertRaises(InsufficientStock) as ctx:
+            reserve_stock([(self.vinyl_a.id, 2), (self.vinyl_b.id, 2)])
+
+        self.assertEqual(ctx.exception.vinyl_record_id, self.vinyl_b.id)
+        self.vinyl_a.refresh_from_db()
+        self.vinyl_b.refresh_from_db()
+        self.assertEqual(self.vinyl_a.stock_quantity, 5)
+        self.assertEqual(self.vinyl_b.stock_quantity, 1)
+
+
+class CreateOrderStockTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='buyer', email='buyer@example.com', password='testpass123')
+        self.vinyl = make_vinyl(stock_quantity=1)
+        cart = Cart.objects.create(user=self.user)
+        self.cart_item = CartItem.objects.create(cart=cart, vinyl_record=self.vinyl, quantity=1)
+        self.client.login(username='buyer', password='testpass123')
+
+    def test_create_order_reserves_stock(self):
+        """Test a successful checkout decrements stock and empties the cart"""
+        response = self.client.post(reverse('orders:create'), CHECKOUT_DATA)
+
+        order = Order.objects.get(user=self.user)
+        self.assertRedirects(response, reverse('orders:detail', args=[order.order_id]), fetch_redirect_response=False)
+        self.vinyl.refresh_from_db()
+        self.assertEqual(self.vinyl.stock_quantity, 0)
+        self.assertFalse(CartItem.objects.filter(cart__user=self.user).exists())
+        self.assertEqual((order.item_count, order.subtotal), (1, 2599))
+
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.to, ['test@example.com'])
+        self.assertIn(order.order_number, email.subject)
+
+    def test_create_order_fails_cleanly_when_stock_is_gone(self):
+        """Test a checkout that loses the last copy creates no order and keeps the cart"""
+        VinylRecord.objects.filter(id=self.vinyl.id).update(stock_quantity=0)
+
+        response = self.client.post(reverse('orders:create'), CHECKOUT_DATA)
+
+        self.assertRedirects(response, reverse('cart:checkout'), fetch_redirect_response=False)
+        self.assertFalse(Order.objects.filter(user=self.user).exists())
+        self.assertTrue(CartItem.objects.filter(id=self.cart_item.id).exists())
+        self.assertFalse(OutboundEmail.objects.exists())
+
+
+class OrderQueryCountTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='bulk', email='bulk@example.com', password='testpass123')
+        self.cart = Cart.objects.create(user=self.user)
+        self.client.login(username='bulk', password='testpass123')
+
+    def fill_cart(self, count):
+        CartItem.objects.filter(cart=self.cart).delete()
+        for i in range(count):
+            vinyl = make_vinyl(f'Bulk {count}-{i}', stock_quantity=5)
+            CartItem.objects.create(cart=self.cart, vinyl_record=vinyl, quantity=2)
+
+    def checkout_queries(self, count):
+        self.fill_cart(count)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('orders:create'), CHECKOUT_DATA)
+        return len(ctx.captured_queries)
+
+    def cancel_queries(self, order):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse('orders:cancel', args=[order.order_id]))
+        return len(ctx.captured_queries)
+
+    def test_checkout_and_cancel_query_count_is_independent_of_cart_size(self):
+        """Test order creation and cancellation cost the same for 1 and 6 lines"""
+        small = self.checkout_queries(1)
+        large = self.checkout_queries(6)
+        self.assertEqual(small, large)
+
+        small_order, large_order = Order.objects.filter(user=self.user).order_by('created_at')
+        self.assertEqual(large_order.items.count(), 6)
+        self.assertEqual(self.cancel_queries(small_order), self.cancel_queries(large_order))
+
+    def test_cancel_restores_stock_and_keeps_snapshots(self):
+        """Test cancelling returns every line's quantity to stock"""
+        self.fill_cart(3)
+        self.client.post(reverse('orders:create'), CHECKOUT_DATA)
+        order = Order.objects.get(user=self.user)
+
+        item = OrderItem.objects.filter(order=order).first()
+        self.assertEqual(item.vinyl_artist, 'Test Artist')
+        self.assertEqual(item.vinyl_record.stock_quantity, 3)
+
+        self.client.post(reverse('orders:cancel', args=[order.order_id]))
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'cancelled')
+        self.assertEqual(
+            list(VinylRecord.objects.filter(orderitem__order=order).values_list('stock_quantity', flat=True)),
+            [5, 5, 5]
+        )
+
+
+class OrderHistoryTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='collector', email='collector@example.com', password='testpass123')
+        self.records = [make_vinyl(f'History {i}') for i in range(3)]
+        self.client.login(username='collector', password='testpass123')
+
+    def add_orders(self, count):
+        for _ in range(count):
+            order = Order.objects.create(
+                user=self.user,
+                email='collector@example.com',
+                first_name='Test',
+                last_name='User',
+                address_line_1='1 Queen\'s Road',
+                city='Hong Kong',
+                postal_code='000000',
+                total_amount=7797,
+                item_count=3,
+                subtotal=7797,
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, vinyl_record=vinyl, quantity=1, price=vinyl.price,
+                          vinyl_title=vinyl.title, vinyl_artist='Test Artist', vinyl_year=2023)
+                for vinyl in self.records
+            ])
+
+    def list_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_order_list_query_count_is_constant(self):
+        """Test a page of order history costs the same for 2 and 30 orders"""
+        self.add_orders(2)
+        small, _ = self.list_queries(reverse('orders:list'))
+
+        self.add_orders(28)
+        large, response = self.list_queries(reverse('orders:list'))
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.context['orders']), 12)
+        self.assertContains(response, '... and 1 more item')
+
+        history, _ = self.list_queries(reverse('accounts:order_history'))
+        self.assertEqual(history, large)
+
+    def test_order_list_is_paginated(self):
+        """Test older orders are reachable on later pages"""
+        self.add_orders(13)
+
+        response = self.client.get(reverse('orders:list') + '?page=2')
+        self.assertEqual(len(response.context['orders']), 1)
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 2)
+
+
+class InvoiceTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='billing', email='billing@example.com', password='testpass123')
+        vinyl = make_vinyl('Invoice Vinyl', price=300)
+        self.order = Order.objects.create(
+            user=self.user,
+            email='billing@example.com',
+            first_name='Test',
+            last_name='User',
+            address_line_1='1 Queen\'s Road',
+            city='Hong Kong',
+            postal_code='000000',
+            total_amount=650,
+            shipping_cost=50,
+            item_count=2,
+            subtotal=600,
+            status='confirmed',
+        )
+        OrderItem.objects.create(order=self.order, vinyl_record=vinyl, quantity=2, price=300)
+        self.client.login(username='billing', password='testpass123')
+        self.url = reverse('orders:invoice', args=[self.order.order_id])
+
+    def test_invoice_is_rendered_once_per_state(self):
+        """Test repeat views reuse the stored invoice until the order changes"""
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Invoice Vinyl')
+        self.assertContains(response, '$600.00')
+        rendered_at = OrderInvoice.objects.get(order=self.order).rendered_at
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertFalse(any('orders_orderitem' in query['sql'] for query in ctx.captured_queries))
+        self.assertEqual(OrderInvoice.objects.get(order=self.order).rendered_at, rendered_at)
+
+        self.order.status = 'shipped'
+        self.order.save()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Shipped')
+        self.assertEqual(OrderInvoice.objects.count(), 1)
+        self.assertNotEqual(OrderInvoice.objects.get(order=self.order).rendered_at, rendered_at)
+
+    def test_batch_renders_printable_documents(self):
+        """Test batch rendering returns standalone pages and stores the invoices"""
+        results = render_invoice_batch([self.order.id], with_pdf=False)
+
+        self.assertEqual(len(results), 1)
+        order_number, document, pdf = results[0]
+        self.assertEqual(order_number, self.order.order_number)
+        self.assertTrue(document.startswith('<!DOCTYPE html>'))
+        self.assertIn('Invoice Vinyl', document)
+        self.assertIsNone(pdf)
+        self.assertTrue(OrderInvoice.objects.filter(order=self.order).exists())
+
+
+class OrderAdminTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='staff', email='staff@example.com', password='testpass123')
+        self.client.login(username='staff', password='testpass123')
+
+    def add_orders(self, count):
+        customer, _ = User.objects.get_or_create(username='customer')
+        Order.objects.bulk_create([
+            Order(user=customer, email=f'c{i}@example.com', first_name='C', last_name=f'Customer{i}',
+                  address_line_1='1 Road', city='Hong Kong', postal_code='000000', total_amount=100)
+            for i in range(count)
+        ])
+
+    def changelist_queries(self, params=None):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('admin:orders_order_changelist'), params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_changelist_query_count_is_constant(self):
+        """Test the order changelist doesn't query per row"""
+        self.add_orders(3)
+        self.changelist_queries()  # Fills the cached country filter
+        small, _ = self.changelist_queries()
+        self.add_orders(40)
+        large, _ = self.changelist_queries()
+
+        self.assertEqual(small, large)
+
+    def test_search_by_order_number_and_id(self):
+        """Test an order number or full UUID finds exactly that order"""
+        self.add_orders(5)
+        order = Order.objects.first()
+
+        for term in (order.order_number, f'#{order.order_number.lower()}', str(order.order_id)):
+            _, response = self.changelist_queries({'q': term})
+            self.assertEqual(list(response.context['cl'].result_list), [order])
+
+
+class FulfilmentTestCase(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='staff', email='staff@example.com', password='testpass123')
+        self.customer = User.objects.create_user(username='customer')
+        self.client.login(username='staff', password='testpass123')
+
+    def add_orders(self, count, status):
+        Order.objects.bulk_create([
+            Order(user=self.customer, email=f'{status}{i}@example.com', first_name='C', last_name=f'Customer{i}',
+                  address_line_1='1 Road', city='Hong Kong', postal_code='000000', total_amount=100, status=status)
+            for i in range(count)
+        ])
+
+    def run_action(self, action, orders):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(reverse('admin:orders_order_changelist'), {
+                'action': action,
+                '_selected_action': [order.pk for order in orders],
+            })
+        self.assertEqual(response.status_code, 302)
+        return len(ctx.captured_queries)
+
+    def test_bulk_ship_sets_timestamps_and_queues_emails(self):
+        """Test shipping moves only eligible orders, stamps shipped_at and emails each customer"""
+        self.add_orders(3, 'confirmed')
+        self.add_orders(1, 'processing')
+        self.add_orders(1, 'pending')
+
+        self.run_action('mark_shipped', Order.objects.all())
+
+        self.assertEqual(Order.objects.filter(status='shipped', shipped_at__isnull=False).count(), 4)
+        self.assertEqual(Order.objects.get(status='pending').shipped_at, None)
+        self.assertEqual(OutboundEmail.objects.count(), 4)
+        self.assertIn('has been shipped', OutboundEmail.objects.first().subject)
+
+        shipped_at = Order.objects.filter(status='shipped').values_list('shipped_at', flat=True).first()
+        transition_orders(Order.objects.all(), 'delivered')
+        delivered = Order.objects.filter(status='delivered')
+        self.assertEqual(delivered.count(), 4)
+        self.assertTrue(all(order.delivered_at and order.shipped_at for order in delivered))
+        self.assertIn(shipped_at, [order.shipped_at for order in delivered])  # Kept, not overwritten
+        self.assertEqual(OutboundEmail.objects.count(), 8)
+
+    def test_bulk_transition_query_count_is_constant(self):
+        """Test shipping 2 or 40 orders costs the same number of queries"""
+        self.add_orders(2, 'confirmed')
+        small = self.run_action('mark_shipped', Order.objects.filter(status='confirmed'))
+        self.add_orders(40, 'confirmed')
+        large = self.run_action('mark_shipped', Order.objects.filter(status='confirmed'))
+
+        self.assertEqual(small, large)
+        self.assertEqual(Order.objects.filter(status='shipped').count(), 42)
+        self.assertEqual(OutboundEmail.objects.count(), 42)
+
+    def test_change_form_status_sets_timestamp(self):
+        """Test shipping a single order from its change form stamps shipped_at"""
+        self.add_orders(1, 'processing')
+        order = Order.objects.get()
+        data = {
+            'user': order.user_id, 'status': 'shipped', 'email': order.email, 'first_name': order.first_name,
+            'last_name': order.last_name, 'address_line_1': order.address_line_1, 'city': order.city,
+            'postal_code': order.postal_code, 'country': order.country, 'total_amount': order.total_amount,
+            'shipping_cost': order.shipping_cost, 'items-TOTAL_FORMS': 0, 'items-INITIAL_FORMS': 0,
+        }
+        self.client.post(reverse('admin:orders_order_change', args=[order.id]), data)
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'shipped')
+        self.assertIsNotNone(order.shipped_at)
+        self.assertEqual(OutboundEmail.objects.get().to, [order.email])
+
+
+class ArchiveTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='archivist', email='archivist@example.com', password='testpass123')
+        self.vinyl = make_vinyl('Archive Vinyl', price=300)
+        self.client.login(username='archivist', password='testpass123')
+
+    def add_order(self, status, age_days):
+        order = Order.objects.create(
+            user=self.user, email='archivist@example.com', first_name='Test', last_name='User',
+            address_line_1='1 Queen\'s Road', city='Hong Kong', postal_code='000000',
+            total_amount=600, item_count=2, subtotal=600, status=status,
+        )
+        OrderItem.objects.create(order=order, vinyl_record=self.vinyl, quantity=2, price=300)
+        Order.objects.filter(id=order.id).update(created_at=timezone.now() - timedelta(days=age_days))
+        order.refresh_from_db()
+        return order
+
+    def test_archive_moves_only_old_finished_orders(self):
+        """Test old delivered/cancelled orders move with their items and invoice; others stay"""
+        delivered = self.add_order('delivered', 400)
+        self.client.get(reverse('orders:invoice', args=[delivered.order_id]))  # Stored invoice travels along
+        cancelled = self.add_order('cancelled', 500)
+        recent = self.add_order('delivered', 10)
+        pending = self.add_order('pending', 400)
+
+        out = StringIO()
+        call_command('archive_orders', '--batch-size', '1', stdout=out)
+
+        self.assertIn('Archived 2 orders', out.getvalue())
+        self.assertEqual(set(Order.objects.values_list('id', flat=True)), {recent.id, pending.id})
+        self.assertEqual(set(ArchivedOrder.objects.values_list('id', flat=True)), {delivered.id, cancelled.id})
+        self.assertEqual(ArchivedOrderItem.objects.count(), 2)
+        self.assertFalse(OrderItem.objects.filter(order_id__in=[delivered.id, cancelled.id]).exists())
+
+        archived = ArchivedOrder.objects.get(id=delivered.id)
+        self.assertEqual((archived.order_id, archived.order_code), (delivered.order_id, delivered.order_code))
+        self.assertEqual(archived.created_at, delivered.created_at)
+        self.assertIn('Archive Vinyl', archived.invoice_html)
+
+        call_command('archive_orders', stdout=StringIO())  # Nothing left to do
+        self.assertEqual(ArchivedOrder.objects.count(), 2)
+
+    def test_customer_pages_read_from_archive(self):
+        """Test detail, invoice and history keep working once an order is archived"""
+        order = self.add_order('delivered', 400)
+        self.add_order('delivered', 10)
+        call_command('archive_orders', stdout=StringIO())
+
+        response = self.client.get(reverse('orders:detail', args=[order.order_id]))
+        self.assertContains(response, order.order_number)
+        self.assertContains(response, 'Archive Vinyl')
+
+        response = self.client.get(reverse('orders:invoice', args=[order.order_id]))
+        self.assertContains(response, '$600.00')
+        self.assertTrue(ArchivedOrder.objects.get(id=order.id).invoice_html)
+
+        response = self.client.get(reverse('orders:list'))
+        self.assertEqual(len(response.context['orders']), 1)
+        self.assertContains(response, 'Older orders')
+        response = self.client.get(reverse('orders:list') + '?archived=1')
+        self.assertEqual([o.order_id for o in response.context['orders']], [order.order_id])
+
+        other = User.objects.create_user(username='other', password='testpass123')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse('orders:detail', args=[order.order_id])).status_code, 404)
+
+
+class OrderCodeTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='quoted', email='quoted@example.com', password='testpass123')
+
+    def make_order(self, **kwargs):
+        return Order.objects.create(
+            user=self.user, email='quoted@example.com', first_name='Q', last_name='User',
+            address_line_1='1 Road', city='Hong Kong', postal_code='000000', total_amount=100, **kwargs
+        )
+
+    def test_new_orders_get_a_unique_code(self):
+        """Test orders are created with a short code that is used as the order number"""
+        order = self.make_order()
+
+        self.assertRegex(order.order_code, r'^[0-9A-HJKMNP-TV-Z]{8}$')
+        self.assertEqual(order.order_number, order.order_code)
+
+    def test_colliding_code_is_redrawn(self):
+        """Test a random code that is already taken is replaced instead of failing the order"""
+        existing = self.make_order()
+        with mock.patch('apps.orders.models.generate_order_code', return_value='NEWCODE1'):
+            order = self.make_order(order_code=existing.order_code)
+
+        self.assertEqual(order.order_code, 'NEWCODE1')
+
+    def test_backfill_uses_uuid_prefix(self):
+        """Test old orders keep the number they were shown, and clashes get a new code"""
+        old = self.make_order(order_id=uuid.uuid4())
+        clash = self.make_order(order_id=uuid.uuid4())
+        Order.objects.filter(id__in=[old.id, clash.id]).update(order_code=None)
+        self.make_order(order_code=str(clash.order_id)[:8].upper())
+
+        call_command('backfill_order_codes', stdout=StringIO())
+
+        old.refresh_from_db()
+        clash.refresh_from_db()
+        self.assertEqual(old.order_code, str(old.order_id)[:8].upper())
+        self.assertNotEqual(clash.order_code, str(clash.order_id)[:8].upper())
+        self.assertFalse(Order.objects.filter(order_code__isnull=True).exists())
+
+    def test_new_orders_use_time_ordered_ids_and_old_ids_still_resolve(self):
+        """Test new order ids are uuid7 while existing uuid4 URLs keep working"""
+        order = self.make_order()
+        legacy = self.make_order(order_id=uuid.uuid4())
+        self.assertEqual(order.order_id.version, 7)
+
+        self.client.login(username='quoted', password='testpass123')
+        response = self.client.get(reverse('orders:detail', args=[legacy.order_id]))
+        self.assertEqual(response.status_code, 200)
+
+    def test_staff_lookup(self):
+        """Test staff can find an order by a loosely typed code; customers can't use the endpoint"""
+        order = self.make_order(order_code='7KQ2M90D')
+        url = reverse('orders:staff_lookup')
+
+        self.client.login(username='quoted', password='testpass123')
+        self.assertEqual(self.client.get(url, {'q': '7KQ2M90D'}).status_code, 302)
+
+        User.objects.create_user(username='support', password='testpass123', is_staff=True)
+        self.client.login(username='support', password='testpass123')
+        response = self.client.get(url, {'q': ' #7kq2m9od '})
+        self.assertEqual(response.json()['order']['order_id'], str(order.order_id))
+        self.assertEqual(self.client.get(url, {'q': 'ZZZZZZZZ'}).status_code, 404)
+
+
+class ReserveStockConcurrencyTestCase(TransactionTestCase):
+    def test_concurrent_reservations_never_oversell(self):
+        """Test many threads racing for one record sell exactly the available stock"""
+        vinyl = make_vinyl(stock_quantity=10)
+        attempts = 40
+        barrier = threading.Barrier(8)
+
+        def buy(_):
+            try:
+                barrier.wait(timeout=5)
+            except threading.BrokenBarrierError:
+                pass
+            try:
+                reserve_stock([(vinyl.id, 1)])
+                return True
+            except InsufficientStock:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(buy, range(attempts)))
+
+        vinyl.refresh_from_db()
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(vinyl.stock_quantity, 0)
@@ -13,4 +13,7 @@ urlpatterns = [
     
     # Order creation
     path('create/', views.create_order, name='create'),
+    
+    # Customer service
+    path('lookup/', views.staff_order_lookup, name='staff_lookup'),
 ]
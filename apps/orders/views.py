@@ -1,30 +1,69 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
+from django.urls import reverse
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_http_methods
 from django.db import transaction
-from django.core.mail import send_mail
-from django.conf import settings
-from django.template.loader import render_to_string
-from .models import Order, OrderItem
+from django.db.models import Prefetch
+from django.core.paginator import Paginator
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+from .archive import get_user_order
+from .invoices import get_invoice
+from .services import (
+    InsufficientStock, reserve_stock, release_stock, order_totals, create_order_items, queue_order_confirmation_email,
+    order_lookup,
+)
+from apps.analytics.rollups import record_order_placed, record_status_change
 from apps.cart.models import Cart, CartItem
 from apps.cart.views import get_or_create_cart
 from apps.vinyl.models import VinylRecord
 import uuid
 
 
+ORDERS_PER_PAGE = 12
+
+
+def get_order_history_page(request):
+    """
+    One page of the user's orders with their items and records prefetched.
+
+    Item counts come from Order.item_count, so rendering a page costs the
+    same handful of queries however many orders the user has. ``?archived=1``
+    pages through archived orders instead.
+    """
+    if request.GET.get('archived') == '1':
+        model, item_model = ArchivedOrder, ArchivedOrderItem
+    else:
+        model, item_model = Order, OrderItem
+    orders = model.objects.filter(user=request.user).order_by('-created_at').prefetch_related(
+        Prefetch('items', queryset=item_model.objects.select_related('vinyl_record'))
+    )
+    paginator = Paginator(orders, ORDERS_PER_PAGE)
+    return paginator.get_page(request.GET.get('page'))
+
+
+def order_history_context(request):
+    page_obj = get_order_history_page(request)
+    return {
+        'orders': page_obj,
+        'page_obj': page_obj,
+        'archived': request.GET.get('archived') == '1',
+        'has_archived_orders': ArchivedOrder.objects.filter(user=request.user).exists(),
+    }
+
+
 @login_required
 def order_list_view(request):
     """List all orders for the current user"""
-    orders = Order.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'orders/order_list.html', {'orders': orders})
+    return render(request, 'orders/order_list.html', order_history_context(request))
 
 
 @login_required
 def order_detail_view(request, order_id):
     """Display order details"""
-    order = get_object_or_404(Order, order_id=order_id, user=request.user)
+    order = get_user_order(request, order_id)
     return render(request, 'orders/order_detail.html', {'order': order})
 
 
@@ -36,7 +75,7 @@ def create_order(request):
     from apps.cart.views import get_or_create_cart
     
     cart = get_or_create_cart(request)
-    cart_items = CartItem.objects.filter(cart=cart).select_related('vinyl_record')
+    cart_items = CartItem.objects.filter(cart=cart).select_related('vinyl_record__artist')
     
     if not cart_items.exists():
         messages.error(request, 'Your cart is empty')
@@ -48,12 +87,6 @@ def create_order(request):
         messages.error(request, 'Please correct the errors in the form')
         return redirect('cart:checkout')
     
-    # Validate stock availability
-    for item in cart_items:
-        if item.quantity > item.vinyl_record.stock_quantity:
-            messages.error(request, f'Insufficient stock for {item.vinyl_record.title}')
-            return redirect('cart:checkout')
-    
     # Get form data
     cleaned_data = form.cleaned_data
     
@@ -74,12 +107,15 @@ def create_order(request):
         shipping_country = cleaned_data['shipping_country']
     
     # Calculate totals
-    subtotal = sum(item.get_total_price() for item in cart_items)
+    item_count, subtotal = order_totals(cart_items)
     shipping_cost = 50 if subtotal < 500 else 0
     total_amount = subtotal + shipping_cost
     
     try:
         with transaction.atomic():
+            # Reserve stock first; a line that loses the race aborts the whole order
+            reserve_stock((item.vinyl_record_id, item.quantity) for item in cart_items)
+            
             # Create the order
             order = Order.objects.create(
                 user=request.user,
@@ -89,6 +125,8 @@ def create_order(request):
                 phone=cleaned_data.get('billing_phone', ''),
                 total_amount=total_amount,
                 shipping_cost=shipping_cost,
+                item_count=item_count,
+                subtotal=subtotal,
                 address_line_1=shipping_address_line_1,
                 address_line_2=shipping_address_line_2,
                 city=shipping_city,
@@ -99,58 +137,32 @@ def create_order(request):
                 status='pending'
             )
             
-            # Create order items and update stock
-            for cart_item in cart_items:
-                OrderItem.objects.create(
-                    order=order,
-                    vinyl_record=cart_item.vinyl_record,
-                    quantity=cart_item.quantity,
-                    price=cart_item.vinyl_record.price
-                )
-                
-                # Update stock quantity
-                vinyl = cart_item.vinyl_record
-                vinyl.stock_quantity -= cart_item.quantity
-                vinyl.save()
+            # Snapshot every cart line into order items with one INSERT
+            create_order_items(order, cart_items)
+            record_order_placed(order)
             
             # Clear the cart
             cart_items.delete()
             
-            # Send confirmation email
-            send_order_confirmation_email(order)
+            # Queue the confirmation email; the outbox worker sends it after commit
+            queue_order_confirmation_email(order)
             
             messages.success(request, f'Order #{order.order_number} placed successfully!')
             return redirect('orders:detail', order_id=order.order_id)
             
+    except InsufficientStock as e:
+        titles = {item.vinyl_record_id: item.vinyl_record.title for item in cart_items}
+        messages.error(request, f'Insufficient stock for {titles.get(e.vinyl_record_id, "an item in your cart")}')
+        return redirect('cart:checkout')
     except Exception as e:
         messages.error(request, 'An error occurred while processing your order. Please try again.')
         return redirect('cart:checkout')
 
 
-def send_order_confirmation_email(order):
-    """Send order confirmation email to customer"""
-    try:
-        subject = f'Order Confirmation - #{order.order_number}'
-        html_message = render_to_string('emails/order_confirmation.html', {'order': order})
-        plain_message = render_to_string('emails/order_confirmation.txt', {'order': order})
-        
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[order.email],
-            html_message=html_message,
-            fail_silently=True  # Don't break the order process if email fails
-        )
-    except Exception as e:
-        # Log the error but don't break the order process
-        pass
-
-
 @login_required
 def order_tracking_view(request, order_id):
     """Display order tracking information"""
-    order = get_object_or_404(Order, order_id=order_id, user=request.user)
+    order = get_user_order(request, order_id)
     return render(request, 'orders/order_tracking.html', {'order': order})
 
 
@@ -160,23 +172,31 @@ def cancel_order(request, order_id):
     """Cancel an order (only if status is pending or confirmed)"""
     order = get_object_or_404(Order, order_id=order_id, user=request.user)
     
-    if order.status not in ['pending', 'confirmed']:
+    def cannot_cancel():
         if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
             return JsonResponse({'success': False, 'error': 'This order cannot be cancelled'})
         messages.error(request, 'This order cannot be cancelled')
         return redirect('orders:detail', order_id=order.order_id)
     
+    if order.status not in ['pending', 'confirmed']:
+        return cannot_cancel()
+    
     try:
         with transaction.atomic():
-            # Restore stock quantities
-            for item in order.items.all():
-                vinyl = item.vinyl_record
-                vinyl.stock_quantity += item.quantity
-                vinyl.save()
+            # Re-check under a row lock so concurrent cancels can't both release stock
+            order = Order.objects.select_for_update().get(pk=order.pk)
+            if order.status not in ['pending', 'confirmed']:
+                return cannot_cancel()
+
+            # Restore stock quantities in one UPDATE; orders paid for after the stock ran out took none
+            if order.stock_reserved:
+                release_stock(order.items.values_list('vinyl_record_id', 'quantity'))
             
             # Update order status
+            old_status = order.status
             order.status = 'cancelled'
-            order.save()
+            order.save(update_fields=['status', 'updated_at'])
+            record_status_change(order, old_status)
             
             if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                 return JsonResponse({'success': True, 'message': f'Order #{order.order_number} has been cancelled'})
@@ -193,6 +213,45 @@ def cancel_order(request, order_id):
 
 @login_required
 def invoice_view(request, order_id):
-    """Display printable invoice"""
-    order = get_object_or_404(Order, order_id=order_id, user=request.user)
-    return render(request, 'orders/invoice.html', {'order': order})
+    """Display printable invoice, rendered once per order state"""
+    order = get_user_order(request, order_id)
+    invoice = get_invoice(order)
+    
+    if request.GET.get('format') == 'pdf' and invoice.pdf:
+        response = HttpResponse(bytes(invoice.pdf), content_type='application/pdf')
+        response['Content-Disposition'] = f'inline; filename="invoice-{order.order_number}.pdf"'
+        return response
+    
+    return render(request, 'orders/invoice.html', {'order': order, 'invoice': invoice})
+
+
+@staff_member_required
+def staff_order_lookup(request):
+    """Find an order by the code a customer quotes (or its UUID) for customer service"""
+    lookup = order_lookup(request.GET.get('q', ''))
+    order = None
+    if lookup:
+        order = (
+            Order.objects.filter(**lookup).select_related('user').first()
+            or ArchivedOrder.objects.filter(**lookup).select_related('user').first()
+        )
+    
+    if order is None:
+        return JsonResponse({'success': False, 'error': 'No order matches that code'}, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'order': {
+            'order_code': order.order_number,
+            'order_id': str(order.order_id),
+            'status': order.status,
+            'customer': order.get_full_name(),
+            'email': order.email,
+            'username': order.user.username,
+            'item_count': order.item_count,
+            'total_amount': order.total_amount,
+            'created_at': order.created_at.isoformat(),
+            'archived': order.is_archived,
+            'admin_url': reverse(f'admin:orders_{order._meta.model_name}_change', args=[order.id]),
+        },
+    })
@@ -0,0 +1,25 @@
+from django.contrib import admin
+from .models import RecordNeighbor, UserRecommendation
+
+
+class ComputedAdmin(admin.ModelAdmin):
+    # Recommendations are derived data; rebuild them with build_recommendations instead of editing
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(RecordNeighbor)
+class RecordNeighborAdmin(ComputedAdmin):
+    list_display = ('record', 'rank', 'neighbor', 'score')
+    list_select_related = ('record', 'neighbor')
+    raw_id_fields = ('record', 'neighbor')
+
+
+@admin.register(UserRecommendation)
+class UserRecommendationAdmin(ComputedAdmin):
+    list_display = ('user', 'rank', 'vinyl_record', 'score')
+    list_select_related = ('user', 'vinyl_record')
+    raw_id_fields = ('user', 'vinyl_record')
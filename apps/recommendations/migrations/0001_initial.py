@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('vinyl', '0005_remove_unnecessary_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecordNeighbor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('neighbor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbor_of', to='vinyl.vinylrecord')),
+                ('record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='neighbors', to='vinyl.vinylrecord')),
+            ],
+            options={
+                'ordering': ['record', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('record', 'rank'), name='unique_record_neighbor_rank')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to=settings.AUTH_USER_MODEL)),
+                ('vinyl_record', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommended_to', to='vinyl.vinylrecord')),
+            ],
+            options={
+                'ordering': ['user', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'rank'), name='unique_user_recommendation_rank')],
+            },
+        ),
+    ]
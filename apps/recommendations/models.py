@@ -0,0 +1,40 @@
+from django.db import models
+from django.contrib.auth.models import User
+from apps.vinyl.models import VinylRecord
+
+
+class RecordNeighbor(models.Model):
+    """
+    One of a record's most similar records ("customers also bought"), from
+    the item-to-item similarities computed by ``build_recommendations``.
+    """
+    record = models.ForeignKey(VinylRecord, on_delete=models.CASCADE, related_name='neighbors')
+    neighbor = models.ForeignKey(VinylRecord, on_delete=models.CASCADE, related_name='neighbor_of')
+    rank = models.PositiveSmallIntegerField()  # 1 = most similar
+    score = models.FloatField()  # Cosine similarity of the two records' customers
+
+    class Meta:
+        ordering = ['record', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['record', 'rank'], name='unique_record_neighbor_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.record_id} -> {self.neighbor_id} (#{self.rank})"
+
+
+class UserRecommendation(models.Model):
+    """One of a user's top recommended records, computed by ``build_recommendations``"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recommendations')
+    vinyl_record = models.ForeignKey(VinylRecord, on_delete=models.CASCADE, related_name='recommended_to')
+    rank = models.PositiveSmallIntegerField()  # 1 = best
+    score = models.FloatField()
+
+    class Meta:
+        ordering = ['user', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'rank'], name='unique_user_recommendation_rank'),
+        ]
+
+    def __str__(self):
+        return f"{self.vinyl_record_id} for {self.user_id} (#{self.rank})"
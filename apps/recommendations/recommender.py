@@ -0,0 +1,170 @@
+"""
+Item-to-item collaborative filtering.
+
+``build_recommendations`` runs offline, from the ``build_recommendations``
+command:
+
+* purchases, wishlist items and good reviews become a sparse user x record
+  matrix of interaction weights (log-damped, so repeat purchases count with
+  diminishing returns),
+* record x record cosine similarities come from one sparse product of the
+  column-normalised matrix with itself, pruned to each record's top
+  neighbours (RecordNeighbor, "customers also bought"),
+* user scores are the interaction matrix times the pruned similarities,
+  computed in slices of users, minus what each user already has; each
+  user's best records are stored as UserRecommendation.
+
+Building needs NumPy and SciPy (``pip install numpy scipy``); serving does
+not. ``recommended_records`` and ``also_bought`` read the tables with one
+indexed query each and skip records that are no longer for sale.
+"""
+from itertools import islice
+from django.db import transaction
+from apps.orders.models import OrderItem, ArchivedOrderItem
+from apps.reviews.models import Review
+from apps.vinyl.models import VinylRecord
+from apps.wishlist.models import WishlistItem
+from .models import RecordNeighbor, UserRecommendation
+
+try:
+    import numpy as np
+    from scipy import sparse
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+PURCHASE_WEIGHT = 3.0
+WISHLIST_WEIGHT = 1.0
+REVIEW_WEIGHTS = {5: 2.0, 4: 1.5, 3: 0.5}  # Lower ratings say nothing about what the user likes
+
+# Users scored per sparse product, to bound memory
+USER_SLICE = 10000
+
+
+def _interactions():
+    """Yield (user id, vinyl id, weight) for every purchase, wishlist item and good review"""
+    for item_model in (OrderItem, ArchivedOrderItem):
+        purchases = (
+            item_model.objects.filter(vinyl_record__isnull=False)
+            .exclude(order__status='cancelled')
+            .values_list('order__user_id', 'vinyl_record_id')
+        )
+        for user_id, vinyl_id in purchases.iterator(chunk_size=5000):
+            yield user_id, vinyl_id, PURCHASE_WEIGHT
+    for user_id, vinyl_id in WishlistItem.objects.values_list('wishlist__user_id', 'vinyl_record_id').iterator(chunk_size=5000):
+        yield user_id, vinyl_id, WISHLIST_WEIGHT
+    reviews = Review.objects.filter(rating__in=REVIEW_WEIGHTS).values_list('user_id', 'vinyl_record_id', 'rating')
+    for user_id, vinyl_id, rating in reviews.iterator(chunk_size=5000):
+        yield user_id, vinyl_id, REVIEW_WEIGHTS[rating]
+
+
+def interaction_matrix():
+    """(CSR users x records matrix, user ids, vinyl ids) of the row and column indexes; None when empty"""
+    data = np.fromiter(_interactions(), dtype=[('user', np.int64), ('vinyl', np.int64), ('weight', np.float64)])
+    if not len(data):
+        return None
+    user_ids, rows = np.unique(data['user'], return_inverse=True)
+    vinyl_ids, columns = np.unique(data['vinyl'], return_inverse=True)
+    # Duplicate (user, record) pairs are summed
+    matrix = sparse.csr_matrix((data['weight'], (rows, columns)), shape=(len(user_ids), len(vinyl_ids)))
+    matrix.data = np.log1p(matrix.data)
+    return matrix, user_ids, vinyl_ids
+
+
+def item_similarities(matrix):
+    """Record x record cosine similarities of matrix's columns, as CSR with a zero diagonal"""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    normalized = (matrix @ sparse.diags(1 / norms)).tocsc()
+    similarities = (normalized.T @ normalized).tocsr()
+    similarities.setdiag(0)
+    similarities.eliminate_zeros()
+    return similarities
+
+
+def top_k(matrix, k):
+    """Yield (row, column indexes, values) with each row's k largest entries, largest first"""
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        values, columns = matrix.data[start:end], matrix.indices[start:end]
+        if len(values) > k:
+            keep = np.argpartition(-values, k)[:k]
+            values, columns = values[keep], columns[keep]
+        order = np.argsort(-values, kind='stable')
+        yield row, columns[order], values[order]
+
+
+def prune(matrix, k):
+    """matrix with only each row's k largest entries"""
+    rows, columns, values = [], [], []
+    for row, row_columns, row_values in top_k(matrix, k):
+        rows.append(np.full(len(row_columns), row))
+        columns.append(row_columns)
+        values.append(row_values)
+    return sparse.csr_matrix(
+        (np.concatenate(values), (np.concatenate(rows), np.concatenate(columns))),
+        shape=matrix.shape,
+    )
+
+
+def _replace(model, objects, batch_size=5000):
+    """Swap model's rows for objects in one transaction, inserting in batches"""
+    written = 0
+    with transaction.atomic():
+        model.objects.all().delete()
+        objects = iter(objects)
+        while batch := list(islice(objects, batch_size)):
+            model.objects.bulk_create(batch)
+            written += len(batch)
+    return written
+
+
+def build_recommendations(neighbors=20, per_user=50):
+    """
+    Recompute RecordNeighbor (neighbors per record) and UserRecommendation
+    (per_user per user) from scratch. Returns {'neighbors': rows, 'recommendations': rows}.
+    """
+    built = interaction_matrix()
+    if built is None:
+        return {'neighbors': _replace(RecordNeighbor, []), 'recommendations': _replace(UserRecommendation, [])}
+    matrix, user_ids, vinyl_ids = built
+
+    similar = prune(item_similarities(matrix), neighbors)
+    neighbor_rows = (
+        RecordNeighbor(record_id=int(vinyl_ids[row]), neighbor_id=int(vinyl_ids[column]), rank=rank, score=float(score))
+        for row, columns, scores in top_k(similar, neighbors)
+        for rank, (column, score) in enumerate(zip(columns, scores), start=1)
+    )
+
+    def user_rows():
+        for start in range(0, matrix.shape[0], USER_SLICE):
+            owned = matrix[start:start + USER_SLICE]
+            scores = (owned @ similar).tocsr()
+            # Nothing the user already bought, wishlisted or reviewed
+            scores = scores - scores.multiply(owned > 0)
+            scores.eliminate_zeros()
+            for row, columns, values in top_k(scores, per_user):
+                for rank, (column, score) in enumerate(zip(columns, values), start=1):
+                    yield UserRecommendation(
+                        user_id=int(user_ids[start + row]), vinyl_record_id=int(vinyl_ids[column]),
+                        rank=rank, score=float(score),
+                    )
+
+    return {
+        'neighbors': _replace(RecordNeighbor, neighbor_rows),
+        'recommendations': _replace(UserRecommendation, user_rows()),
+    }
+
+
+def _for_sale(queryset):
+    return queryset.filter(is_available=True, stock_quantity__gt=0).select_related('artist', 'genre')
+
+
+def recommended_records(user):
+    """Records recommended for user, best first"""
+    return _for_sale(VinylRecord.objects.filter(recommended_to__user=user)).order_by('recommended_to__rank')
+
+
+def also_bought(record):
+    """Records most often bought, wishlisted or liked together with record, most similar first"""
+    return _for_sale(VinylRecord.objects.filter(neighbor_of__record=record)).order_by('neighbor_of__rank')
@@ -0,0 +1,70 @@
+from unittest import skipUnless
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.urls import reverse
+from apps.vinyl.models import VinylRecord, Artist, Genre, Label
+from apps.wishlist.models import Wishlist, WishlistItem
+from .models import RecordNeighbor, UserRecommendation
+from .recommender import HAS_SCIPY, also_bought, build_recommendations, recommended_records
+
+
+class RecommendationsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        artist = Artist.objects.create(name='Test Artist', artist_type='band')
+        genre = Genre.objects.create(name='Test Genre')
+        label = Label.objects.create(name='Test Label')
+        self.records = [
+            VinylRecord.objects.create(
+                title=f'Record {i}', artist=artist, genre=genre, label=label,
+                price=2599, stock_quantity=10, release_year=2023,
+            )
+            for i in range(5)
+        ]
+        self.users = [User.objects.create_user(username=f'listener{i}', password='testpass123') for i in range(3)]
+
+    def wishlist(self, user, *records):
+        wishlist = Wishlist.objects.create(user=user)
+        for record in records:
+            WishlistItem.objects.create(wishlist=wishlist, vinyl_record=record)
+
+    def test_stored_recommendations_are_served_in_one_query(self):
+        first, second, sold_out = self.records[:3]
+        VinylRecord.objects.filter(id=sold_out.id).update(stock_quantity=0)
+        user = self.users[0]
+        UserRecommendation.objects.bulk_create([
+            UserRecommendation(user=user, vinyl_record=record, rank=rank, score=1.0 / rank)
+            for rank, record in enumerate([sold_out, second, first], start=1)
+        ])
+        RecordNeighbor.objects.bulk_create([
+            RecordNeighbor(record=first, neighbor=neighbor, rank=rank, score=1.0 / rank)
+            for rank, neighbor in enumerate([second, sold_out], start=1)
+        ])
+
+        with self.assertNumQueries(1):
+            self.assertEqual(list(recommended_records(user)), [second, first])
+        with self.assertNumQueries(1):
+            self.assertEqual(list(also_bought(first)), [second])
+
+        self.client.login(username='listener0', password='testpass123')
+        response = self.client.get(reverse('home:index'))
+        self.assertEqual(response.context['recommendation_source'], 'history')
+        self.assertEqual(response.context['recommended_vinyl'], [second, first])
+
+    @skipUnless(HAS_SCIPY, 'NumPy and SciPy are not installed')
+    def test_build_from_shared_interests(self):
+        a, b, c, d, _ = self.records
+        self.wishlist(self.users[0], a, b, c)
+        self.wishlist(self.users[1], a, b)
+        self.wishlist(self.users[2], c, d)
+
+        build_recommendations(neighbors=2, per_user=3)
+
+        # a and b always go together
+        self.assertEqual(RecordNeighbor.objects.get(record=a, rank=1).neighbor, b)
+        # listener1 has a and b; c came with them for listener0
+        recommended = list(UserRecommendation.objects.filter(user=self.users[1]).values_list('vinyl_record', flat=True))
+        self.assertEqual(recommended[0], c.id)
+        self.assertNotIn(a.id, recommended)
+        self.assertFalse(UserRecommendation.objects.filter(user=self.users[0], vinyl_record__in=[a, b, c]).exists())
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reviews'
+
+    def ready(self):
+        # Keep ReviewStats in step with review changes
+        from . import signals  # noqa: F401
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from apps.reviews.stats import rebuild_review_stats
+
+
+class Command(BaseCommand):
+    help = '''
+    Recompute per-record review statistics (rating histograms) from reviews.
+
+    The statistics are normally kept current as reviews are written, edited
+    and deleted; use this to repair them after reviews were changed with bulk
+    updates or raw SQL.
+
+    USAGE:
+        python manage.py rebuild_review_stats                 # Every record
+        python manage.py rebuild_review_stats --vinyl 12 34   # Just these records
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vinyl', type=int, nargs='+', help='Vinyl record ids to rebuild')
+
+    def handle(self, *args, **options):
+        rows = rebuild_review_stats(options['vinyl'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt review stats for {rows} records'))
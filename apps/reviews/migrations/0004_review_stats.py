@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_stats(apps, schema_editor):
+    """Build the histogram of every reviewed record with one grouped query"""
+    Review = apps.get_model('reviews', 'Review')
+    ReviewStats = apps.get_model('reviews', 'ReviewStats')
+
+    histograms = (
+        Review.objects.values('vinyl_record_id')
+        .annotate(**{f'rating_{rating}': Count('id', filter=Q(rating=rating)) for rating in range(1, 6)})
+        .order_by('vinyl_record_id')
+    )
+    ReviewStats.objects.bulk_create(
+        (ReviewStats(**row) for row in histograms.iterator(chunk_size=2000)),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0003_remove_review_helpful_count_delete_reviewhelpful'),
+        ('vinyl', '0005_remove_unnecessary_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewStats',
+            fields=[
+                ('vinyl_record', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='review_stats', serialize=False, to='vinyl.vinylrecord')),
+                ('rating_1', models.PositiveIntegerField(default=0)),
+                ('rating_2', models.PositiveIntegerField(default=0)),
+                ('rating_3', models.PositiveIntegerField(default=0)),
+                ('rating_4', models.PositiveIntegerField(default=0)),
+                ('rating_5', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Review stats',
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
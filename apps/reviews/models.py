@@ -38,3 +38,50 @@ class Review(models.Model):
     def get_star_display(self):
         """Return stars as string for template display"""
         return '★' * self.rating + '☆' * (5 - self.rating)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the rating as stored so an edit can move it between ReviewStats counters
+        instance._loaded_rating = dict(zip(field_names, values)).get('rating')
+        return instance
+
+
+class ReviewStats(models.Model):
+    """
+    Rating histogram for one record, kept up to date as reviews are written,
+    edited and deleted (see apps.reviews.stats), so the review page never
+    aggregates over reviews.
+    """
+    RATINGS = range(1, 6)
+
+    vinyl_record = models.OneToOneField(VinylRecord, on_delete=models.CASCADE, primary_key=True, related_name='review_stats')
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'Review stats'
+
+    def __str__(self):
+        return f"Review stats for {self.vinyl_record_id}"
+
+    @property
+    def distribution(self):
+        """{rating: number of reviews}, highest rating first"""
+        return {rating: getattr(self, f'rating_{rating}') for rating in reversed(self.RATINGS)}
+
+    @property
+    def total_reviews(self):
+        return sum(self.distribution.values())
+
+    @property
+    def avg_rating(self):
+        """Mean rating, or None without reviews"""
+        total = self.total_reviews
+        if not total:
+            return None
+        return sum(rating * count for rating, count in self.distribution.items()) / total
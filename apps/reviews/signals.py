@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Review
+from .stats import adjust_review_stats, rebuild_review_stats
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust_review_stats(instance.vinyl_record_id, added=instance.rating)
+    elif getattr(instance, '_loaded_rating', None) is None:
+        # Saved without being loaded first, so the old rating is unknown
+        rebuild_review_stats([instance.vinyl_record_id])
+    else:
+        adjust_review_stats(instance.vinyl_record_id, added=instance.rating, removed=instance._loaded_rating)
+    instance._loaded_rating = instance.rating
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    adjust_review_stats(instance.vinyl_record_id, removed=getattr(instance, '_loaded_rating', None) or instance.rating)
@@ -0,0 +1,78 @@
+"""
+Per-record review statistics.
+
+ReviewStats holds each record's rating histogram. ``signals.py`` adjusts it
+whenever a review is saved or deleted: a new review adds one to its rating's
+counter with one ``INSERT ... ON CONFLICT DO UPDATE``; an edit moves one
+between counters and a deletion takes one away with a single UPDATE.
+
+``read_review_stats`` reads the histogram with one primary-key lookup; the
+review page also sizes its pagination from it, so it is never cached, since
+a stale count would drop reviews off the last page. ``rebuild_review_stats``
+recomputes histograms from the reviews with one grouped query; the
+``rebuild_review_stats`` command uses it to repair drift.
+"""
+from django.db import connection, transaction
+from django.db.models import Count, F, Q, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from .models import Review, ReviewStats
+
+COUNTERS = tuple(f'rating_{rating}' for rating in ReviewStats.RATINGS)
+
+
+def _increment(vinyl_id, rating):
+    table = connection.ops.quote_name(ReviewStats._meta.db_table)
+    column = f'rating_{rating}'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (vinyl_record_id, {", ".join(COUNTERS)}, updated_at) '
+            f'VALUES (%s, {", ".join(["%s"] * len(COUNTERS))}, %s) '
+            f'ON CONFLICT (vinyl_record_id) DO UPDATE SET '
+            f'{column} = {table}.{column} + EXCLUDED.{column}, updated_at = EXCLUDED.updated_at',
+            [vinyl_id] + [int(name == column) for name in COUNTERS] + [timezone.now()],
+        )
+
+
+def adjust_review_stats(vinyl_id, added=None, removed=None):
+    """
+    Count one more review with rating ``added`` and/or one fewer with rating
+    ``removed`` for vinyl_id, with one statement.
+    """
+    if added == removed:
+        return
+    if removed is None:
+        _increment(vinyl_id, added)
+    else:
+        # The row exists for any record with reviews; it is already gone when
+        # the record itself is being deleted, and then there is nothing to do
+        changes = {f'rating_{removed}': Greatest(F(f'rating_{removed}') - 1, Value(0))}
+        if added is not None:
+            changes[f'rating_{added}'] = F(f'rating_{added}') + 1
+        ReviewStats.objects.filter(vinyl_record_id=vinyl_id).update(updated_at=timezone.now(), **changes)
+
+
+def read_review_stats(vinyl_id):
+    """ReviewStats for vinyl_id from the database (an unsaved, empty one when it has no reviews)"""
+    return ReviewStats.objects.filter(pk=vinyl_id).first() or ReviewStats(vinyl_record_id=vinyl_id)
+
+def rebuild_review_stats(vinyl_ids=None):
+    """
+    Recompute the histograms of vinyl_ids (every record when None) from the
+    reviews with one grouped query. Returns the number of records with reviews.
+    """
+    reviews = Review.objects.all()
+    stats = ReviewStats.objects.all()
+    if vinyl_ids is not None:
+        reviews = reviews.filter(vinyl_record_id__in=vinyl_ids)
+        stats = stats.filter(vinyl_record_id__in=vinyl_ids)
+
+    histograms = (
+        reviews.values('vinyl_record_id')
+        .annotate(**{f'rating_{rating}': Count('id', filter=Q(rating=rating)) for rating in ReviewStats.RATINGS})
+        .order_by('vinyl_record_id')
+    )
+    with transaction.atomic():
+        stats.delete()
+        created = ReviewStats.objects.bulk_create([ReviewStats(**row) for row in histograms], batch_size=1000)
+    return len(created)
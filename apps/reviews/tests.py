@@ -1,3 +1,66 @@
 from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from apps.vinyl.models import VinylRecord, Artist, Genre, Label
+from .models import Review, ReviewStats
+from .stats import rebuild_review_stats
 
-# Create your tests here.
+
+class ReviewStatsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        artist = Artist.objects.create(name='Test Artist', artist_type='band')
+        genre = Genre.objects.create(name='Test Genre')
+        label = Label.objects.create(name='Test Label')
+        self.record = VinylRecord.objects.create(
+            title='Test Record', artist=artist, genre=genre, label=label,
+            price=2599, stock_quantity=10, release_year=2023,
+        )
+        self.users = [User.objects.create_user(username=f'listener{i}', password='testpass123') for i in range(4)]
+
+    def review(self, user, rating):
+        return Review.objects.create(vinyl_record=self.record, user=user, rating=rating, comment='Great pressing')
+
+    def stats(self):
+        return ReviewStats.objects.get(vinyl_record=self.record)
+
+    def test_stats_follow_review_changes(self):
+        first = self.review(self.users[0], 5)
+        self.review(self.users[1], 5)
+        self.review(self.users[2], 2)
+        self.assertEqual(self.stats().distribution, {5: 2, 4: 0, 3: 0, 2: 1, 1: 0})
+        self.assertEqual(self.stats().avg_rating, 4)
+
+        edited = Review.objects.get(id=first.id)
+        edited.rating = 3
+        edited.save()
+        self.assertEqual(self.stats().distribution, {5: 1, 4: 0, 3: 1, 2: 1, 1: 0})
+
+        edited.delete()
+        self.assertEqual(self.stats().distribution, {5: 1, 4: 0, 3: 0, 2: 1, 1: 0})
+
+        # Incremental updates agree with a full rebuild
+        expected = self.stats().distribution
+        ReviewStats.objects.all().delete()
+        self.assertEqual(rebuild_review_stats(), 1)
+        self.assertEqual(self.stats().distribution, expected)
+
+    def test_review_page_counts_from_stats(self):
+        for user, rating in zip(self.users, (5, 4, 4, 1)):
+            self.review(user, rating)
+        url = reverse('reviews:list', args=[self.record.id])
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, {'rating': 4})
+        # The record, its stats row and the page of reviews, without COUNT(*)
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertEqual(response.context['review_stats'], {'avg_rating': 3.5, 'total_reviews': 4})
+        self.assertEqual(response.context['rating_distribution'][4], 2)
+        self.assertEqual(len(response.context['page_obj'].object_list), 2)
+
+        Review.objects.filter(rating=1).get().delete()
+        response = self.client.get(url)
+        self.assertEqual(response.context['review_stats']['total_reviews'], 3)
@@ -4,17 +4,18 @@ from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
 from django.core.paginator import Paginator
-from django.db.models import Q, Avg, Count
+from django.db.models import Q
 from django.db import transaction
 from .models import Review
+from .stats import read_review_stats
 from apps.vinyl.models import VinylRecord
-from apps.orders.models import OrderItem
+from apps.orders.models import OrderItem, ArchivedOrderItem
 import json
 
 
 def review_list_view(request, vinyl_id):
     """Display all reviews for a vinyl record"""
-    vinyl_record = get_object_or_404(VinylRecord, id=vinyl_id)
+    vinyl_record = get_object_or_404(VinylRecord.objects.select_related('artist'), id=vinyl_id)
     
     # Get reviews with user
     reviews = Review.objects.filter(vinyl_record=vinyl_record).select_related('user').order_by('-created_at')
@@ -40,22 +41,20 @@ def review_list_view(request, vinyl_id):
     else:  # newest (default)
         reviews = reviews.order_by('-created_at')
     
-    # Pagination
+    # Review statistics, kept per record; read directly since they also size the pages
+    stats = read_review_stats(vinyl_record.id)
+    review_stats = {'avg_rating': stats.avg_rating, 'total_reviews': stats.total_reviews}
+    rating_distribution = stats.distribution
+    
+    # Pagination; the stats already hold the count, so the paginator needn't COUNT(*)
     paginator = Paginator(reviews, 10)  # Show 10 reviews per page
+    if isinstance(rating_filter, int) and 1 <= rating_filter <= 5:
+        paginator.count = rating_distribution[rating_filter]
+    else:
+        paginator.count = stats.total_reviews
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    # Calculate review statistics
-    review_stats = Review.objects.filter(vinyl_record=vinyl_record).aggregate(
-        avg_rating=Avg('rating'),
-        total_reviews=Count('id')
-    )
-    
-    # Rating distribution
-    rating_distribution = {}
-    for i in range(1, 6):
-        rating_distribution[i] = Review.objects.filter(vinyl_record=vinyl_record, rating=i).count()
-    
     context = {
         'vinyl_record': vinyl_record,
         'page_obj': page_obj,
@@ -86,6 +85,10 @@ def write_review_view(request, vinyl_id):
         order__user=request.user,
         vinyl_record=vinyl_record,
         order__status__in=['delivered', 'completed']
+    ).exists() or ArchivedOrderItem.objects.filter(
+        order__user=request.user,
+        vinyl_record=vinyl_record,
+        order__status='delivered'
     ).exists()
     
     if request.method == 'POST':
@@ -0,0 +1,25 @@
+from django.contrib import admin
+from django.utils import timezone
+from .models import Task, PeriodicTask
+
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'priority', 'attempts', 'run_at', 'duration_ms', 'worker', 'created_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'duration_ms', 'worker', 'last_error')
+    ordering = ('-created_at',)
+    actions = ['retry_tasks']
+
+    def retry_tasks(self, request, queryset):
+        updated = queryset.exclude(status='running').update(status='queued', attempts=0, run_at=timezone.now())
+        self.message_user(request, f'{updated} tasks queued again.')
+    retry_tasks.short_description = "Retry selected tasks"
+
+
+@admin.register(PeriodicTask)
+class PeriodicTaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'interval_seconds', 'enabled', 'last_run_at', 'next_run_at')
+    list_editable = ('enabled',)
+    readonly_fields = ('last_run_at',)
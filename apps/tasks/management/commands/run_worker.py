@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from apps.tasks.worker import Worker, task_stats
+from datetime import timedelta
+import signal
+
+
+class Command(BaseCommand):
+    help = '''
+    Run background tasks from the database queue.
+
+    USAGE:
+        python manage.py run_worker                          # 4 threads (TASK_WORKER_CONCURRENCY)
+        python manage.py run_worker --concurrency 8          # More threads for I/O-bound tasks
+        python manage.py run_worker --processes              # Process pool for CPU-bound tasks
+        python manage.py run_worker --once                   # Drain the queue and exit
+        python manage.py run_worker --stats                  # Show task timings for the last 24h
+
+    Several workers can run side by side; tasks are claimed with SKIP LOCKED.
+    '''
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None, help='Tasks run at the same time')
+        parser.add_argument('--processes', action='store_true', help='Use a process pool instead of threads')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds between polls when idle')
+        parser.add_argument('--once', action='store_true', help='Run what is due and exit')
+        parser.add_argument('--stats', action='store_true', help='Print per-task timing and exit')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            return self.print_stats()
+
+        worker = Worker(
+            concurrency=options['concurrency'],
+            mode='process' if options['processes'] else 'thread',
+            poll_interval=options['interval'],
+        )
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+
+        self.stdout.write(f'Worker {worker.worker_id}: {worker.concurrency} {worker.mode}(s)')
+        try:
+            processed = worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            worker.stop()
+            processed = worker.processed
+            self.stdout.write('\nStopping worker')
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {processed} tasks processed'))
+
+    def print_stats(self):
+        rows = task_stats(since=timezone.now() - timedelta(hours=24))
+        if not rows:
+            self.stdout.write('No finished tasks in the last 24 hours')
+            return
+
+        self.stdout.write(f"{'Task':<60} {'Status':<8} {'Runs':>6} {'Avg ms':>8} {'Max ms':>8}")
+        for row in rows:
+            self.stdout.write(
+                f"{row['name']:<60} {row['status']:<8} {row['count']:>6} "
+                f"{row['avg_ms'] or 0:>8.0f} {row['max_ms'] or 0:>8}"
+            )
@@ -0,0 +1,57 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Task(models.Model):
+    """A unit of background work, claimed by workers with SELECT ... FOR UPDATE SKIP LOCKED"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('dead', 'Dead'),  # Out of attempts; kept for inspection and manual retry
+    ]
+
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    priority = models.SmallIntegerField(default=0)  # Higher runs first
+
+    # Execution state
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    last_error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+
+    # Timing
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # Renewed by the worker while the task runs
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.PositiveIntegerField(null=True, blank=True)  # Last attempt's run time
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at']),
+            models.Index(fields=['name', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.id} ({self.status})"
+
+
+class PeriodicTask(models.Model):
+    """Schedule row for a @periodic_task; the row lock makes sure only one worker enqueues each run"""
+    name = models.CharField(max_length=200, unique=True)
+    interval_seconds = models.PositiveIntegerField()
+    enabled = models.BooleanField(default=True)
+    next_run_at = models.DateTimeField(default=timezone.now)
+    last_run_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} every {self.interval_seconds}s"
@@ -0,0 +1,23 @@
+"""
+Entry points for process-pool workers.
+
+Spawned processes import these before Django is set up, so this module must
+not import models at the top level.
+"""
+import os
+
+
+def init_process(settings_module):
+    """Pool initializer: set Django up again in the fresh interpreter"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def execute_in_process(task_id):
+    from django.db import close_old_connections
+    from .worker import execute_task
+
+    # Pool processes keep their connection between tasks, within CONN_MAX_AGE
+    close_old_connections()
+    return execute_task(task_id)
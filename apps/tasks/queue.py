@@ -0,0 +1,106 @@
+"""
+Task registration and enqueueing.
+
+Declare tasks in an app's ``tasks.py`` (they are autodiscovered on startup):
+
+    from apps.tasks.queue import task, periodic_task
+
+    @task(max_attempts=5)
+    def rebuild_thumbnail(vinyl_id):
+        ...
+
+    @periodic_task(every=60)
+    def refresh_home_sections():
+        ...
+
+    rebuild_thumbnail.delay(vinyl.id)
+
+Arguments are stored as JSON, so pass ids rather than model instances.
+Enqueueing is a plain INSERT: call it inside the transaction that makes the
+work necessary and the task only exists if that transaction commits.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from .models import Task
+
+_registry = {}
+_periodic = {}
+
+
+class TaskFunction:
+    """A registered task; call it directly to run inline or use .delay() to queue it"""
+
+    def __init__(self, func, name, max_attempts=None, priority=0):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.priority = priority
+        self.__doc__ = func.__doc__
+        self.__name__ = func.__name__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Queue the task to run as soon as a worker is free"""
+        return self.schedule(args=args, kwargs=kwargs)
+
+    def schedule(self, args=(), kwargs=None, countdown=None, run_at=None, priority=None):
+        """Queue the task with an optional delay (seconds) or start time"""
+        if countdown is not None:
+            run_at = timezone.now() + timedelta(seconds=countdown)
+        return enqueue(
+            self.name,
+            args=args,
+            kwargs=kwargs,
+            run_at=run_at,
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts,
+        )
+
+
+def _task_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def task(func=None, *, name=None, max_attempts=None, priority=0):
+    """Register func as a task; usable as @task or @task(...)"""
+    def decorator(func):
+        task_function = TaskFunction(func, name or _task_name(func), max_attempts, priority)
+        _registry[task_function.name] = task_function
+        return task_function
+
+    return decorator(func) if func is not None else decorator
+
+
+def periodic_task(every, **options):
+    """Register a task that workers enqueue every ``every`` seconds"""
+    def decorator(func):
+        task_function = task(func, **options)
+        _periodic[task_function.name] = int(every)
+        return task_function
+
+    return decorator
+
+
+def get_task(name):
+    """Return the registered TaskFunction for name, or None"""
+    return _registry.get(name)
+
+
+def periodic_tasks():
+    """Return {task name: interval in seconds} for every @periodic_task"""
+    return dict(_periodic)
+
+
+def enqueue(name, args=(), kwargs=None, run_at=None, priority=0, max_attempts=None):
+    """Insert a queued Task row for the task registered as ``name``"""
+    return Task.objects.create(
+        name=name,
+        args=list(args),
+        kwargs=kwargs or {},
+        run_at=run_at or timezone.now(),
+        priority=priority,
+        max_attempts=max_attempts or getattr(settings, 'TASK_MAX_ATTEMPTS', 3),
+    )
@@ -0,0 +1,160 @@
+from datetime import timedelta
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.db.models import F
+from django.utils import timezone
+from apps.tasks.models import Task, PeriodicTask
+from apps.tasks.queue import task, periodic_task, enqueue
+from apps.tasks.worker import (
+    Worker, claim_tasks, execute_task, renew_heartbeats, requeue_stale, run_pending, schedule_periodic, sync_periodic_tasks,
+)
+
+calls = []
+
+
+@task
+def record_call(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def always_fails():
+    raise ValueError('boom')
+
+
+@task
+def reclaimed_while_running():
+    # As if requeue_stale had handed this task to another worker meanwhile
+    Task.objects.filter(status='running').update(worker='other-worker', attempts=F('attempts') + 1)
+
+
+@periodic_task(every=60)
+def heartbeat():
+    calls.append('beat')
+
+
+class TaskQueueTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_delayed_task_runs_and_is_timed(self):
+        """Test a queued task runs once and records its duration"""
+        queued = record_call.delay('hello')
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, ['hello'])
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('done', 1))
+        self.assertIsNotNone(queued.duration_ms)
+
+    def test_future_tasks_wait(self):
+        """Test tasks scheduled for later are not claimed early"""
+        record_call.schedule(args=['later'], countdown=60)
+
+        self.assertEqual(run_pending(), 0)
+        self.assertEqual(calls, [])
+
+    def test_failures_retry_then_dead_letter(self):
+        """Test a failing task is retried with backoff and dead after max_attempts"""
+        with self.assertLogs('apps.tasks.worker', 'WARNING'):
+            queued = always_fails.delay()
+            run_pending()
+
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('queued', 1))
+        self.assertGreater(queued.run_at, timezone.now())
+        self.assertIn('ValueError: boom', queued.last_error)
+
+        Task.objects.filter(id=queued.id).update(run_at=timezone.now())
+        with self.assertLogs('apps.tasks.worker', 'ERROR'):
+            run_pending()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), ('dead', 2))
+
+    def test_unknown_task_is_dead_lettered(self):
+        """Test a task nobody registered goes straight to dead"""
+        queued = enqueue('apps.missing.task')
+
+        with self.assertLogs('apps.tasks.worker', 'ERROR'):
+            run_pending()
+
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, 'dead')
+
+    def test_claimed_tasks_are_not_claimed_twice(self):
+        """Test a second claim skips tasks that are already running"""
+        for i in range(3):
+            record_call.delay(i)
+
+        first = claim_tasks(2, 'worker-a')
+        second = claim_tasks(2, 'worker-b')
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse(set(first) & set(second))
+
+    @override_settings(TASK_STALE_AFTER=60)
+    def test_stale_running_tasks_are_requeued(self):
+        """Test tasks abandoned by a dead worker go back in the queue"""
+        queued = record_call.delay('lost')
+        claim_tasks(1, 'crashed')
+        long_ago = timezone.now() - timedelta(minutes=5)
+        Task.objects.filter(id=queued.id).update(started_at=long_ago, heartbeat_at=long_ago)
+
+        with self.assertLogs('apps.tasks.worker', 'WARNING'):
+            self.assertEqual(requeue_stale(), 1)
+        run_pending()
+        self.assertEqual(calls, ['lost'])
+
+    @override_settings(TASK_STALE_AFTER=60)
+    def test_long_tasks_with_a_heartbeat_are_left_running(self):
+        """Test a task started long ago is not requeued while its worker renews the heartbeat"""
+        queued = record_call.delay('slow')
+        claim_tasks(1, 'busy')
+        long_ago = timezone.now() - timedelta(minutes=5)
+        Task.objects.filter(id=queued.id).update(started_at=long_ago, heartbeat_at=long_ago)
+
+        self.assertEqual(renew_heartbeats([queued.id], 'other-worker'), 0)
+        self.assertEqual(renew_heartbeats([queued.id], 'busy'), 1)
+
+        self.assertEqual(requeue_stale(), 0)
+        self.assertEqual(Task.objects.get(id=queued.id).status, 'running')
+
+    def test_outcome_of_a_lost_claim_is_not_recorded(self):
+        """Test a run whose task was requeued and claimed again leaves the newer run's state alone"""
+        queued = reclaimed_while_running.delay()
+        [task_id] = claim_tasks(1, 'slow-worker')
+
+        with self.assertLogs('apps.tasks.worker', 'WARNING'):
+            execute_task(task_id)
+
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.worker, queued.attempts), ('running', 'other-worker', 2))
+        self.assertIsNone(queued.finished_at)
+
+    def test_periodic_tasks_are_enqueued_once_per_interval(self):
+        """Test due periodic tasks are queued once and rescheduled"""
+        sync_periodic_tasks()
+        name = heartbeat.name
+
+        self.assertGreaterEqual(schedule_periodic(), 1)
+        self.assertEqual(schedule_periodic(), 0)
+        self.assertEqual(Task.objects.filter(name=name).count(), 1)
+        self.assertGreater(PeriodicTask.objects.get(name=name).next_run_at, timezone.now())
+
+
+class WorkerTestCase(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_thread_worker_drains_queue(self):
+        """Test a threaded worker runs every queued task"""
+        for i in range(10):
+            record_call.delay(i)
+
+        # Every task is claimed in the first pass, so the claim transaction
+        # never overlaps the threads' writes (SQLite allows only one writer)
+        processed = Worker(concurrency=10, poll_interval=0.05).run(once=True)
+
+        self.assertEqual(processed, 10)
+        self.assertEqual(sorted(calls), list(range(10)))
+        self.assertEqual(Task.objects.filter(status='done').count(), 10)
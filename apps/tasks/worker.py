@@ -0,0 +1,261 @@
+"""
+Task execution.
+
+``Worker`` is the loop behind ``python manage.py run_worker``. Each pass it:
+
+1. enqueues due periodic tasks (PeriodicTask rows are claimed with SKIP
+   LOCKED, so running several workers never double-schedules),
+2. renews the heartbeat of the tasks it is running, every
+   TASK_HEARTBEAT_INTERVAL seconds, with one UPDATE,
+3. requeues tasks whose worker died mid-run: running, with no heartbeat for
+   TASK_STALE_AFTER seconds, so long but healthy tasks are left alone,
+4. claims as many queued tasks as it has free slots, marking them running
+   in the same transaction, and hands their ids to a thread or process pool.
+
+``execute_task`` runs one claimed task and records its outcome: done, back
+to queued with exponential backoff, or dead once max_attempts is used up.
+"""
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import Avg, Count, F, Max, Q
+from django.utils import timezone
+from .models import PeriodicTask, Task
+from apps.core.invalidation import start_listener
+from .queue import get_task, periodic_tasks
+from . import process
+import logging
+import multiprocessing
+import os
+import socket
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+
+def _backoff(attempts):
+    base = getattr(settings, 'TASK_RETRY_BACKOFF', 30)
+    return timedelta(seconds=min(base * (2 ** (attempts - 1)), 60 * 60))
+
+
+def sync_periodic_tasks():
+    """Create or update a PeriodicTask row for every registered @periodic_task"""
+    for name, interval in periodic_tasks().items():
+        PeriodicTask.objects.update_or_create(name=name, defaults={'interval_seconds': interval})
+
+
+def schedule_periodic():
+    """Enqueue every periodic task that is due; returns how many were queued"""
+    now = timezone.now()
+    with transaction.atomic():
+        due = list(
+            PeriodicTask.objects.select_for_update(skip_locked=True)
+            .filter(enabled=True, next_run_at__lte=now)
+        )
+        queued = []
+        for periodic in due:
+            task_function = get_task(periodic.name)
+            if task_function is None:
+                continue
+            queued.append(Task(
+                name=periodic.name,
+                priority=task_function.priority,
+                max_attempts=task_function.max_attempts or getattr(settings, 'TASK_MAX_ATTEMPTS', 3),
+            ))
+            periodic.last_run_at = now
+            periodic.next_run_at = now + timedelta(seconds=periodic.interval_seconds)
+        Task.objects.bulk_create(queued)
+        PeriodicTask.objects.bulk_update(due, ['last_run_at', 'next_run_at'])
+    return len(queued)
+
+
+def requeue_stale():
+    """Put tasks back in the queue whose worker stopped without finishing them"""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'TASK_STALE_AFTER', 600))
+    stale = Task.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status='running',
+    )
+    dead = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='dead', finished_at=timezone.now(), last_error='Worker stopped while running the task'
+    )
+    requeued = stale.update(status='queued', run_at=timezone.now(), worker='')
+    if dead or requeued:
+        logger.warning('Recovered stale tasks: %d requeued, %d dead', requeued, dead)
+    return requeued
+
+
+def claim_tasks(limit, worker_id=''):
+    """Mark up to ``limit`` due tasks as running for this worker and return their ids"""
+    with transaction.atomic():
+        ids = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', run_at__lte=timezone.now())
+            .order_by('-priority', 'run_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if ids:
+            now = timezone.now()
+            Task.objects.filter(id__in=ids).update(
+                status='running',
+                worker=worker_id,
+                started_at=now,
+                heartbeat_at=now,
+                attempts=F('attempts') + 1,
+            )
+    return ids
+
+
+def renew_heartbeats(task_ids, worker_id):
+    """Mark this worker's running tasks as alive, so requeue_stale leaves them be"""
+    if not task_ids:
+        return 0
+    return Task.objects.filter(id__in=task_ids, status='running', worker=worker_id).update(heartbeat_at=timezone.now())
+
+
+def execute_task(task_id):
+    """Run one claimed task and store its outcome; returns (task_id, name, status, duration_ms)"""
+    task = Task.objects.get(id=task_id)
+    task_function = get_task(task.name)
+
+    started = time.monotonic()
+    try:
+        if task_function is None:
+            raise LookupError(f'No task registered as {task.name!r}')
+        task_function(*task.args, **task.kwargs)
+    except Exception as e:
+        duration_ms = int((time.monotonic() - started) * 1000)
+        if task_function is None or task.attempts >= task.max_attempts:
+            status, run_at = 'dead', task.run_at
+            logger.error('Task %s #%s is dead after %d attempt(s): %s', task.name, task.id, task.attempts, e)
+        else:
+            status, run_at = 'queued', timezone.now() + _backoff(task.attempts)
+            logger.warning('Task %s #%s failed (attempt %d), retrying: %s', task.name, task.id, task.attempts, e)
+        outcome = dict(status=status, run_at=run_at, last_error=traceback.format_exc())
+    else:
+        duration_ms = int((time.monotonic() - started) * 1000)
+        status = 'done'
+        outcome = dict(status=status)
+        logger.info('Task %s #%s done in %dms', task.name, task.id, duration_ms)
+
+    # Only while this claim still holds the task: once requeued as stale and
+    # claimed again, the newer run owns its status, attempts and error
+    recorded = Task.objects.filter(
+        id=task.id, status='running', worker=task.worker, attempts=task.attempts,
+    ).update(finished_at=timezone.now(), duration_ms=duration_ms, **outcome)
+    if not recorded:
+        logger.warning(
+            'Task %s #%s finished as %s after its claim was lost (attempt %d); outcome not recorded',
+            task.name, task.id, status, task.attempts,
+        )
+    return task.id, task.name, status, duration_ms
+
+
+def _execute_in_thread(task_id):
+    try:
+        return execute_task(task_id)
+    finally:
+        connection.close()
+
+
+def run_pending(limit=100):
+    """Run every due task in this thread until the queue is empty; returns the number run"""
+    count = 0
+    while True:
+        ids = claim_tasks(limit, worker_id='inline')
+        if not ids:
+            return count
+        for task_id in ids:
+            execute_task(task_id)
+        count += len(ids)
+
+
+def task_stats(since=None):
+    """Per task name: runs, failures and average/max duration of finished attempts"""
+    tasks = Task.objects.filter(finished_at__isnull=False)
+    if since:
+        tasks = tasks.filter(finished_at__gte=since)
+    return list(
+        tasks.values('name', 'status')
+        .annotate(count=Count('id'), avg_ms=Avg('duration_ms'), max_ms=Max('duration_ms'))
+        .order_by('name', 'status')
+    )
+
+
+class Worker:
+    """Claim tasks from the database and run them on a thread or process pool"""
+
+    def __init__(self, concurrency=None, mode='thread', poll_interval=1.0, worker_id=None):
+        self.concurrency = concurrency or getattr(settings, 'TASK_WORKER_CONCURRENCY', 4)
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        self.processed = 0
+
+    def _executor(self):
+        if self.mode == 'process':
+            # Never hand an open DB connection to another process
+            connections.close_all()
+            return ProcessPoolExecutor(
+                max_workers=self.concurrency,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=process.init_process,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'vrhp1.settings'),),
+            ), process.execute_in_process
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='task-worker'), _execute_in_thread
+
+    def run(self, once=False):
+        """Process tasks until stop() is called, or until the queue is drained if once"""
+        sync_periodic_tasks()
+        if not once:
+            # Tasks read the same in-process caches as web requests
+            start_listener()
+        executor, run_task = self._executor()
+        in_flight = {}  # {future: task id}
+        heartbeat_interval = getattr(settings, 'TASK_HEARTBEAT_INTERVAL', 30)
+        last_recovery = last_heartbeat = 0
+
+        with executor:
+            while not self.stopping:
+                close_old_connections()
+                if not once:
+                    schedule_periodic()
+                if in_flight and time.monotonic() - last_heartbeat > heartbeat_interval:
+                    renew_heartbeats(list(in_flight.values()), self.worker_id)
+                    last_heartbeat = time.monotonic()
+                if time.monotonic() - last_recovery > 60:
+                    requeue_stale()
+                    last_recovery = time.monotonic()
+
+                free = self.concurrency - len(in_flight)
+                for task_id in claim_tasks(free, self.worker_id) if free else []:
+                    in_flight[executor.submit(run_task, task_id)] = task_id
+
+                if in_flight:
+                    done, _ = wait(in_flight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        del in_flight[future]
+                        self._finished(future)
+                elif once:
+                    break
+                else:
+                    time.sleep(self.poll_interval)
+
+            for future in wait(in_flight).done:
+                self._finished(future)
+
+        return self.processed
+
+    def _finished(self, future):
+        self.processed += 1
+        try:
+            future.result()
+        except Exception:
+            # execute_task records task failures itself; this is the worker failing
+            logger.exception('Task execution crashed in %s', self.worker_id)
+
+    def stop(self):
+        self.stopping = True
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from apps.core.admin import LargeTableAdminMixin, CachedAllValuesFieldListFilter, CachedRelatedFieldListFilter
 from .models import Artist, Genre, Label, VinylRecord
 
 
@@ -26,10 +27,17 @@ class ArtistAdmin(admin.ModelAdmin):
 
 
 @admin.register(VinylRecord)
-class VinylRecordAdmin(admin.ModelAdmin):
+class VinylRecordAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ['title', 'artist', 'genre', 'release_year', 'price', 'stock_quantity', 'is_available', 'featured']
-    list_filter = ['genre', 'label', 'condition', 'speed', 'size', 'is_available', 'featured', 'release_year']
+    list_filter = [
+        ('genre', CachedRelatedFieldListFilter),
+        ('label', CachedRelatedFieldListFilter),
+        'condition', 'speed', 'size', 'is_available', 'featured',
+        ('release_year', CachedAllValuesFieldListFilter),
+    ]
+    list_select_related = ['artist', 'genre']
     search_fields = ['title', 'artist__name']
+    autocomplete_fields = ['artist', 'genre', 'label']
     list_editable = ['price', 'stock_quantity', 'is_available', 'featured']
     readonly_fields = ['slug', 'created_at', 'updated_at']
     ordering = ['-created_at']
@@ -55,6 +63,3 @@ class VinylRecordAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         })
     )
-    
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('artist', 'genre', 'label')
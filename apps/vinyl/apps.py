@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class VinylConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.vinyl'
+
+    def ready(self):
+        # Invalidate cached catalogue listings when the catalogue changes
+        from . import catalog  # noqa: F401
+        # Drop the in-process genre, label and artist tables when they change
+        from . import dimensions  # noqa: F401
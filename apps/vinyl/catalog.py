@@ -0,0 +1,85 @@
+"""
+Cached catalogue listings.
+
+``catalog_cache`` holds the derived data behind the catalogue pages every
+visitor requests: the first page and record count of each artist-type
+category, the record count of each vinyl_list filter combination and the
+per-genre counts shown in its genre filter. Expired values keep being served
+while one request recomputes them (see apps.core.cache).
+
+The whole namespace is invalidated, in every process (apps.core.invalidation),
+when a record, artist, genre or label is saved or deleted. Stock changes made
+by checkout are queryset updates and show up once the soft TTL has passed.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Avg, Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.core.cache import DerivedCache
+from apps.core.invalidation import publish, subscribe
+from .models import VinylRecord, Artist, Genre, Label
+import hashlib
+
+PAGE_SIZE = 12
+
+catalog_cache = DerivedCache(
+    'catalog',
+    soft_ttl=getattr(settings, 'CATALOG_CACHE_SOFT_TTL', 60),
+    hard_ttl=getattr(settings, 'CATALOG_CACHE_HARD_TTL', 900),
+)
+
+
+def _category_records(artist_type):
+    return VinylRecord.objects.filter(
+        is_available=True,
+        artist__artist_type=artist_type
+    ).select_related('artist', 'genre', 'label').annotate(
+        average_rating=Avg('reviews__rating'),
+        review_count=Count('reviews', distinct=True)
+    ).order_by('-created_at')
+
+
+def category_page(request, artist_type):
+    """The requested page of a category; its count and first page come from the cache"""
+    records = _category_records(artist_type)
+
+    def first_page():
+        return list(records[:PAGE_SIZE]), records.count()
+
+    first, count = catalog_cache.get(f'category:{artist_type}', first_page)
+    paginator = Paginator(records, PAGE_SIZE)
+    paginator.count = count
+    page_obj = paginator.get_page(request.GET.get('page'))
+    if page_obj.number == 1:
+        page_obj.object_list = first
+    return page_obj
+
+
+def listing_count(records, filters):
+    """records.count(), cached per combination of filter values"""
+    digest = hashlib.md5(repr(sorted(filters.items())).encode()).hexdigest()
+    return catalog_cache.get(f'count:{digest}', records.count)
+
+
+def genre_counts():
+    """{genre id: number of available records}"""
+    return catalog_cache.get('genre_counts', lambda: dict(
+        VinylRecord.objects.filter(is_available=True).order_by()
+        .values_list('genre_id').annotate(records=Count('id'))
+    ))
+
+
+@receiver(post_save, sender=VinylRecord)
+@receiver(post_delete, sender=VinylRecord)
+@receiver(post_save, sender=Artist)
+@receiver(post_delete, sender=Artist)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Label)
+@receiver(post_delete, sender=Label)
+def catalog_changed(sender, **kwargs):
+    publish('catalog')
+
+
+subscribe('catalog', lambda keys: catalog_cache.invalidate())
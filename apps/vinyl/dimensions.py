@@ -0,0 +1,122 @@
+"""
+Process-local copies of the small dimension tables: genres, labels, artists.
+
+Every catalogue page, the search form and the profile editor need the full
+list of genres (and often labels and artists) but the tables rarely change,
+so each process loads a table once and answers from memory:
+
+- ``all()`` is the table in name order and ``count()`` its length,
+  ``get(pk)`` and ``name(pk)`` look up by id, ``id_for(name)`` by exact,
+  case-insensitive name and ``valid_ids(values)`` filters submitted ids down
+  to existing rows;
+- saving or deleting a row publishes on the invalidation bus
+  (apps.core.invalidation), which drops the table in every process;
+- each table carries a version that invalidation bumps, and a load started
+  before an invalidation is returned but not kept, so a concurrent write
+  can't leave an old snapshot in place. DIMENSION_CACHE_TTL bounds the age of
+  a snapshot should a notification be missed.
+
+Callers get copies of the cached instances and may annotate them freely.
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.core.invalidation import publish, subscribe
+from .models import Genre, Label, Artist
+import copy
+import threading
+import time
+
+
+class Dimension:
+    def __init__(self, model):
+        self.model = model
+        self._lock = threading.Lock()
+        self._version = 0
+        self._snapshot = None
+        self._loaded_at = 0
+
+    def _rows(self):
+        """(rows in name order, {id: row}, {lowercased name: id}), loading them if needed"""
+        ttl = getattr(settings, 'DIMENSION_CACHE_TTL', 300)
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loaded_at < ttl:
+            return snapshot
+
+        version = self._version
+        rows = list(self.model.objects.order_by('name'))
+        snapshot = (
+            rows,
+            {row.pk: row for row in rows},
+            {row.name.lower(): row.pk for row in rows},
+        )
+        with self._lock:
+            if self._version == version:
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+        return snapshot
+
+    def all(self):
+        return [copy.copy(row) for row in self._rows()[0]]
+
+    def count(self):
+        return len(self._rows()[0])
+
+    def get(self, pk):
+        """The row with id pk, or None"""
+        try:
+            row = self._rows()[1].get(int(pk))
+        except (TypeError, ValueError):
+            return None
+        return copy.copy(row) if row is not None else None
+
+    def name(self, pk):
+        row = self.get(pk)
+        return row.name if row is not None else None
+
+    def id_for(self, name):
+        return self._rows()[2].get(name.strip().lower())
+
+    def valid_ids(self, values):
+        """The ids among values (ints or strings) that exist, in order and without duplicates"""
+        by_id = self._rows()[1]
+        ids = []
+        for value in values:
+            try:
+                pk = int(value)
+            except (TypeError, ValueError):
+                continue
+            if pk in by_id and pk not in ids:
+                ids.append(pk)
+        return ids
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+
+
+genres = Dimension(Genre)
+labels = Dimension(Label)
+artists = Dimension(Artist)
+
+DIMENSIONS = {dimension.model._meta.label_lower: dimension for dimension in (genres, labels, artists)}
+
+
+def dimensions_changed(keys):
+    for key in DIMENSIONS if keys is None else keys:
+        if key in DIMENSIONS:
+            DIMENSIONS[key].invalidate()
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+@receiver(post_save, sender=Label)
+@receiver(post_delete, sender=Label)
+@receiver(post_save, sender=Artist)
+@receiver(post_delete, sender=Artist)
+def dimension_changed(sender, **kwargs):
+    publish('dimensions', [sender._meta.label_lower])
+
+
+subscribe('dimensions', dimensions_changed)
@@ -1,5 +1,47 @@
 from django import forms
-from apps.vinyl.models import VinylRecord, Genre, Artist, Label
+from django.core.exceptions import ValidationError
+from django.forms.models import ModelChoiceIterator
+from apps.vinyl.models import VinylRecord
+from .dimensions import genres, artists, labels
+
+
+class DimensionChoiceIterator(ModelChoiceIterator):
+    """Choices from the field's in-process dimension table instead of its queryset"""
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for obj in self.field.dimension.all():
+            yield self.choice(obj)
+
+    def __len__(self):
+        return len(self.field.dimension.all()) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.field.dimension.all())
+
+
+class DimensionChoiceField(forms.ModelChoiceField):
+    """A ModelChoiceField that renders and validates against a cached dimension table"""
+    iterator = DimensionChoiceIterator
+
+    def __init__(self, dimension, **kwargs):
+        self.dimension = dimension
+        super().__init__(queryset=dimension.model.objects.all(), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        if isinstance(value, self.dimension.model):
+            value = value.pk
+        obj = self.dimension.get(value)
+        if obj is None:
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return obj
 
 
 class VinylSearchForm(forms.Form):
@@ -12,22 +54,22 @@ class VinylSearchForm(forms.Form):
         })
     )
     
-    genre = forms.ModelChoiceField(
-        queryset=Genre.objects.all(),
+    genre = DimensionChoiceField(
+        genres,
         required=False,
         empty_label="All Genres",
         widget=forms.Select(attrs={'class': 'form-select'})
     )
     
-    artist = forms.ModelChoiceField(
-        queryset=Artist.objects.all(),
+    artist = DimensionChoiceField(
+        artists,
         required=False,
         empty_label="All Artists",
         widget=forms.Select(attrs={'class': 'form-select'})
     )
     
-    label = forms.ModelChoiceField(
-        queryset=Label.objects.all(),
+    label = DimensionChoiceField(
+        labels,
         required=False,
         empty_label="All Labels",
         widget=forms.Select(attrs={'class': 'form-select'})
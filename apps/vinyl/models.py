@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.expressions import CombinedExpression
 from django.urls import reverse
 from django.contrib.auth.models import User
+from .signals import stock_restored
 
 
 class Genre(models.Model):
@@ -53,6 +56,46 @@ class Artist(models.Model):
         return self.name
 
 
+def _stock_change(value):
+    """'+' or '-' when value adds to or takes from F('stock_quantity'), else None"""
+    if (
+        isinstance(value, CombinedExpression)
+        and value.connector in ('+', '-')
+        and isinstance(value.lhs, F)
+        and value.lhs.name == 'stock_quantity'
+    ):
+        return value.connector
+    return None
+
+
+class VinylRecordQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        """Update as usual, sending stock_restored for sold-out records the update restocks"""
+        value = kwargs.get('stock_quantity')
+        change = _stock_change(value)
+        # Checkout's decrements (and anything setting stock to zero) can't restock, so skip the lookups
+        if 'stock_quantity' not in kwargs or change == '-' or value == 0:
+            return super().update(**kwargs)
+
+        with transaction.atomic(using=self.db):
+            sold_out = list(self.filter(stock_quantity=0).values_list('id', flat=True))
+            rows = super().update(**kwargs)
+            if sold_out and change == '+':
+                # Quantities added back (cancellations) are positive
+                restocked = sold_out
+            elif sold_out:
+                restocked = list(
+                    VinylRecord.objects.using(self.db)
+                    .filter(id__in=sold_out, stock_quantity__gt=0)
+                    .values_list('id', flat=True)
+                )
+            else:
+                restocked = []
+            if restocked:
+                stock_restored.send(sender=VinylRecord, record_ids=restocked)
+        return rows
+
+
 class VinylRecord(models.Model):
     CONDITION_CHOICES = [
         ('new', 'New'),
@@ -106,6 +149,8 @@ class VinylRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     featured = models.BooleanField(default=False)
+
+    objects = VinylRecordQuerySet.as_manager()
     
     class Meta:
         ordering = ['-created_at']
@@ -145,3 +190,15 @@ class VinylRecord(models.Model):
                 counter += 1
             self.slug = slug
         super().save(*args, **kwargs)
+
+        # Covers the change form and list_editable; queryset updates are handled by VinylRecordQuerySet
+        if getattr(self, '_loaded_stock_quantity', None) == 0 and self.stock_quantity > 0:
+            stock_restored.send(sender=VinylRecord, record_ids=[self.id])
+        self._loaded_stock_quantity = self.stock_quantity
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stock as loaded so save() can tell a sold-out record was restocked
+        instance._loaded_stock_quantity = dict(zip(field_names, values)).get('stock_quantity')
+        return instance
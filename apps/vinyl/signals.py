@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent with record_ids when records go from no stock to some stock, by a save
+# or a queryset update, inside the transaction that made the change
+stock_restored = Signal()
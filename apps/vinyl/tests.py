@@ -1,3 +1,92 @@
 from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .dimensions import DIMENSIONS, genres
+from .forms import VinylSearchForm
+from .models import VinylRecord, Artist, Genre, Label
 
-# Create your tests here.
+
+class CatalogCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.artist = Artist.objects.create(name='Test Band', artist_type='band')
+        self.genre = Genre.objects.create(name='Test Genre')
+        label = Label.objects.create(name='Test Label')
+        for i in range(14):
+            VinylRecord.objects.create(
+                title=f'Record {i}', artist=self.artist, genre=self.genre, label=label,
+                price=2599, stock_quantity=10, release_year=2023,
+            )
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_category_first_page_is_cached_until_the_catalogue_changes(self):
+        url = reverse('vinyl:band')
+        cold, response = self.get(url)
+        self.assertEqual(response.context['page_obj'].paginator.count, 14)
+        warm, response = self.get(url)
+        self.assertEqual(warm, 0)
+        self.assertEqual(len(response.context['page_obj']), 12)
+
+        # Later pages are read live but reuse the cached count
+        queries, response = self.get(url, page=2)
+        self.assertEqual(queries, 1)
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+        VinylRecord.objects.filter(title='Record 0').get().delete()
+        queries, response = self.get(url)
+        self.assertEqual(queries, cold)
+        self.assertEqual(response.context['page_obj'].paginator.count, 13)
+
+    def test_list_counts_are_cached_per_filter(self):
+        url = reverse('vinyl:list')
+        self.get(url, genre_id=self.genre.id)
+        warm, response = self.get(url, genre_id=self.genre.id)
+        self.assertEqual(response.context['page_obj'].paginator.count, 14)
+        self.assertEqual(response.context['genres'][0].record_count, 14)
+
+        # Another filter combination has its own count
+        queries, response = self.get(url, condition='new')
+        self.assertEqual(queries, warm + 1)
+        self.assertEqual(response.context['page_obj'].paginator.count, 14)
+
+
+class DimensionCacheTestCase(TestCase):
+    def setUp(self):
+        for dimension in DIMENSIONS.values():
+            dimension.invalidate()
+        self.rock = Genre.objects.create(name='Rock')
+        self.jazz = Genre.objects.create(name='Jazz')
+
+    def test_tables_are_read_once_until_written(self):
+        with self.assertNumQueries(1):
+            self.assertEqual([genre.name for genre in genres.all()], ['Jazz', 'Rock'])
+        with self.assertNumQueries(0):
+            self.assertEqual(genres.name(self.rock.id), 'Rock')
+            self.assertEqual(genres.id_for(' jazz '), self.jazz.id)
+            self.assertEqual(genres.valid_ids([str(self.rock.id), 'x', 0, self.rock.id]), [self.rock.id])
+            self.assertIsNone(genres.get('nope'))
+
+        Genre.objects.create(name='Blues')
+        self.assertEqual(genres.count(), 3)
+        self.rock.delete()
+        self.assertEqual([genre.name for genre in genres.all()], ['Blues', 'Jazz'])
+
+    def test_callers_get_copies(self):
+        genres.all()[0].record_count = 5
+        self.assertFalse(hasattr(genres.all()[0], 'record_count'))
+
+    def test_search_form_uses_the_cache(self):
+        genres.all()
+        with self.assertNumQueries(0):
+            form = VinylSearchForm({'genre': self.rock.id})
+            self.assertTrue(form.is_valid())
+            self.assertIn(f'value="{self.jazz.id}"', str(form['genre']))
+        self.assertEqual(form.cleaned_data['genre'], self.rock)
+        self.assertFalse(VinylSearchForm({'genre': 0}).is_valid())
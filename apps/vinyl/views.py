@@ -2,6 +2,9 @@ from django.shortcuts import render, get_object_or_404
 from django.core.paginator import Paginator
 from django.db.models import Q, Avg, Count
 from .models import VinylRecord, Artist, Genre, Label
+from .catalog import category_page, genre_counts, listing_count
+from . import dimensions
+from apps.recommendations.recommender import also_bought
 
 
 def vinyl_list(request):
@@ -51,14 +54,21 @@ def vinyl_list(request):
         review_count=Count('reviews', distinct=True)
     )
     
-    # Pagination
+    # Pagination; the count is cached per filter combination
     paginator = Paginator(vinyl_records, 12)  # 12 records per page
+    paginator.count = listing_count(vinyl_records, {
+        'genre_id': genre_id, 'genre': genre_name, 'artist_id': artist_id,
+        'artist': artist_name, 'condition': condition, 'q': search_query,
+    })
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
     # Get all genres and artists for filter dropdown
-    genres = Genre.objects.all()
-    artists = Artist.objects.all().order_by('name')
+    genres = dimensions.genres.all()
+    counts = genre_counts()
+    for genre in genres:
+        genre.record_count = counts.get(genre.id, 0)
+    artists = dimensions.artists.all()
     
     context = {
         'page_obj': page_obj,
@@ -100,6 +110,7 @@ def vinyl_detail(request, slug):
     context = {
         'vinyl': vinyl,
         'related_vinyl': related_vinyl,
+        'also_bought': also_bought(vinyl)[:4],
         'reviews': reviews,
     }
     return render(request, 'vinyl/vinyl_detail.html', context)
@@ -151,7 +162,7 @@ def vinyl_search(request):
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     
-    genres = Genre.objects.all()
+    genres = dimensions.genres.all()
     
     context = {
         'page_obj': page_obj,
@@ -164,17 +175,7 @@ def vinyl_search(request):
 # Category views (matching your existing templates)
 def male_artists(request):
     """Show vinyl records by male artists"""
-    vinyl_records = VinylRecord.objects.filter(
-        is_available=True,
-        artist__artist_type='male'
-    ).select_related('artist', 'genre', 'label').annotate(
-        average_rating=Avg('reviews__rating'),
-        review_count=Count('reviews', distinct=True)
-    )
-    
-    paginator = Paginator(vinyl_records, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = category_page(request, 'male')
     
     context = {
         'page_obj': page_obj,
@@ -185,17 +186,7 @@ def male_artists(request):
 
 def female_artists(request):
     """Show vinyl records by female artists"""
-    vinyl_records = VinylRecord.objects.filter(
-        is_available=True,
-        artist__artist_type='female'
-    ).select_related('artist', 'genre', 'label').annotate(
-        average_rating=Avg('reviews__rating'),
-        review_count=Count('reviews', distinct=True)
-    )
-    
-    paginator = Paginator(vinyl_records, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = category_page(request, 'female')
     
     context = {
         'page_obj': page_obj,
@@ -206,17 +197,7 @@ def female_artists(request):
 
 def band_artists(request):
     """Show vinyl records by bands"""
-    vinyl_records = VinylRecord.objects.filter(
-        is_available=True,
-        artist__artist_type='band'
-    ).select_related('artist', 'genre', 'label').annotate(
-        average_rating=Avg('reviews__rating'),
-        review_count=Count('reviews', distinct=True)
-    )
-    
-    paginator = Paginator(vinyl_records, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = category_page(request, 'band')
     
     context = {
         'page_obj': page_obj,
@@ -227,17 +208,7 @@ def band_artists(request):
 
 def assortments(request):
     """Show assorted vinyl records"""
-    vinyl_records = VinylRecord.objects.filter(
-        is_available=True,
-        artist__artist_type='assortment'
-    ).select_related('artist', 'genre', 'label').annotate(
-        average_rating=Avg('reviews__rating'),
-        review_count=Count('reviews', distinct=True)
-    )
-    
-    paginator = Paginator(vinyl_records, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = category_page(request, 'assortment')
     
     context = {
         'page_obj': page_obj,
@@ -248,17 +219,7 @@ def assortments(request):
 
 def others(request):
     """Show other vinyl records"""
-    vinyl_records = VinylRecord.objects.filter(
-        is_available=True,
-        artist__artist_type='other'
-    ).select_related('artist', 'genre', 'label').annotate(
-        average_rating=Avg('reviews__rating'),
-        review_count=Count('reviews', distinct=True)
-    )
-    
-    paginator = Paginator(vinyl_records, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = category_page(request, 'other')
     
     context = {
         'page_obj': page_obj,
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class WishlistConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.wishlist'
+
+    def ready(self):
+        # Keep cached wishlist ids in step with wishlist changes
+        from . import signals  # noqa: F401
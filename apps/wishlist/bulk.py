@@ -0,0 +1,96 @@
+"""
+Bulk wishlist operations.
+
+``move_items_to_cart`` and ``remove_items`` act on any number of records in
+one transaction with a fixed number of queries: the wishlist items are read
+in one query, cart lines are created and updated with one bulk statement
+each, the items are deleted together and ``wishlist_batch`` bumps the
+wishlist version once at the end. Should a concurrent add-to-cart create
+one of the lines first, the cart is re-read and the move planned again.
+"""
+from collections import namedtuple
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from apps.cart.models import CartItem
+from .models import WishlistItem
+from .services import wishlist_batch
+
+# Larger selections are cut to this many records
+MAX_BULK_IDS = 500
+
+MoveResult = namedtuple('MoveResult', ['moved', 'skipped'])
+
+
+def move_items_to_cart(wishlist, cart, vinyl_ids):
+    """
+    Add one of each of the wishlisted records vinyl_ids to cart and take them
+    off the wishlist. Records that are out of stock, or whose cart line is
+    already at the stock level, stay on the wishlist.
+
+    Returns MoveResult(moved, skipped): the moved records, and
+    {vinyl id: reason} for every requested id that was not moved.
+    """
+    vinyl_ids = list(vinyl_ids)[:MAX_BULK_IDS]
+    skipped = {}
+    with transaction.atomic(), wishlist_batch(wishlist):
+        items = list(
+            WishlistItem.objects.filter(wishlist=wishlist, vinyl_record_id__in=vinyl_ids)
+            .select_related('vinyl_record')
+        )
+        found = {item.vinyl_record_id for item in items}
+        for vinyl_id in vinyl_ids:
+            if vinyl_id not in found:
+                skipped[vinyl_id] = 'Not in your wishlist'
+
+        # A concurrent add-to-cart can insert one of the new lines first; the
+        # second pass finds it among the (now locked) existing lines
+        for attempt in range(2):
+            cart_items = {
+                cart_item.vinyl_record_id: cart_item
+                for cart_item in CartItem.objects.select_for_update().filter(cart=cart, vinyl_record_id__in=found)
+            }
+            now = timezone.now()
+            created, updated, moved, moved_items, out_of_stock = [], [], [], [], {}
+            for item in items:
+                record = item.vinyl_record
+                cart_item = cart_items.get(record.id)
+                if record.stock_quantity <= 0 or not record.is_available:
+                    out_of_stock[record.id] = f'{record.title} is currently out of stock'
+                elif cart_item is not None and cart_item.quantity + 1 > record.stock_quantity:
+                    out_of_stock[record.id] = f'Cannot add more {record.title}. Only {record.stock_quantity} available in stock'
+                else:
+                    if cart_item is None:
+                        created.append(CartItem(cart=cart, vinyl_record=record, quantity=1, price=record.price))
+                    else:
+                        cart_item.quantity += 1
+                        cart_item.updated_at = now
+                        updated.append(cart_item)
+                    moved.append(record)
+                    moved_items.append(item.id)
+            if not created:
+                break
+            try:
+                with transaction.atomic():
+                    CartItem.objects.bulk_create(created)
+                break
+            except IntegrityError:
+                if attempt:
+                    raise
+        skipped.update(out_of_stock)
+
+        if updated:
+            CartItem.objects.bulk_update(updated, ['quantity', 'updated_at'])
+        if moved_items:
+            WishlistItem.objects.filter(id__in=moved_items).delete()
+    return MoveResult(moved, skipped)
+
+
+def remove_items(wishlist, vinyl_ids):
+    """Take the records vinyl_ids off wishlist; returns the ids actually removed"""
+    vinyl_ids = list(vinyl_ids)[:MAX_BULK_IDS]
+    with transaction.atomic(), wishlist_batch(wishlist):
+        items = WishlistItem.objects.filter(wishlist=wishlist, vinyl_record_id__in=vinyl_ids)
+        removed = list(items.values_list('vinyl_record_id', flat=True))
+        if removed:
+            items.delete()
+    return removed
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlist', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wishlist',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlist', '0002_wishlist_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wishlistitem',
+            name='notified_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
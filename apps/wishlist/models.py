@@ -5,6 +5,7 @@ from apps.vinyl.models import VinylRecord
 
 class Wishlist(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='wishlist')
+    version = models.PositiveIntegerField(default=0)  # Bumped on every item change; the ETag of the ids endpoint
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -22,6 +23,7 @@ class WishlistItem(models.Model):
     wishlist = models.ForeignKey(Wishlist, on_delete=models.CASCADE, related_name='items')
     vinyl_record = models.ForeignKey(VinylRecord, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
+    notified_at = models.DateTimeField(null=True, blank=True)  # Last back-in-stock email about this record
 
     class Meta:
         unique_together = ('wishlist', 'vinyl_record')
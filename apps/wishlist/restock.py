@@ -0,0 +1,88 @@
+"""
+Back-in-stock emails.
+
+When a sold-out record is restocked (``apps.vinyl.signals.stock_restored``),
+``signals.py`` schedules the ``notify_back_in_stock`` task instead of doing
+any work in the admin request. The task:
+
+* re-checks which of the records are still in stock,
+* finds everyone who wishlisted them and allows email notifications,
+* sends each person one email covering all their restocked records,
+* skips items already notified within WISHLIST_RESTOCK_COOLDOWN,
+* queues the emails in the outbox in batches of WISHLIST_RESTOCK_BATCH_SIZE,
+  each batch due WISHLIST_RESTOCK_BATCH_INTERVAL seconds after the previous,
+  so a popular restock trickles out instead of flooding the SMTP server.
+
+The outbox worker then sends each due batch over one pooled SMTP connection.
+"""
+from datetime import timedelta
+from itertools import groupby
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from apps.notifications.outbox import enqueue_emails, render_email
+from apps.vinyl.models import VinylRecord
+from .models import WishlistItem
+
+
+def _email(user, records, site):
+    body, html_body = render_email('emails/back_in_stock', {'user': user, 'records': records, 'site': site})
+    if len(records) == 1:
+        subject = f'{records[0].title} is back in stock'
+    else:
+        subject = f'{len(records)} records on your wishlist are back in stock'
+    return {'subject': subject, 'body': body, 'html_body': html_body, 'to': [user.email]}
+
+
+def queue_back_in_stock_emails(record_ids):
+    """Queue back-in-stock emails for record_ids; returns the number of emails queued"""
+    batch_size = getattr(settings, 'WISHLIST_RESTOCK_BATCH_SIZE', 200)
+    interval = getattr(settings, 'WISHLIST_RESTOCK_BATCH_INTERVAL', 60)
+    now = timezone.now()
+    cooldown = now - timedelta(seconds=getattr(settings, 'WISHLIST_RESTOCK_COOLDOWN', 7 * 24 * 60 * 60))
+
+    in_stock = list(
+        VinylRecord.objects.filter(id__in=record_ids, stock_quantity__gt=0, is_available=True)
+        .values_list('id', flat=True)
+    )
+    if not in_stock:
+        return 0
+
+    items = (
+        WishlistItem.objects.filter(
+            vinyl_record_id__in=in_stock,
+            wishlist__user__is_active=True,
+            wishlist__user__profile__email_notifications=True,
+        )
+        .exclude(wishlist__user__email='')
+        .filter(Q(notified_at__isnull=True) | Q(notified_at__lt=cooldown))
+        .select_related('wishlist__user', 'vinyl_record__artist')
+        .order_by('wishlist__user_id', 'vinyl_record_id')
+    )
+
+    site = Site.objects.get_current()
+    sent = 0
+    batch, item_ids = [], []
+
+    def flush():
+        nonlocal sent
+        with transaction.atomic():
+            enqueue_emails([{**message, 'send_at': now + timedelta(seconds=interval * (sent // batch_size))}
+                            for message in batch])
+            WishlistItem.objects.filter(id__in=item_ids).update(notified_at=now)
+        sent += len(batch)
+        batch.clear()
+        item_ids.clear()
+
+    # One email per user, however many of their wishlisted records came back
+    for _, user_items in groupby(items.iterator(chunk_size=2000), key=lambda item: item.wishlist.user_id):
+        user_items = list(user_items)
+        batch.append(_email(user_items[0].wishlist.user, [item.vinyl_record for item in user_items], site))
+        item_ids.extend(item.id for item in user_items)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return sent
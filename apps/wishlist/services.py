@@ -0,0 +1,129 @@
+"""
+Wishlist membership lookups.
+
+``get_wishlist_state`` returns the user's wishlist version and the ids of
+every record on it. The state is cached per user for WISHLIST_CACHE_TIMEOUT
+seconds and kept on the request, so the template tags that decorate each
+record card cost at most one query per page, and none while the cache is
+warm. Signal handlers in ``signals.py`` bump ``Wishlist.version`` and drop
+the cached state whenever a wishlist item is added or removed; inside
+``wishlist_batch`` they leave that to one bump at the end of the batch.
+The cache is the shared one from settings.CACHES, so a drop made by the
+process that handled the change is seen by every other process.
+
+``encode_wishlist_ids`` packs the ids for the ``wishlist:ids`` endpoint
+that pages use to decorate cached HTML client-side.
+"""
+from collections import namedtuple
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from .models import Wishlist
+import base64
+
+WishlistState = namedtuple('WishlistState', ['version', 'ids'])
+
+EMPTY_STATE = WishlistState(0, frozenset())
+
+# Lists longer than this are sent as a bitmap when that is smaller
+BITMAP_MIN_IDS = 256
+
+# {wishlist id: changed so far} for the wishlist_batch blocks being run
+_batches = ContextVar('wishlist_batches', default=None)
+
+
+def wishlist_cache_key(user_id):
+    return f'wishlist:state:{user_id}'
+
+
+def invalidate_wishlist_state(user_id):
+    """Forget the cached state now and again once the current transaction commits"""
+    key = wishlist_cache_key(user_id)
+    cache.delete(key)
+    # A concurrent request could re-cache the old state before this transaction commits
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def bump_wishlist_version(wishlist_id):
+    Wishlist.objects.filter(id=wishlist_id).update(version=F('version') + 1)
+
+
+@contextmanager
+def wishlist_batch(wishlist):
+    """
+    Change many of wishlist's items with one version bump and one cache
+    invalidation, made when the block ends if any item changed, instead of
+    one per item from the signal handlers.
+    """
+    batches = dict(_batches.get() or {})
+    batches[wishlist.id] = False
+    token = _batches.set(batches)
+    try:
+        yield
+    finally:
+        _batches.reset(token)
+    if batches[wishlist.id]:
+        bump_wishlist_version(wishlist.id)
+        invalidate_wishlist_state(wishlist.user_id)
+
+
+def note_batched_change(wishlist_id):
+    """True if wishlist_id is inside a wishlist_batch, which then takes care of the change"""
+    batches = _batches.get()
+    if not batches or wishlist_id not in batches:
+        return False
+    batches[wishlist_id] = True
+    return True
+
+
+def get_wishlist_state(user, request=None):
+    """WishlistState(version, frozenset of vinyl record ids) for user; empty for anonymous users"""
+    if not user.is_authenticated:
+        return EMPTY_STATE
+    if request is not None and getattr(request, '_wishlist_state', None) is not None:
+        return request._wishlist_state
+
+    key = wishlist_cache_key(user.id)
+    state = cache.get(key)
+    if state is None:
+        # One query: the version plus every item id (None when the wishlist is empty)
+        rows = list(Wishlist.objects.filter(user=user).values_list('version', 'items__vinyl_record_id'))
+        if rows:
+            state = WishlistState(rows[0][0], frozenset(vinyl_id for _, vinyl_id in rows if vinyl_id is not None))
+        else:
+            state = EMPTY_STATE
+        cache.set(key, state, getattr(settings, 'WISHLIST_CACHE_TIMEOUT', 3600))
+
+    if request is not None:
+        request._wishlist_state = state
+    return state
+
+
+def get_wishlist_ids(user, request=None):
+    """Frozenset of vinyl record ids on user's wishlist"""
+    return get_wishlist_state(user, request).ids
+
+
+def encode_wishlist_ids(ids):
+    """
+    Compact JSON-ready form of a set of record ids.
+
+    Usually ``{'encoding': 'ids', 'ids': [sorted ids]}``. Long lists are sent
+    as ``{'encoding': 'bitmap', 'base': min_id, 'bitmap': base64}`` instead
+    when that is smaller: bit i (least significant bit first in each byte)
+    set means record ``base + i`` is on the wishlist.
+    """
+    ids = sorted(ids)
+    if len(ids) >= BITMAP_MIN_IDS:
+        base = ids[0]
+        bitmap = bytearray((ids[-1] - base) // 8 + 1)
+        for vinyl_id in ids:
+            offset = vinyl_id - base
+            bitmap[offset // 8] |= 1 << (offset % 8)
+        encoded = base64.b64encode(bytes(bitmap)).decode('ascii')
+        if len(encoded) < len(','.join(map(str, ids))):
+            return {'encoding': 'bitmap', 'base': base, 'bitmap': encoded}
+    return {'encoding': 'ids', 'ids': ids}
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from apps.vinyl.signals import stock_restored
+from .models import Wishlist, WishlistItem
+from .services import bump_wishlist_version, invalidate_wishlist_state, note_batched_change
+from .tasks import notify_back_in_stock
+
+
+@receiver(post_save, sender=WishlistItem)
+@receiver(post_delete, sender=WishlistItem)
+def wishlist_item_changed(sender, instance, **kwargs):
+    if note_batched_change(instance.wishlist_id):
+        return
+    try:
+        user_id = instance.wishlist.user_id
+    except Wishlist.DoesNotExist:
+        return  # Deleted along with its wishlist
+    bump_wishlist_version(instance.wishlist_id)
+    invalidate_wishlist_state(user_id)
+
+
+@receiver(stock_restored)
+def queue_back_in_stock(sender, record_ids, **kwargs):
+    # Delayed so a quick correction back to zero is seen before anyone is emailed
+    notify_back_in_stock.schedule(args=[record_ids], countdown=getattr(settings, 'WISHLIST_RESTOCK_DELAY', 300))
@@ -0,0 +1,8 @@
+from apps.tasks.queue import task
+from .restock import queue_back_in_stock_emails
+
+
+@task(max_attempts=3)
+def notify_back_in_stock(record_ids):
+    """Email everyone who wishlisted the restocked records"""
+    queue_back_in_stock_emails(record_ids)
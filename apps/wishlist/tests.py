@@ -1,3 +1,293 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from apps.notifications.models import OutboundEmail
+from apps.orders.services import release_stock
+from apps.tasks.models import Task
+from apps.vinyl.models import VinylRecord, Artist, Genre, Label
+from .models import Wishlist, WishlistItem
+from .restock import queue_back_in_stock_emails
+from .services import get_wishlist_ids, encode_wishlist_ids, wishlist_cache_key
+from .tasks import notify_back_in_stock
+from unittest import mock
+import base64
+import json
 
-# Create your tests here.
+
+class WishlistIdsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='collector', email='collector@example.com', password='testpass123')
+        artist = Artist.objects.create(name='Test Artist', artist_type='band')
+        genre = Genre.objects.create(name='Test Genre')
+        label = Label.objects.create(name='Test Label')
+        self.records = [
+            VinylRecord.objects.create(
+                title=f'Record {i}', artist=artist, genre=genre, label=label,
+                price=2599, stock_quantity=10, release_year=2023,
+            )
+            for i in range(12)
+        ]
+        self.wishlist = Wishlist.objects.create(user=self.user)
+        self.client.login(username='collector', password='testpass123')
+
+    def list_page(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('vinyl:list'))
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in ctx.captured_queries], response.content.decode()
+
+    def test_list_page_leaves_hearts_to_the_ids_payload(self):
+        """Test the list page renders the same unmarked buttons without reading the wishlist"""
+        _, empty = self.list_page()
+        for vinyl in self.records[:6]:
+            WishlistItem.objects.create(wishlist=self.wishlist, vinyl_record=vinyl)
+        cache.delete(wishlist_cache_key(self.user.id))
+
+        queries, page = self.list_page()
+        self.assertFalse(any('wishlist' in sql for sql in queries))
+        self.assertEqual(page.count('fas fa-heart'), empty.count('fas fa-heart'))
+        self.assertIn(f'data-vinyl-id="{self.records[0].id}"', page)
+
+    def test_cached_ids_follow_changes(self):
+        """Test adding and removing items drops the cached ids"""
+        self.assertEqual(get_wishlist_ids(self.user), frozenset())
+
+        self.client.post(reverse('wishlist:toggle', args=[self.records[0].id]), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(get_wishlist_ids(self.user), {self.records[0].id})
+
+        with CaptureQueriesContext(connection) as ctx:
+            get_wishlist_ids(self.user)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        self.client.post(reverse('wishlist:clear'), HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(get_wishlist_ids(self.user), frozenset())
+
+
+class WishlistIdsEndpointTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='collector', email='collector@example.com', password='testpass123')
+        artist = Artist.objects.create(name='Test Artist', artist_type='band')
+        label = Label.objects.create(name='Test Label')
+        self.records = [
+            VinylRecord.objects.create(
+                title=f'Record {i}', artist=artist, label=label, price=2599, stock_quantity=10, release_year=2023,
+            )
+            for i in range(3)
+        ]
+        self.client.login(username='collector', password='testpass123')
+        self.url = reverse('wishlist:ids')
+
+    def test_ids_are_sorted_and_revalidated_by_version(self):
+        """Test the endpoint returns sorted ids, answers 304 until the wishlist changes"""
+        response = self.client.get(self.url)
+        self.assertEqual(response.json(), {'version': 0, 'encoding': 'ids', 'ids': []})
+        self.assertFalse(Wishlist.objects.exists())  # GETs don't create a wishlist
+
+        wishlist = Wishlist.objects.create(user=self.user)
+        for vinyl in reversed(self.records[:2]):
+            WishlistItem.objects.create(wishlist=wishlist, vinyl_record=vinyl)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['ids'], [self.records[0].id, self.records[1].id])
+        self.assertEqual(response.json()['version'], 2)
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(any('wishlist' in query['sql'] for query in ctx.captured_queries))
+
+        WishlistItem.objects.filter(vinyl_record=self.records[0]).delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['ids'], [self.records[1].id])
+
+    def test_long_lists_use_a_bitmap(self):
+        """Test dense id sets are sent as a bitmap that decodes to the same ids"""
+        ids = set(range(1000, 1600, 2))
+        encoded = encode_wishlist_ids(ids)
+        self.assertEqual(encoded['encoding'], 'bitmap')
+
+        bitmap = base64.b64decode(encoded['bitmap'])
+        decoded = {encoded['base'] + i for i in range(len(bitmap) * 8) if bitmap[i // 8] >> (i % 8) & 1}
+        self.assertEqual(decoded, ids)
+
+        self.assertEqual(encode_wishlist_ids({5, 3}), {'encoding': 'ids', 'ids': [3, 5]})
+
+
+class BackInStockTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        artist = Artist.objects.create(name='Test Artist', artist_type='band')
+        label = Label.objects.create(name='Test Label')
+        self.records = [
+            VinylRecord.objects.create(
+                title=f'Record {i}', artist=artist, label=label, price=2599, stock_quantity=0, release_year=2023,
+            )
+            for i in range(2)
+        ]
+
+    def wishlist(self, username, *records, notifications=True):
+        user = User.objects.create_user(username=username, email=f'{username}@example.com')
+        user.profile.email_notifications = notifications
+        user.profile.save()
+        wishlist = Wishlist.objects.create(user=user)
+        for vinyl in records:
+            WishlistItem.objects.create(wishlist=wishlist, vinyl_record=vinyl)
+        return user
+
+    def queued(self):
+        return list(Task.objects.filter(name=notify_back_in_stock.name).order_by('id').values_list('args', flat=True))
+
+    def test_restocks_are_detected_on_save_and_bulk_update(self):
+        """Test saves and queryset updates that restock sold-out records schedule one job"""
+        record = VinylRecord.objects.get(id=self.records[0].id)
+        record.stock_quantity = 3
+        record.save()
+        self.assertEqual(self.queued(), [[[record.id]]])
+
+        record.stock_quantity = 5
+        record.save()  # Already in stock
+        VinylRecord.objects.filter(id=record.id).update(stock_quantity=0)
+        self.assertEqual(len(self.queued()), 1)
+
+        VinylRecord.objects.all().update(stock_quantity=2)
+        self.assertEqual(sorted(self.queued()[-1][0]), sorted(vinyl.id for vinyl in self.records))
+
+    def test_only_updates_that_can_restock_are_checked(self):
+        """Test checkout's decrements run as one UPDATE while cancellations still detect restocks"""
+        record = self.records[0]
+        VinylRecord.objects.filter(id=record.id).update(stock_quantity=1)
+        queued = len(self.queued())
+
+        with self.assertNumQueries(1):
+            rows = VinylRecord.objects.filter(id=record.id).update(stock_quantity=F('stock_quantity') - 1)
+        self.assertEqual(rows, 1)
+
+        # Sold-out lookup and the UPDATE, then the job is queued
+        release_stock([(record.id, 2)])
+        self.assertEqual(self.queued()[queued:], [[[record.id]]])
+
+    def test_fan_out_sends_one_email_per_user_once(self):
+        """Test each opted-in user gets one email for all their restocked records, and only once"""
+        fan = self.wishlist('fan', *self.records)
+        self.wishlist('quiet', self.records[0], notifications=False)
+        VinylRecord.objects.all().update(stock_quantity=4)
+
+        self.assertEqual(queue_back_in_stock_emails([vinyl.id for vinyl in self.records]), 1)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.to, [fan.email])
+        self.assertIn('2 records on your wishlist', email.subject)
+        self.assertIn('Record 1', email.body)
+
+        self.assertEqual(queue_back_in_stock_emails([self.records[0].id]), 0)  # Within the cooldown
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+
+    @override_settings(WISHLIST_RESTOCK_BATCH_SIZE=2, WISHLIST_RESTOCK_BATCH_INTERVAL=60)
+    def test_fan_out_is_throttled_in_batches(self):
+        """Test later batches are scheduled further out, with a constant number of queries per batch"""
+        for i in range(5):
+            self.wishlist(f'fan{i}', self.records[0])
+        VinylRecord.objects.filter(id=self.records[0].id).update(stock_quantity=1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(queue_back_in_stock_emails([self.records[0].id]), 5)
+        self.assertLess(len(ctx.captured_queries), 20)
+
+        send_times = sorted(OutboundEmail.objects.values_list('next_attempt_at', flat=True))
+        self.assertEqual(send_times[0], send_times[1])
+        self.assertEqual((send_times[2] - send_times[0]).total_seconds(), 60)
+        self.assertEqual((send_times[4] - send_times[0]).total_seconds(), 120)
+
+
+class BulkWishlistTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='collector', email='collector@example.com', password='testpass123')
+        artist = Artist.objects.create(name='Test Artist', artist_type='band')
+        genre = Genre.objects.create(name='Test Genre')
+        label = Label.objects.create(name='Test Label')
+        self.records = [
+            VinylRecord.objects.create(
+                title=f'Record {i}', artist=artist, genre=genre, label=label,
+                price=2599 + i, stock_quantity=5, release_year=2023,
+            )
+            for i in range(10)
+        ]
+        self.wishlist = Wishlist.objects.create(user=self.user)
+        WishlistItem.objects.bulk_create([WishlistItem(wishlist=self.wishlist, vinyl_record=r) for r in self.records])
+        self.client.login(username='collector', password='testpass123')
+
+    def post(self, name, vinyl_ids):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(
+                reverse(name), data=json.dumps({'vinyl_ids': vinyl_ids}), content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_query_count_does_not_grow_with_selection(self):
+        from apps.cart.models import Cart
+        Cart.objects.create(user=self.user)
+        _, few = self.post('wishlist:bulk_move_to_cart', [r.id for r in self.records[:2]])
+        _, many = self.post('wishlist:bulk_move_to_cart', [r.id for r in self.records[2:]])
+        self.assertEqual(few, many)
+
+        data, few = self.post('wishlist:bulk_remove', [r.id for r in self.records[:2]])
+        self.assertEqual(data['removed'], [])
+        WishlistItem.objects.bulk_create([WishlistItem(wishlist=self.wishlist, vinyl_record=r) for r in self.records])
+        _, few = self.post('wishlist:bulk_remove', [r.id for r in self.records[:2]])
+        _, many = self.post('wishlist:bulk_remove', [r.id for r in self.records[2:]])
+        self.assertEqual(few, many)
+        self.assertFalse(WishlistItem.objects.filter(wishlist=self.wishlist).exists())
+
+    def test_move_respects_stock_and_merges_cart_lines(self):
+        from apps.cart.models import Cart, CartItem
+        sold_out, at_limit, in_cart, fresh = self.records[:4]
+        VinylRecord.objects.filter(id=sold_out.id).update(stock_quantity=0)
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, vinyl_record=at_limit, quantity=5, price=at_limit.price)
+        CartItem.objects.create(cart=cart, vinyl_record=in_cart, quantity=2, price=in_cart.price)
+        version = Wishlist.objects.get(id=self.wishlist.id).version
+
+        data, _ = self.post('wishlist:bulk_move_to_cart', [sold_out.id, at_limit.id, in_cart.id, fresh.id, 999999])
+
+        self.assertEqual(sorted(data['moved']), sorted([in_cart.id, fresh.id]))
+        self.assertEqual(sorted(map(int, data['skipped'])), sorted([sold_out.id, at_limit.id, 999999]))
+        self.assertEqual(data['cart_count'], 5 + 3 + 1)
+        self.assertEqual(CartItem.objects.get(cart=cart, vinyl_record=in_cart).quantity, 3)
+        self.assertEqual(CartItem.objects.get(cart=cart, vinyl_record=fresh).price, fresh.price)
+        self.assertEqual(
+            set(get_wishlist_ids(self.user)),
+            {r.id for r in self.records} - {in_cart.id, fresh.id},
+        )
+        # One version bump for the whole batch
+        self.assertEqual(Wishlist.objects.get(id=self.wishlist.id).version, version + 1)
+
+    def test_move_merges_lines_added_concurrently(self):
+        from apps.cart.models import Cart, CartItem
+        record = self.records[0]
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, vinyl_record=record, quantity=2, price=record.price)
+        select_for_update = CartItem.objects.select_for_update
+        reads = []
+
+        def added_after_first_read(*args, **kwargs):
+            # The line was committed by another request just after our first read
+            reads.append(1)
+            return CartItem.objects.none() if len(reads) == 1 else select_for_update(*args, **kwargs)
+
+        with mock.patch.object(CartItem.objects, 'select_for_update', side_effect=added_after_first_read):
+            data, _ = self.post('wishlist:bulk_move_to_cart', [record.id, self.records[1].id])
+
+        self.assertEqual(len(reads), 2)
+        self.assertEqual(sorted(data['moved']), sorted([record.id, self.records[1].id]))
+        self.assertEqual(CartItem.objects.get(cart=cart, vinyl_record=record).quantity, 3)
+        self.assertEqual(CartItem.objects.get(cart=cart, vinyl_record=self.records[1]).quantity, 1)
@@ -11,8 +11,11 @@ urlpatterns = [
     path('toggle/<int:vinyl_id>/', views.toggle_wishlist, name='toggle'),
     path('move-to-cart/<int:vinyl_id>/', views.move_to_cart, name='move_to_cart'),
     path('clear/', views.clear_wishlist, name='clear'),
+    path('bulk/move-to-cart/', views.bulk_move_to_cart, name='bulk_move_to_cart'),
+    path('bulk/remove/', views.bulk_remove, name='bulk_remove'),
     
     # AJAX endpoints
     path('status/<int:vinyl_id>/', views.wishlist_status, name='status'),
     path('bulk-status/', views.bulk_wishlist_status, name='bulk_status'),
+    path('ids/', views.wishlist_ids, name='ids'),
 ]
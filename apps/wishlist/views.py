@@ -2,10 +2,13 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.http import require_http_methods, require_GET, condition
+from django.utils.cache import patch_cache_control
 from django.core.paginator import Paginator
-from django.db.models import Q
+from django.db.models import Q, Sum
 from .models import Wishlist, WishlistItem
+from .services import get_wishlist_ids, get_wishlist_state, encode_wishlist_ids, wishlist_batch
+from .bulk import move_items_to_cart, remove_items
 from apps.vinyl.models import VinylRecord
 import json
 
@@ -205,8 +208,8 @@ def move_to_cart(request, vinyl_id):
 def clear_wishlist(request):
     """Clear all items from wishlist"""
     wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    count = WishlistItem.objects.filter(wishlist=wishlist).count()
-    WishlistItem.objects.filter(wishlist=wishlist).delete()
+    with wishlist_batch(wishlist):
+        count, _ = WishlistItem.objects.filter(wishlist=wishlist).delete()
     
     if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or 'application/json' in request.headers.get('Content-Type', ''):
         return JsonResponse({
@@ -218,15 +221,78 @@ def clear_wishlist(request):
         return redirect('wishlist:view')
 
 
+def _posted_vinyl_ids(request):
+    """Record ids from a JSON body ({"vinyl_ids": [...]}) or repeated / comma separated vinyl_ids fields"""
+    if 'application/json' in request.headers.get('Content-Type', ''):
+        try:
+            values = json.loads(request.body).get('vinyl_ids', [])
+        except (ValueError, AttributeError):
+            return []
+        if not isinstance(values, list):
+            return []
+    else:
+        values = [value for field in request.POST.getlist('vinyl_ids') for value in field.split(',')]
+    vinyl_ids = []
+    for value in values:
+        value = str(value).strip()
+        if value.isdigit() and int(value) not in vinyl_ids:
+            vinyl_ids.append(int(value))
+    return vinyl_ids
+
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_move_to_cart(request):
+    """Move several wishlist items to the cart at once (AJAX endpoint)"""
+    vinyl_ids = _posted_vinyl_ids(request)
+    if not vinyl_ids:
+        return JsonResponse({'success': False, 'error': 'No valid vinyl IDs provided'}, status=400)
+
+    # Import here to avoid circular imports
+    from apps.cart.views import get_or_create_cart
+    from apps.cart.models import CartItem
+
+    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
+    cart = get_or_create_cart(request)
+    result = move_items_to_cart(wishlist, cart, vinyl_ids)
+    cart_count = CartItem.objects.filter(cart=cart).aggregate(total=Sum('quantity'))['total'] or 0
+
+    count = len(result.moved)
+    return JsonResponse({
+        'success': count > 0,
+        'message': f'{count} item{"s" if count != 1 else ""} moved to cart',
+        'moved': [record.id for record in result.moved],
+        'skipped': result.skipped,
+        'cart_count': cart_count,
+    })
+
+
+@login_required
+@require_http_methods(["POST"])
+def bulk_remove(request):
+    """Remove several items from the wishlist at once (AJAX endpoint)"""
+    vinyl_ids = _posted_vinyl_ids(request)
+    if not vinyl_ids:
+        return JsonResponse({'success': False, 'error': 'No valid vinyl IDs provided'}, status=400)
+
+    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
+    removed = remove_items(wishlist, vinyl_ids)
+
+    count = len(removed)
+    return JsonResponse({
+        'success': True,
+        'message': f'{count} item{"s" if count != 1 else ""} removed from wishlist',
+        'removed': removed,
+    })
+
+
 @login_required
 def wishlist_status(request, vinyl_id):
     """Check if vinyl is in user's wishlist (AJAX endpoint)"""
     vinyl_record = get_object_or_404(VinylRecord, id=vinyl_id)
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    in_wishlist = WishlistItem.objects.filter(wishlist=wishlist, vinyl_record=vinyl_record).exists()
     
     return JsonResponse({
-        'in_wishlist': in_wishlist
+        'in_wishlist': vinyl_record.id in get_wishlist_ids(request.user, request)
     })
 
 
@@ -239,14 +305,29 @@ def bulk_wishlist_status(request):
     if not vinyl_ids:
         return JsonResponse({'error': 'No valid vinyl IDs provided'}, status=400)
     
-    wishlist, created = Wishlist.objects.get_or_create(user=request.user)
-    wishlist_items = WishlistItem.objects.filter(
-        wishlist=wishlist, 
-        vinyl_record__id__in=vinyl_ids
-    ).values_list('vinyl_record__id', flat=True)
-    
+    wishlist_ids = get_wishlist_ids(request.user, request)
     status = {}
     for vinyl_id in vinyl_ids:
-        status[vinyl_id] = int(vinyl_id) in wishlist_items
+        status[vinyl_id] = int(vinyl_id) in wishlist_ids
     
     return JsonResponse({'status': status})
+
+
+def wishlist_etag(request):
+    state = get_wishlist_state(request.user, request)
+    return f'{request.user.id}-{state.version}'
+
+
+@login_required
+@require_GET
+@condition(etag_func=wishlist_etag)
+def wishlist_ids(request):
+    """
+    The user's whole wishlist as compact record ids, for decorating cached pages
+    client-side. Answers 304 Not Modified while the wishlist version is unchanged.
+    """
+    state = get_wishlist_state(request.user, request)
+    response = JsonResponse({'version': state.version, **encode_wishlist_ids(state.ids)})
+    # Browsers may keep it but must revalidate (cheaply, via the ETag) before reuse
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
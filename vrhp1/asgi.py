@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vrhp1.settings')
 
 application = get_asgi_application()
+
+# Each server worker imports this module and listens for cache invalidations
+# from the other processes (apps/core/invalidation.py)
+from apps.core.invalidation import start_listener  # noqa: E402
+
+start_listener()
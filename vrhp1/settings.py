@@ -14,6 +14,7 @@ from django.contrib.messages import constants as messages # Add messages framewo
 from pathlib import Path
 from dotenv import load_dotenv
 import os
+import sys
 
 load_dotenv()
 
@@ -65,6 +66,7 @@ INSTALLED_APPS = [
     'allauth.socialaccount.providers.microsoft',
     
     # Custom Apps
+    'apps.core',
     'apps.home',
     'apps.vinyl',
     'apps.accounts',
@@ -72,6 +74,10 @@ INSTALLED_APPS = [
     'apps.orders',
     'apps.wishlist',
     'apps.reviews',
+    'apps.notifications',
+    'apps.tasks',
+    'apps.analytics',
+    'apps.recommendations',
     'main',  # Keep for migration purposes, will remove later
 ]
 
@@ -127,6 +133,20 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Required: every web process and task worker must share one cache (pip install redis). Wishlist state and
+# its ETags, review statistics, home sections refreshed by the task worker, catalogue listings and their
+# single-flight locks are all written by one process and read by the others; a per-process LocMemCache
+# would leave each of them serving its own stale copy.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('REDIS_URL', 'redis://localhost:6379/1'),
+        'KEY_PREFIX': 'vrhp1',
+    }
+}
+
 # Original Python Django DATABASE Config
 # DATABASES = {
 #     'default': {
@@ -262,11 +282,77 @@ MESSAGE_TAGS = {
     messages.SUCCESS: 'success'
 }
 
+# Email
+# Transactional emails go through the outbox and are sent by: python manage.py send_outbox
+# For local testing run a debugging SMTP server: python -m aiosmtpd -n -l localhost:1025
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', '1025'))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', '') == 'True'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'Vinyl Record House <orders@vinylrecordhouse.hk>')
+
+OUTBOX_BATCH_SIZE = 100      # Emails sent per SMTP connection
+OUTBOX_MAX_ATTEMPTS = 5      # Give up (status 'failed') after this many tries
+OUTBOX_RETRY_BACKOFF = 60    # Seconds before the first retry, doubled for each further attempt
+
+# Background tasks
+# Run with: python manage.py run_worker [--concurrency N] [--processes]
+TASK_WORKER_CONCURRENCY = int(os.getenv('TASK_WORKER_CONCURRENCY', '4'))
+TASK_MAX_ATTEMPTS = 3        # Default attempts before a task is dead-lettered
+TASK_RETRY_BACKOFF = 30      # Seconds before the first retry, doubled for each further attempt
+TASK_HEARTBEAT_INTERVAL = 30  # Seconds between a worker's heartbeats for the tasks it is running
+TASK_STALE_AFTER = 600       # Running tasks without a heartbeat for this long are assumed lost and requeued
+
+# Admin changelists over large tables (see apps/core/admin.py)
+ESTIMATED_COUNT_THRESHOLD = 100000   # Above this many rows, show PostgreSQL's estimate instead of COUNT(*)
+ADMIN_FILTER_CACHE_TIMEOUT = 600     # Seconds list_filter options are cached
+
+# Wishlist
+WISHLIST_CACHE_TIMEOUT = 3600  # Seconds a user's wishlisted record ids stay cached; dropped on every change
+WISHLIST_RESTOCK_DELAY = 300            # Seconds after a restock before back-in-stock emails go out
+WISHLIST_RESTOCK_COOLDOWN = 7 * 24 * 3600   # Don't email about the same wishlisted record more often than this
+WISHLIST_RESTOCK_BATCH_SIZE = 200       # Back-in-stock emails released to the outbox at a time...
+WISHLIST_RESTOCK_BATCH_INTERVAL = 60    # ...every this many seconds
+
+# In-process caches are invalidated across workers and nodes with PostgreSQL NOTIFY (see apps/core/invalidation.py)
+INVALIDATION_CHANNEL = 'cache_invalidation'
+# Run the listener thread in web processes and task workers; never under manage.py test, where it would hold
+# a connection to the test database of its own
+INVALIDATION_LISTENER = sys.argv[1:2] != ['test']
+
+# Catalogue listings (category first pages, list counts, genre counts) served stale while one request recomputes them
+CATALOG_CACHE_SOFT_TTL = 60     # Seconds before a cached listing is recomputed
+CATALOG_CACHE_HARD_TTL = 900    # Seconds a stale listing may still be served meanwhile
+DIMENSION_CACHE_TTL = 300       # Seconds each process may keep its copy of the genre, label and artist tables
+
+# Home page: shared sections and store statistics are rebuilt by a periodic task (see apps/home/sections.py)
+HOME_SECTIONS_REFRESH_INTERVAL = 300    # Seconds between rebuilds
+HOME_SECTIONS_CACHE_TIMEOUT = 3600      # Outlives the interval so a late rebuild never leaves the page uncached
+HOME_RECOMMENDED_CACHE_TIMEOUT = 600    # Seconds a user's recommended records stay cached
+
+# Delivered and cancelled orders older than this move to the archive tables (python manage.py archive_orders)
+ORDER_ARCHIVE_AFTER_DAYS = 365
+
+# Admin index dashboard: JET's default widgets plus sales figures from apps.analytics rollups
+JET_INDEX_DASHBOARD = 'apps.analytics.dashboard.SalesDashboard'
+
 # Stripe Configuration
 # Get your keys from: https://dashboard.stripe.com/test/apikeys
 STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY', 'pk_test_...')  # Add your test publishable key here
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY', 'sk_test_...')  # Add your test secret key here
-STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', '')  # Optional for now
+STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', '')  # Required to verify checkout.session.completed events
 
 # Currency for your vinyl shop (Hong Kong Dollars)
 STRIPE_CURRENCY = 'hkd'
+
+# Payment gateway (apps/cart/payments.py)
+# Leave STRIPE_API_BASE empty for real Stripe; set it to http://127.0.0.1:12111
+# to use the bundled fake server (python manage.py run_fake_stripe)
+STRIPE_API_BASE = os.getenv('STRIPE_API_BASE', '')
+STRIPE_TIMEOUTS = {                  # Seconds per call before giving up on Stripe
+    'create_checkout_session': 10,
+    'retrieve_checkout_session': 5,
+}
+STRIPE_MAX_RETRIES = 2               # Extra attempts on connection errors, 429s and 5xx
+STRIPE_RETRY_BACKOFF = 0.25          # Base seconds for jittered exponential backoff